@@ -14,6 +14,26 @@ from .rutas.publicas import bp_publicas
 from .rutas.privadas import bp_privadas
 from .rutas.proxy import bp_proxy
 from .db.conexion import probar_conexion
+from .servicios.transporte_zoom import configurar_transporte, info_transporte
+from .servicios.cache_catalogos import cache_catalogos
+from .servicios.snapshot_catalogos import cargar_snapshot
+from .servicios.coalescencia import estadisticas_coalescencia
+from .servicios.circuito import circuitos_zoom
+from .servicios.reintentos import estadisticas_reintentos
+from .servicios.cache_tokens import tokens_zoom
+from .servicios.limitador import limitadores_zoom
+from .servicios.matriz_tarifas import matriz_tarifas
+from .servicios.indice_geografia import indice_geografia
+from .servicios.buscador_geografia import buscador_geografia
+from .servicios.cobertura import indice_cobertura
+from .servicios.proxy_zoom import estadisticas_proxy
+from .servicios.trabajos import trabajos_envio
+from .servicios.lote_envios import estadisticas_lotes
+from .servicios.idempotencia import envios_idempotentes
+from .core.metricas import metricas
+from .core.cache_http import estadisticas_cache_http
+from .core.serializacion import configurar_serializacion, info_serializacion
+from .core.compresion import configurar_compresion, estadisticas_compresion, sin_compresion
 import logging as logger
 
 
@@ -30,6 +50,10 @@ def crear_aplicacion() -> Flask:
         ZOOM_FRASE_SECRETA=Configuracion.ZOOM_FRASE_SECRETA,
         ZOOM_TIMEOUT=Configuracion.ZOOM_TIMEOUT,
         ZOOM_REINTENTOS=Configuracion.ZOOM_REINTENTOS,
+        ZOOM_POOL_MAX_CONEXIONES=Configuracion.ZOOM_POOL_MAX_CONEXIONES,
+        ZOOM_POOL_MAX_KEEPALIVE=Configuracion.ZOOM_POOL_MAX_KEEPALIVE,
+        ZOOM_POOL_KEEPALIVE_EXPIRACION=Configuracion.ZOOM_POOL_KEEPALIVE_EXPIRACION,
+        ZOOM_HTTP2=Configuracion.ZOOM_HTTP2,
         #ENTORNO=Configuracion.ENTORNO,
         DEBUG=Configuracion.DEBUG,
         LOG_NIVEL=Configuracion.LOG_NIVEL,
@@ -39,17 +63,50 @@ def crear_aplicacion() -> Flask:
     #app.run(debug=app.config.get("DEBUG"), use_reloader=True)
 
     configurar_logging(app.config.get("LOG_NIVEL", "INFO"))
+    # JSON rápido (orjson) y MessagePack por negociación para todas las respuestas
+    configurar_serializacion(app)
+    # gzip/br/zstd según Accept-Encoding (después de los ganchos de ETag de los blueprints)
+    configurar_compresion(app)
     registrar_manejadores_errores(app)
     if app.config.get("DEBUG"):
         logger.getLogger().info("Aplicación iniciada en modo DEBUG")
     probar_conexion()
 
+    # Transporte HTTP compartido (pool keep-alive) para todas las rutas ZOOM
+    configurar_transporte(
+        max_conexiones=app.config.get("ZOOM_POOL_MAX_CONEXIONES"),
+        max_keepalive=app.config.get("ZOOM_POOL_MAX_KEEPALIVE"),
+        keepalive_expiracion=app.config.get("ZOOM_POOL_KEEPALIVE_EXPIRACION"),
+        http2=app.config.get("ZOOM_HTTP2"),
+    )
+
+    # Precarga de catálogos desde el snapshot local (evita estampida contra ZOOM al arrancar)
+    if Configuracion.ZOOM_SNAPSHOT_PRECARGA:
+        cargar_snapshot(Configuracion.ZOOM_SNAPSHOT_ARCHIVO)
+
+    # Matriz de tarifas precalculadas (carga + refresco periódico en segundo plano)
+    if Configuracion.ZOOM_MATRIZ_HABILITADA:
+        matriz_tarifas.iniciar()
+
+    # Índice geográfico en memoria (snapshot o rastreo inicial + refresco incremental)
+    if Configuracion.ZOOM_GEOGRAFIA_HABILITADA:
+        indice_geografia.iniciar()
+
+    # Zonas no servidas de todas las ciudades (validación de cobertura sin llamar a ZOOM)
+    if Configuracion.ZOOM_COBERTURA_HABILITADA:
+        indice_cobertura.iniciar()
+
     # Registro de blueprints (rutas)
     app.register_blueprint(bp_publicas, url_prefix="/api")
     app.register_blueprint(bp_privadas, url_prefix="/privadas")
     app.register_blueprint(bp_proxy, url_prefix="/api")
 
+    # Pool de trabajos asíncronos (envío orquestado) y recuperación de los que quedaron pendientes
+    if Configuracion.TRABAJOS_HABILITADO:
+        trabajos_envio.iniciar(app)
+
     @app.get("/health")
+    @sin_compresion
     def health():
         from .db.conexion import probar_conexion        
         try:
@@ -67,7 +124,25 @@ def crear_aplicacion() -> Flask:
             "ZOOM_TIMEOUT",
             "ZOOM_REINTENTOS",
         ]}
-        return jsonify({"app": "zoom-api", "config": cfg})
+        return jsonify({"app": "zoom-api", "config": cfg, "transporte_zoom": info_transporte(),
+                        "cache_catalogos": cache_catalogos.estadisticas(),
+                        "coalescencia": estadisticas_coalescencia(),
+                        "circuitos_zoom": circuitos_zoom.estadisticas(),
+                        "presupuesto_reintentos": estadisticas_reintentos(),
+                        "tokens_zoom": tokens_zoom.estadisticas(),
+                        "limitadores_zoom": limitadores_zoom.estadisticas(),
+                        "matriz_tarifas": matriz_tarifas.estadisticas(),
+                        "indice_geografia": indice_geografia.estadisticas(),
+                        "buscador_geografia": buscador_geografia.estadisticas(),
+                        "cobertura": indice_cobertura.estadisticas(),
+                        "cache_http": estadisticas_cache_http(),
+                        "serializacion": info_serializacion(app),
+                        "compresion": estadisticas_compresion(),
+                        "proxy": estadisticas_proxy(),
+                        "trabajos": trabajos_envio.estadisticas(),
+                        "lotes": estadisticas_lotes(),
+                        "idempotencia": envios_idempotentes.estadisticas(),
+                        "metricas": metricas.instantanea()})
 
     return app
 
@@ -4,6 +4,7 @@ Configuración de la API de Delivery Lysto
 Lee variables de entorno y define rutas por defecto de los servicios públicos.
 """
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -44,6 +45,23 @@ class Configuracion:
     # Timeout y reintentos
     ZOOM_TIMEOUT = float(os.getenv("ZOOM_TIMEOUT", "15"))
     ZOOM_REINTENTOS = int(os.getenv("ZOOM_REINTENTOS", "3"))
+    # Política de reintentos (ZOOM y ARMI): backoff con jitter y presupuesto por ventana
+    REINTENTO_BASE = float(os.getenv("REINTENTO_BASE", "0.5"))
+    REINTENTO_TOPE = float(os.getenv("REINTENTO_TOPE", "8"))
+    REINTENTO_RETRY_AFTER_MAX = float(os.getenv("REINTENTO_RETRY_AFTER_MAX", "30"))
+    # Reintentos permitidos = max(MINIMO, RATIO * solicitudes en la VENTANA de segundos)
+    REINTENTO_PRESUPUESTO_RATIO = float(os.getenv("REINTENTO_PRESUPUESTO_RATIO", "0.2"))
+    REINTENTO_PRESUPUESTO_VENTANA = float(os.getenv("REINTENTO_PRESUPUESTO_VENTANA", "10"))
+    REINTENTO_PRESUPUESTO_MINIMO = int(os.getenv("REINTENTO_PRESUPUESTO_MINIMO", "10"))
+
+    # Pool de conexiones HTTP hacia ZOOM (un cliente compartido por worker)
+    ZOOM_POOL_MAX_CONEXIONES = int(os.getenv("ZOOM_POOL_MAX_CONEXIONES", "50"))
+    ZOOM_POOL_MAX_KEEPALIVE = int(os.getenv("ZOOM_POOL_MAX_KEEPALIVE", "20"))
+    ZOOM_POOL_KEEPALIVE_EXPIRACION = float(os.getenv("ZOOM_POOL_KEEPALIVE_EXPIRACION", "30"))
+    # HTTP/2 requiere el extra `httpx[http2]`
+    ZOOM_HTTP2 = os.getenv("ZOOM_HTTP2", "False").lower() in ("1", "true", "yes")
+    # Coalescer GET idénticos concurrentes en una sola llamada a ZOOM
+    ZOOM_COALESCER_GET = os.getenv("ZOOM_COALESCER_GET", "True").lower() in ("1", "true", "yes")
 
     ARMI_BASE_URL = "https://localhost:8001" if DEBUG else os.getenv("ARMI_BASE_URL")
     #(os.getenv("ARMI_BASE_URL", "https://api.armi.example").rstrip("/"))
@@ -96,3 +114,229 @@ class Configuracion:
     # Rutas ARMI
     RUTA_ARMI_CREA_NEGOCIO = "/monitor/business/create"
 
+    # Caché de catálogos ZOOM (segundos). Se puede sobreescribir por ruta con
+    # ZOOM_CACHE_TTLS='{"getOficinas": 600}'; un TTL de 0 desactiva esa ruta.
+    ZOOM_CACHE_HABILITADO = os.getenv("ZOOM_CACHE_HABILITADO", "True").lower() in ("1", "true", "yes")
+    ZOOM_CACHE_MAX_ENTRADAS = int(os.getenv("ZOOM_CACHE_MAX_ENTRADAS", "8192"))
+    # Ventana en la que se sirve un catálogo vencido mientras se refresca en segundo plano
+    ZOOM_CACHE_TTL_OBSOLETO = float(os.getenv("ZOOM_CACHE_TTL_OBSOLETO", "3600"))
+    ZOOM_CACHE_TTLS = {
+        RUTA_ZOOM_ESTADOS: 86400,
+        RUTA_ZOOM_CIUDADES: 86400,
+        RUTA_ZOOM_CIUDADESOFI: 86400,
+        RUTA_ZOOM_CIUDADESWS: 86400,
+        RUTA_ZOOM_LISTADOGENERICOCIUDADES: 86400,
+        RUTA_ZOOM_MUNICIPIOS: 86400,
+        RUTA_ZOOM_PARROQUIAS: 86400,
+        RUTA_ZOOM_PAISES: 86400,
+        RUTA_ZOOM_OFICINAS: 3600,
+        RUTA_ZOOM_OFICINASGE: 3600,
+        RUTA_ZOOM_GETOFICINAESTADOWS: 3600,
+        RUTA_ZOOM_SUCURSALES: 3600,
+        RUTA_ZOOM_TIPOTARIFA: 86400,
+        RUTA_ZOOM_MODALIDADTARIFA: 86400,
+        RUTA_ZOOM_MODALIDADCOD: 86400,
+        RUTA_ZOOM_TIPOENVIO: 86400,
+        RUTA_ZOOM_TIPORUTAENVIO: 86400,
+        RUTA_ZOOM_TIPOPRECIOWS: 86400,
+        RUTA_ZOOM_TIPODOCUMENTO: 86400,
+        RUTA_ZOOM_LANGUAGES: 86400,
+        RUTA_ZOOM_RTAGS: 86400,
+        RUTA_ZOOM_ZONASNOSERVIDASWS: 3600,
+    }
+    ZOOM_CACHE_TTLS.update(json.loads(os.getenv("ZOOM_CACHE_TTLS", "{}") or "{}"))
+
+    # Snapshot local de catálogos (SQLite) precargado al iniciar la aplicación
+    ZOOM_SNAPSHOT_ARCHIVO = os.getenv("ZOOM_SNAPSHOT_ARCHIVO", "data/catalogos_zoom.sqlite")
+    ZOOM_SNAPSHOT_PRECARGA = os.getenv("ZOOM_SNAPSHOT_PRECARGA", "True").lower() in ("1", "true", "yes")
+    # Servicios para los que se rastrean oficinas por ciudad (getOficinas exige codservicio)
+    ZOOM_SNAPSHOT_CODSERVICIOS = [c.strip() for c in os.getenv("ZOOM_SNAPSHOT_CODSERVICIOS", "1").split(",") if c.strip()]
+    # Llamadas simultáneas a ZOOM al rastrear catálogos
+    ZOOM_RASTREO_MAX_PARALELO = int(os.getenv("ZOOM_RASTREO_MAX_PARALELO", "16"))
+
+    # Circuit breaker por ruta ZOOM: tras N fallos consecutivos (red o HTTP 5xx)
+    # la ruta queda abierta y falla rápido durante ZOOM_CIRCUITO_APERTURA segundos.
+    # Se puede ajustar por ruta: ZOOM_CIRCUITO_POR_RUTA='{"createShipment": {"umbral_fallos": 3, "apertura": 60}}'
+    ZOOM_CIRCUITO_HABILITADO = os.getenv("ZOOM_CIRCUITO_HABILITADO", "True").lower() in ("1", "true", "yes")
+    ZOOM_CIRCUITO_UMBRAL_FALLOS = int(os.getenv("ZOOM_CIRCUITO_UMBRAL_FALLOS", "5"))
+    ZOOM_CIRCUITO_APERTURA = float(os.getenv("ZOOM_CIRCUITO_APERTURA", "30"))
+    # Llamadas de prueba simultáneas permitidas en estado semiabierto
+    ZOOM_CIRCUITO_SONDAS = int(os.getenv("ZOOM_CIRCUITO_SONDAS", "1"))
+    ZOOM_CIRCUITO_POR_RUTA = json.loads(os.getenv("ZOOM_CIRCUITO_POR_RUTA", "{}") or "{}")
+
+    # Caché de tokens crearToken/zoomCert por login (ZOOM_TOKEN_TTL=0 la desactiva).
+    # Si ZOOM informa la vigencia del token en la respuesta, se usa esa.
+    ZOOM_TOKEN_TTL = float(os.getenv("ZOOM_TOKEN_TTL", "1800"))
+    ZOOM_TOKEN_REFRESCO_ANTICIPADO = float(os.getenv("ZOOM_TOKEN_REFRESCO_ANTICIPADO", "300"))
+    ZOOM_TOKEN_MAX_ENTRADAS = int(os.getenv("ZOOM_TOKEN_MAX_ENTRADAS", "1024"))
+    # Códigos ZOOM que indican token inválido/vencido (además de HTTP 401/403); solo con ellos se
+    # renueva el token y se repite la operación. Vacío hasta confirmarlos con ZOOM.
+    ZOOM_TOKEN_CODIGOS_RECHAZO = [c.strip() for c in os.getenv("ZOOM_TOKEN_CODIGOS_RECHAZO", "").split(",") if c.strip()]
+
+    # Limitador de salida hacia ZOOM (0 = sin límite). Global y por ruta:
+    # ZOOM_LIMITE_POR_RUTA='{"CalcularTarifa": {"tasa": 10, "rafaga": 20, "concurrencia": 5}}'
+    ZOOM_LIMITE_TASA = float(os.getenv("ZOOM_LIMITE_TASA", "0"))
+    ZOOM_LIMITE_RAFAGA = int(os.getenv("ZOOM_LIMITE_RAFAGA", "20"))
+    ZOOM_LIMITE_CONCURRENCIA = int(os.getenv("ZOOM_LIMITE_CONCURRENCIA", "0"))
+    ZOOM_LIMITE_POR_RUTA = json.loads(os.getenv("ZOOM_LIMITE_POR_RUTA", "{}") or "{}")
+    # Espera máxima en cola antes de rechazar con 503
+    ZOOM_LIMITE_ESPERA_MAX = float(os.getenv("ZOOM_LIMITE_ESPERA_MAX", "5"))
+
+    # Tracking por lotes (/api/tracking/batch)
+    TRACKING_LOTE_MAX = int(os.getenv("TRACKING_LOTE_MAX", "500"))
+    TRACKING_LOTE_PARALELO = int(os.getenv("TRACKING_LOTE_PARALELO", "16"))
+
+    # Caché de cotizaciones (CalcularTarifa / consultarPreciosWs). El TTL se recorta
+    # para no cruzar el cambio de día tarifario. Pasos de facturación: 0 = sin redondeo.
+    ZOOM_COTIZACION_CACHE_HABILITADA = os.getenv("ZOOM_COTIZACION_CACHE_HABILITADA", "True").lower() in ("1", "true", "yes")
+    ZOOM_COTIZACION_TTL = float(os.getenv("ZOOM_COTIZACION_TTL", "900"))
+    ZOOM_COTIZACION_MAX_ENTRADAS = int(os.getenv("ZOOM_COTIZACION_MAX_ENTRADAS", "4096"))
+    # Paso de facturación de ZOOM para agrupar claves de caché (0 = clave exacta); usar solo si
+    # ZOOM cobra por ese paso, o se servirían precios de otro peso
+    ZOOM_COTIZACION_PASO_PESO = float(os.getenv("ZOOM_COTIZACION_PASO_PESO", "0"))
+    ZOOM_COTIZACION_PASO_DIMENSION = float(os.getenv("ZOOM_COTIZACION_PASO_DIMENSION", "0"))
+    ZOOM_COTIZACION_ZONA_HORARIA = os.getenv("ZOOM_COTIZACION_ZONA_HORARIA", "America/Caracas")
+    ZOOM_COTIZACION_HORA_CORTE = int(os.getenv("ZOOM_COTIZACION_HORA_CORTE", "0"))
+    # tipo_precio de consultarPreciosWs que se cachean (6-8 son divisas)
+    ZOOM_COTIZACION_TIPOS_PRECIO = [int(t) for t in os.getenv("ZOOM_COTIZACION_TIPOS_PRECIO", "1,2,3,4,5").split(",") if t.strip()]
+
+    # Matriz de tarifas precalculadas para pares origen/destino frecuentes.
+    # ZOOM_MATRIZ_PARES="codciudad_origen-codciudad_destino,..." (p. ej. "1-2,1-5,2-1")
+    ZOOM_MATRIZ_HABILITADA = os.getenv("ZOOM_MATRIZ_HABILITADA", "False").lower() in ("1", "true", "yes")
+    ZOOM_MATRIZ_ARCHIVO = os.getenv("ZOOM_MATRIZ_ARCHIVO", "data/matriz_tarifas.sqlite")
+    ZOOM_MATRIZ_PARES = [tuple(p.strip().split("-", 1)) for p in os.getenv("ZOOM_MATRIZ_PARES", "").split(",") if "-" in p]
+    ZOOM_MATRIZ_TIPOS_TARIFA = [t.strip() for t in os.getenv("ZOOM_MATRIZ_TIPOS_TARIFA", "1,2").split(",") if t.strip()]
+    ZOOM_MATRIZ_MODALIDADES = [m.strip() for m in os.getenv("ZOOM_MATRIZ_MODALIDADES", "1,2").split(",") if m.strip()]
+    ZOOM_MATRIZ_PESOS = [p.strip() for p in os.getenv("ZOOM_MATRIZ_PESOS", "1,2,3,4,5,10,15,20,30").split(",") if p.strip()]
+    # Segundos entre recálculos
+    ZOOM_MATRIZ_INTERVALO = float(os.getenv("ZOOM_MATRIZ_INTERVALO", "21600"))
+
+    # Comparador de precios (/api/precios/comparar)
+    # Campos (minúsculas) de entidadRespuesta que se toman como monto total, en orden
+    ZOOM_PRECIO_CAMPOS_TOTAL = [c.strip().lower() for c in os.getenv(
+        "ZOOM_PRECIO_CAMPOS_TOTAL", "total,totalpagar,total_pagar,montototal,monto_total,tarifa,precio"
+    ).split(",") if c.strip()]
+    PRECIOS_COMPARAR_TIMEOUT = float(os.getenv("PRECIOS_COMPARAR_TIMEOUT", "30"))
+
+    # Índice geográfico en memoria (estados -> ciudades -> municipios -> parroquias, oficinas)
+    ZOOM_GEOGRAFIA_HABILITADA = os.getenv("ZOOM_GEOGRAFIA_HABILITADA", "False").lower() in ("1", "true", "yes")
+    # Segundos entre vueltas de refresco incremental y nodos refrescados por vuelta
+    ZOOM_GEOGRAFIA_INTERVALO = float(os.getenv("ZOOM_GEOGRAFIA_INTERVALO", "300"))
+    ZOOM_GEOGRAFIA_LOTE = int(os.getenv("ZOOM_GEOGRAFIA_LOTE", "50"))
+    # Antigüedad a partir de la cual un nodo se vuelve a pedir a ZOOM
+    ZOOM_GEOGRAFIA_VIGENCIA = float(os.getenv("ZOOM_GEOGRAFIA_VIGENCIA", "86400"))
+
+    # Búsqueda de ciudades/oficinas por nombre (/api/buscar/...)
+    ZOOM_BUSQUEDA_LIMITE = int(os.getenv("ZOOM_BUSQUEDA_LIMITE", "10"))
+    ZOOM_BUSQUEDA_PUNTAJE_MINIMO = float(os.getenv("ZOOM_BUSQUEDA_PUNTAJE_MINIMO", "0.3"))
+    ZOOM_BUSQUEDA_TTL = float(os.getenv("ZOOM_BUSQUEDA_TTL", "3600"))
+    # Puntaje mínimo para completar codciudad en el envío orquestado a partir del nombre
+    ZOOM_BUSQUEDA_UMBRAL_CODCIUDAD = float(os.getenv("ZOOM_BUSQUEDA_UMBRAL_CODCIUDAD", "0.95"))
+
+    # Índice de cobertura (zonasNoServidasWs de todas las ciudades)
+    ZOOM_COBERTURA_HABILITADA = os.getenv("ZOOM_COBERTURA_HABILITADA", "False").lower() in ("1", "true", "yes")
+    ZOOM_COBERTURA_INTERVALO = float(os.getenv("ZOOM_COBERTURA_INTERVALO", "3600"))
+    # Rechazar en validar_payload_estructura los destinos nacionales no servidos
+    ZOOM_COBERTURA_VALIDAR_ENVIO = os.getenv("ZOOM_COBERTURA_VALIDAR_ENVIO", "True").lower() in ("1", "true", "yes")
+    COBERTURA_LOTE_MAX = int(os.getenv("COBERTURA_LOTE_MAX", "1000"))
+
+    # Caché HTTP de las rutas públicas (ETag / Last-Modified / Cache-Control).
+    # max-age (segundos) por ruta del blueprint público; 0 = "no-cache" (revalidar con ETag).
+    # Se puede sobreescribir: HTTP_CACHE_RUTAS='{"getOficinas": 600}'
+    HTTP_CACHE_HABILITADO = os.getenv("HTTP_CACHE_HABILITADO", "True").lower() in ("1", "true", "yes")
+    HTTP_CACHE_MAX_ENTRADAS = int(os.getenv("HTTP_CACHE_MAX_ENTRADAS", "8192"))
+    HTTP_CACHE_DEFAULT = int(os.getenv("HTTP_CACHE_DEFAULT", "0"))
+    HTTP_CACHE_RUTAS = {
+        "getEstados": 3600,
+        "catalog/ciudades": 3600,
+        "getCiudadesOfi": 3600,
+        "getCiudadesWs": 3600,
+        "listadoGenericoCiudades": 3600,
+        "getMunicipios": 3600,
+        "getParroquias": 3600,
+        "getPaises": 3600,
+        "catalog/arbol": 3600,
+        "getOficinas": 600,
+        "getOficinasGE": 600,
+        "getOficinaEstadoWs": 600,
+        "getsucursales": 600,
+        "catalog/tipotarifa": 3600,
+        "getModalidadTarifa": 3600,
+        "getModalidadCod": 3600,
+        "getTipoEnvio": 3600,
+        "getTipoRutaEnvio": 3600,
+        "getTipoPrecioWs": 3600,
+        "getTipoDocumento": 3600,
+        "getlanguages": 3600,
+        "getRespuestastags": 3600,
+        "zonasNoServidasWs": 600,
+        "buscar/ciudades": 600,
+        "buscar/oficinas": 600,
+        # Tracking: estado cambia con cada escaneo
+        "getInfoTracking": 30,
+        "getLastTracking": 30,
+        "getZoomTrackWs": 30,
+        "consultaTrackingWs": 30,
+        "getStatus": 3600,
+    }
+    HTTP_CACHE_RUTAS.update(json.loads(os.getenv("HTTP_CACHE_RUTAS", "{}") or "{}"))
+
+    # Serialización de respuestas: "auto" (orjson si está instalado), "orjson" o "estandar".
+    # MessagePack se negocia con Accept: application/msgpack (requiere el paquete msgpack).
+    JSON_PROVEEDOR = os.getenv("JSON_PROVEEDOR", "auto").lower()
+    JSON_MSGPACK_HABILITADO = os.getenv("JSON_MSGPACK_HABILITADO", "True").lower() in ("1", "true", "yes")
+
+    # Compresión de respuestas según Accept-Encoding (br requiere `brotli`, zstd requiere `zstandard`)
+    COMPRESION_HABILITADA = os.getenv("COMPRESION_HABILITADA", "True").lower() in ("1", "true", "yes")
+    COMPRESION_ALGORITMOS = [a.strip() for a in os.getenv("COMPRESION_ALGORITMOS", "zstd,br,gzip").split(",") if a.strip()]
+    COMPRESION_MINIMO_BYTES = int(os.getenv("COMPRESION_MINIMO_BYTES", "1024"))
+    COMPRESION_TIPOS = [t.strip() for t in os.getenv(
+        "COMPRESION_TIPOS", "application/json,application/x-ndjson,application/msgpack,application/xml").split(",") if t.strip()]
+    # Endpoints excluidos (además de las vistas con @sin_compresion), p. ej. "publicas.obtener_oficinas"
+    COMPRESION_EXCLUIR = [e.strip() for e in os.getenv("COMPRESION_EXCLUIR", "").split(",") if e.strip()]
+    COMPRESION_NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", "6"))
+    COMPRESION_NIVEL_BR = int(os.getenv("COMPRESION_NIVEL_BR", "5"))
+    COMPRESION_NIVEL_ZSTD = int(os.getenv("COMPRESION_NIVEL_ZSTD", "3"))
+    COMPRESION_CACHE_MAX_ENTRADAS = int(os.getenv("COMPRESION_CACHE_MAX_ENTRADAS", "512"))
+
+    # Proxy genérico /api/proxy/<ruta>: política por ruta ZOOM (ver servicios/proxy_zoom.py)
+    # PROXY_RUTAS='{"getNuevoCatalogo": {"metodos": ["GET"], "ttl": 3600, "timeout": 5, "coalescer": true}}'
+    PROXY_RUTAS = json.loads(os.getenv("PROXY_RUTAS", "{}") or "{}")
+    PROXY_SOLO_PERMITIDAS = os.getenv("PROXY_SOLO_PERMITIDAS", "False").lower() in ("1", "true", "yes")
+    PROXY_MODO = os.getenv("PROXY_MODO", "envoltura").lower()  # envoltura | passthrough (por ruta en PROXY_RUTAS)
+    PROXY_CACHE_MAX_ENTRADAS = int(os.getenv("PROXY_CACHE_MAX_ENTRADAS", "1024"))
+    PROXY_CABECERAS_SOLICITUD = [c.strip() for c in os.getenv(
+        "PROXY_CABECERAS_SOLICITUD", "Accept,Accept-Language,If-None-Match,If-Modified-Since").split(",") if c.strip()]
+    PROXY_CABECERAS_RESPUESTA = [c.strip() for c in os.getenv(
+        "PROXY_CABECERAS_RESPUESTA",
+        "Content-Type,Content-Encoding,Content-Length,Content-Disposition,ETag,Last-Modified,Cache-Control,Retry-After",
+    ).split(",") if c.strip()]
+
+    # Envío orquestado: pasos independientes en paralelo (ver servicios/grafo_pasos.py)
+    ORQUESTADOR_PARALELO = os.getenv("ORQUESTADOR_PARALELO", "True").lower() in ("1", "true", "yes")
+    ORQUESTADOR_MAX_PARALELO = int(os.getenv("ORQUESTADOR_MAX_PARALELO", "16"))
+    # Pool aparte para los pasos de trabajos asíncronos y lotes (no compiten con las solicitudes síncronas)
+    ORQUESTADOR_MAX_PARALELO_FONDO = int(os.getenv("ORQUESTADOR_MAX_PARALELO_FONDO", "8"))
+
+    # Trabajos asíncronos (envío orquestado con 202 + consulta de estado, ver servicios/trabajos.py)
+    TRABAJOS_HABILITADO = os.getenv("TRABAJOS_HABILITADO", "True").lower() in ("1", "true", "yes")
+    TRABAJOS_MODO_DEFECTO = os.getenv("TRABAJOS_MODO_DEFECTO", "sincrono")  # sincrono | asincrono
+    TRABAJOS_MAX_HILOS = int(os.getenv("TRABAJOS_MAX_HILOS", "4"))
+    TRABAJOS_MAX_COLA = int(os.getenv("TRABAJOS_MAX_COLA", "500"))
+    TRABAJOS_MEMORIA_MAX = int(os.getenv("TRABAJOS_MEMORIA_MAX", "5000"))
+    TRABAJOS_RECUPERAR_AL_INICIAR = os.getenv("TRABAJOS_RECUPERAR_AL_INICIAR", "True").lower() in ("1", "true", "yes")
+    TRABAJOS_RECUPERAR_SEGUNDOS = int(os.getenv("TRABAJOS_RECUPERAR_SEGUNDOS", "300"))
+    TRABAJOS_MAX_INTENTOS = int(os.getenv("TRABAJOS_MAX_INTENTOS", "3"))
+
+    # Lotes de envíos orquestados (JSON/CSV, resultados NDJSON, ver servicios/lote_envios.py)
+    LOTE_MAX_ENVIOS = int(os.getenv("LOTE_MAX_ENVIOS", "1000"))
+    LOTE_MAX_PARALELO = int(os.getenv("LOTE_MAX_PARALELO", "8"))
+    LOTE_ETIQUETAS_POR_LLAMADA = int(os.getenv("LOTE_ETIQUETAS_POR_LLAMADA", "50"))
+    LOTE_TOMA_SEGUNDOS = int(os.getenv("LOTE_TOMA_SEGUNDOS", "300"))  # EN_CURSO sin avance = huérfano
+
+    # Idempotencia del envío orquestado (Idempotency-Key o metadata.solicitud_id, ver servicios/idempotencia.py)
+    IDEMPOTENCIA_HABILITADA = os.getenv("IDEMPOTENCIA_HABILITADA", "True").lower() in ("1", "true", "yes")
+    IDEMPOTENCIA_TTL_SEGUNDOS = int(os.getenv("IDEMPOTENCIA_TTL_SEGUNDOS", "86400"))
+    IDEMPOTENCIA_ESPERA_SEGUNDOS = float(os.getenv("IDEMPOTENCIA_ESPERA_SEGUNDOS", "60"))
+    IDEMPOTENCIA_EN_CURSO_MAX_SEGUNDOS = int(os.getenv("IDEMPOTENCIA_EN_CURSO_MAX_SEGUNDOS", "900"))
+    IDEMPOTENCIA_MEMORIA_MAX = int(os.getenv("IDEMPOTENCIA_MEMORIA_MAX", "2048"))
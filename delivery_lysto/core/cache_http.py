@@ -0,0 +1,129 @@
+"""
+Caché HTTP (ETag / Last-Modified / Cache-Control) – Español
+-----------------------------------------------------------
+Ganchos para un blueprint de solo lectura:
+
+- `after_request`: en respuestas GET 200 calcula un ETag con el hash del
+  contenido (sin los campos volátiles como `cache.edad` o `duracion_ms`, para
+  que sea estable), emite `Last-Modified` (cuándo cambió ese hash por última
+  vez) y `Cache-Control` según la ruta (`HTTP_CACHE_RUTAS`). Si el cliente envió
+  `If-None-Match` / `If-Modified-Since` y coincide, responde 304 sin cuerpo.
+- `before_request`: si el ETag de esa URL se calculó hace menos que el
+  `max-age` de la ruta y coincide con `If-None-Match`, responde 304 sin
+  ejecutar la vista ni volver a serializar.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Optional, Tuple
+
+from flask import Blueprint, Response, request
+
+from ..configuracion import Configuracion
+from ..servicios.cache_catalogos import CacheTTL, FRESCO
+from .metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+# Campos de primer nivel que cambian entre respuestas con el mismo contenido
+CAMPOS_VOLATILES = ("cache", "duracion_ms")
+
+# url -> (etag, débil, last_modified)
+_huellas = CacheTTL(Configuracion.HTTP_CACHE_MAX_ENTRADAS)
+
+
+# blueprint -> url_prefix con el que se registra
+_prefijos: dict = {}
+
+
+def ruta_relativa() -> str:
+    """Regla de la ruta sin el prefijo del blueprint ('/api/getEstados' -> 'getEstados')."""
+    regla = request.url_rule.rule if request.url_rule else request.path
+    prefijo = _prefijos.get(request.blueprint, "")
+    if prefijo and regla.startswith(prefijo):
+        regla = regla[len(prefijo):]
+    return regla.lstrip("/")
+
+
+def max_age_de(ruta: str) -> int:
+    return int(Configuracion.HTTP_CACHE_RUTAS.get(ruta, Configuracion.HTTP_CACHE_DEFAULT))
+
+
+def cache_control(max_age: int) -> str:
+    # Sin max-age, los clientes/CDN pueden guardar la respuesta pero deben revalidar (ETag)
+    return f"public, max-age={max_age}" if max_age > 0 else "public, no-cache"
+
+
+def huella(cuerpo: bytes) -> Tuple[str, bool]:
+    """`(hash, débil)`: fuerte sobre los bytes, débil si hubo que quitar campos volátiles."""
+    if any(f'"{c}"'.encode() in cuerpo for c in CAMPOS_VOLATILES):
+        try:
+            datos = json.loads(cuerpo)
+        except ValueError:
+            datos = None
+        if isinstance(datos, dict):
+            for campo in CAMPOS_VOLATILES:
+                datos.pop(campo, None)
+            canonico = json.dumps(datos, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+            return hashlib.blake2b(canonico, digest_size=16).hexdigest(), True
+    return hashlib.blake2b(cuerpo, digest_size=16).hexdigest(), False
+
+
+def _clave() -> str:
+    return request.full_path
+
+
+def _antes() -> Optional[Response]:
+    if not Configuracion.HTTP_CACHE_HABILITADO or request.method not in ("GET", "HEAD"):
+        return None
+    if not request.if_none_match:
+        return None
+    entrada, estado = _huellas.obtener(_clave())
+    if estado != FRESCO:
+        return None
+    etag, debil, modificado = entrada.valor
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    metricas.incrementar("http_cache.no_modificado", via="memoria")
+    respuesta = Response(status=304)
+    respuesta.set_etag(etag, weak=debil)
+    respuesta.last_modified = modificado
+    respuesta.headers["Cache-Control"] = cache_control(max_age_de(ruta_relativa()))
+    return respuesta
+
+
+def _despues(respuesta: Response) -> Response:
+    if (not Configuracion.HTTP_CACHE_HABILITADO or request.method not in ("GET", "HEAD")
+            or respuesta.status_code != 200 or respuesta.is_streamed or respuesta.direct_passthrough):
+        return respuesta
+    max_age = max_age_de(ruta_relativa())
+    respuesta.headers.setdefault("Cache-Control", cache_control(max_age))
+    if respuesta.get_etag()[0]:
+        return respuesta
+
+    etag, debil = huella(respuesta.get_data())
+    ahora = time.time()
+    previa, _ = _huellas.obtener(_clave())
+    modificado = previa.valor[2] if previa and previa.valor[0] == etag else ahora
+    if max_age > 0:
+        _huellas.guardar(_clave(), (etag, debil, modificado), max_age)
+
+    respuesta.set_etag(etag, weak=debil)
+    respuesta.last_modified = modificado
+    respuesta.make_conditional(request)
+    if respuesta.status_code == 304:
+        metricas.incrementar("http_cache.no_modificado", via="hash")
+    return respuesta
+
+
+def registrar_cache_http(bp: Blueprint, url_prefix: str = "") -> None:
+    """Instala los ganchos de caché HTTP en el blueprint."""
+    _prefijos[bp.name] = url_prefix
+    bp.before_request(_antes)
+    bp.after_request(_despues)
+
+
+def estadisticas_cache_http() -> Any:
+    return _huellas.estadisticas()
@@ -0,0 +1,148 @@
+"""
+Compresión de respuestas (gzip / br / zstd) – Español
+-----------------------------------------------------
+`after_request` de la aplicación que comprime el cuerpo según `Accept-Encoding`:
+
+- Algoritmos: gzip siempre; `br` si está el paquete `brotli`; `zstd` si está
+  `zstandard`. Entre los que acepta el cliente gana el de mayor `q` y, a igual
+  `q`, el primero de `COMPRESION_ALGORITMOS`.
+- Solo tipos comprimibles (`COMPRESION_TIPOS`) y cuerpos de al menos
+  `COMPRESION_MINIMO_BYTES`; nunca respuestas en streaming ni ya codificadas.
+- Exclusión por ruta con el decorador `@sin_compresion` o por endpoint en
+  `COMPRESION_EXCLUIR`.
+- Las respuestas cacheables (`Cache-Control: max-age>0`, p. ej. catálogos)
+  guardan el cuerpo ya comprimido por hash del contenido, así que un catálogo
+  repetido no se vuelve a comprimir en cada acierto.
+
+Se ejecuta después de los ganchos de los blueprints: el ETag de `cache_http`
+se calcula sobre el cuerpo sin comprimir y aquí se vuelve débil (`W/"..."`),
+como hace nginx, para que `If-None-Match` siga coincidiendo con cualquier
+codificación.
+"""
+from __future__ import annotations
+import gzip
+import hashlib
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+from flask import Flask, Response, current_app, request
+
+from ..configuracion import Configuracion
+from ..servicios.cache_catalogos import CacheTTL
+from .metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # opcional
+    zstandard = None
+
+
+def _gzip(datos: bytes) -> bytes:
+    return gzip.compress(datos, compresslevel=Configuracion.COMPRESION_NIVEL_GZIP, mtime=0)
+
+
+def _brotli(datos: bytes) -> bytes:
+    return brotli.compress(datos, quality=Configuracion.COMPRESION_NIVEL_BR)
+
+
+def _zstd(datos: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=Configuracion.COMPRESION_NIVEL_ZSTD).compress(datos)
+
+
+COMPRESORES: Dict[str, Callable[[bytes], bytes]] = {"gzip": _gzip}
+if brotli is not None:
+    COMPRESORES["br"] = _brotli
+if zstandard is not None:
+    COMPRESORES["zstd"] = _zstd
+
+# (hash del cuerpo, algoritmo) -> cuerpo comprimido
+_precomprimidas = CacheTTL(Configuracion.COMPRESION_CACHE_MAX_ENTRADAS)
+
+
+def sin_compresion(vista: Callable) -> Callable:
+    """Decorador: la ruta nunca se comprime (p. ej. si el cliente no soporta Content-Encoding)."""
+    vista._sin_compresion = True
+    return vista
+
+
+def elegir_algoritmo() -> Optional[str]:
+    aceptados = request.accept_encodings
+    mejor, mejor_q = None, 0.0
+    for algoritmo in Configuracion.COMPRESION_ALGORITMOS:
+        if algoritmo not in COMPRESORES:
+            continue
+        q = aceptados.quality(algoritmo)
+        if q > mejor_q:
+            mejor, mejor_q = algoritmo, q
+    return mejor
+
+
+def _excluida() -> bool:
+    if request.endpoint in Configuracion.COMPRESION_EXCLUIR:
+        return True
+    vista = current_app.view_functions.get(request.endpoint)
+    return bool(getattr(vista, "_sin_compresion", False))
+
+
+def _comprimible(respuesta: Response) -> bool:
+    if (respuesta.status_code < 200 or respuesta.status_code in (204, 206, 304)
+            or respuesta.is_streamed or respuesta.direct_passthrough
+            or "Content-Encoding" in respuesta.headers or request.method == "HEAD"):
+        return False
+    if respuesta.mimetype not in Configuracion.COMPRESION_TIPOS and not respuesta.mimetype.startswith("text/"):
+        return False
+    return respuesta.content_length is not None and respuesta.content_length >= Configuracion.COMPRESION_MINIMO_BYTES
+
+
+def comprimir(respuesta: Response) -> Response:
+    if not Configuracion.COMPRESION_HABILITADA or not _comprimible(respuesta) or _excluida():
+        return respuesta
+    respuesta.vary.add("Accept-Encoding")
+    algoritmo = elegir_algoritmo()
+    if algoritmo is None:
+        return respuesta
+
+    datos = respuesta.get_data()
+    max_age = respuesta.cache_control.max_age or 0
+    clave = (hashlib.blake2b(datos, digest_size=16).hexdigest(), algoritmo) if max_age > 0 else None
+    entrada, _ = _precomprimidas.obtener(clave) if clave else (None, None)
+    if entrada is not None:
+        comprimido, via = entrada.valor, "cache"
+    else:
+        inicio = time.perf_counter()
+        comprimido, via = COMPRESORES[algoritmo](datos), "calculada"
+        metricas.observar("compresion.segundos", time.perf_counter() - inicio, algoritmo=algoritmo)
+        if clave:
+            _precomprimidas.guardar(clave, comprimido, max_age)
+    metricas.incrementar("compresion.respuestas", algoritmo=algoritmo, via=via)
+    metricas.incrementar("compresion.bytes_ahorrados", len(datos) - len(comprimido))
+
+    respuesta.set_data(comprimido)
+    respuesta.headers["Content-Encoding"] = algoritmo
+    etag, debil = respuesta.get_etag()
+    if etag and not debil:
+        respuesta.set_etag(etag, weak=True)
+    return respuesta
+
+
+def configurar_compresion(app: Flask) -> None:
+    """Registra la compresión como último `after_request` de la aplicación."""
+    app.after_request(comprimir)
+    logger.info(f"Compresión de respuestas: {', '.join(a for a in Configuracion.COMPRESION_ALGORITMOS if a in COMPRESORES)}")
+
+
+def estadisticas_compresion() -> Dict[str, Any]:
+    return {
+        "habilitada": Configuracion.COMPRESION_HABILITADA,
+        "algoritmos": [a for a in Configuracion.COMPRESION_ALGORITMOS if a in COMPRESORES],
+        "minimo_bytes": Configuracion.COMPRESION_MINIMO_BYTES,
+        "precomprimidas": _precomprimidas.estadisticas(),
+    }
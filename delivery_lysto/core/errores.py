@@ -42,6 +42,16 @@ class NoProcesable(ErrorZoom):
         super().__init__(mensaje, codigo_zoom, 422)
 
 
+class RutaNoPermitida(ErrorZoom):
+    def __init__(self, mensaje: str = "Ruta no permitida", codigo_zoom: str | None = None, status: int = 403):
+        super().__init__(mensaje, codigo_zoom, status)
+
+
+class ServicioSaturado(ErrorZoom):
+    def __init__(self, mensaje: str = "Servicio saturado, intente más tarde", codigo_zoom: str | None = None):
+        super().__init__(mensaje, codigo_zoom, 503)
+
+
 ZOOM_MAPEO_CODIGOS = {
     "CODE_000": RecursoNoEncontrado,  # no existe en BD
     "CODE_001": ErrorUpstream,        # error consulta
@@ -0,0 +1,52 @@
+"""
+Métricas en memoria – Español
+-----------------------------
+Contadores y observaciones (conteo/suma/máximo) por worker, con etiquetas
+simples. Se exponen en `/info`; no reemplazan un sistema de métricas externo.
+"""
+import threading
+from collections import defaultdict
+from typing import Any, Dict
+
+
+def _nombre(nombre: str, etiquetas: Dict[str, Any]) -> str:
+    if not etiquetas:
+        return nombre
+    return nombre + "{" + ",".join(f"{k}={v}" for k, v in sorted(etiquetas.items())) + "}"
+
+
+class Metricas:
+    """Registro de métricas seguro entre hilos."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._contadores: Dict[str, float] = defaultdict(float)
+        self._observaciones: Dict[str, Dict[str, float]] = {}
+
+    def incrementar(self, nombre: str, valor: float = 1, **etiquetas: Any) -> None:
+        clave = _nombre(nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] += valor
+
+    def observar(self, nombre: str, valor: float, **etiquetas: Any) -> None:
+        """Registra una medición (p. ej. segundos de espera)."""
+        clave = _nombre(nombre, etiquetas)
+        with self._lock:
+            obs = self._observaciones.get(clave)
+            if obs is None:
+                obs = self._observaciones[clave] = {"conteo": 0, "suma": 0.0, "maximo": 0.0}
+            obs["conteo"] += 1
+            obs["suma"] += valor
+            obs["maximo"] = max(obs["maximo"], valor)
+
+    def instantanea(self) -> Dict[str, Any]:
+        with self._lock:
+            contadores = {k: (int(v) if float(v).is_integer() else v) for k, v in self._contadores.items()}
+            observaciones = {
+                k: dict(v, promedio=round(v["suma"] / v["conteo"], 6) if v["conteo"] else 0.0)
+                for k, v in self._observaciones.items()
+            }
+        return {"contadores": dict(sorted(contadores.items())), "observaciones": dict(sorted(observaciones.items()))}
+
+
+metricas = Metricas()
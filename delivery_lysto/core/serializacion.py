@@ -0,0 +1,122 @@
+"""
+Serialización de respuestas (JSON rápido / MessagePack) – Español
+-----------------------------------------------------------------
+Proveedor JSON de Flask que usa `orjson` cuando está instalado: serializa
+directamente a `bytes` (sin pasar por `str` ni volver a codificar), lo que
+se nota en las respuestas grandes de ZOOM y en la etiqueta PDF en base64 del
+envío orquestado. Sin `orjson` se comporta como el proveedor estándar.
+
+Negociación de contenido: si el cliente envía `Accept: application/msgpack`
+(o `application/x-msgpack`) y el paquete `msgpack` está instalado, `jsonify`
+responde en MessagePack. Todas las rutas (y los manejadores de errores) pasan
+por aquí, así que no hay que tocar las vistas.
+
+El tiempo de serialización se registra por endpoint y formato en
+`metricas` (`serializacion.segundos`).
+"""
+from __future__ import annotations
+import json
+import logging
+import time
+from typing import Any, Optional
+
+from flask import Flask, Response, request
+from flask.json.provider import DefaultJSONProvider
+
+from ..configuracion import Configuracion
+from .metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # opcional
+    msgpack = None
+
+MIME_JSON = "application/json"
+MIMES_MSGPACK = ("application/msgpack", "application/x-msgpack")
+
+
+def _formato_solicitado() -> str:
+    """'msgpack' si el cliente lo prefiere sobre JSON y está disponible; si no, 'json'."""
+    if msgpack is None or not Configuracion.JSON_MSGPACK_HABILITADO or not request:
+        return "json"
+    aceptados = request.accept_mimetypes
+    mejor = aceptados.best_match((MIME_JSON,) + MIMES_MSGPACK, default=MIME_JSON)
+    return "msgpack" if mejor in MIMES_MSGPACK else "json"
+
+
+class ProveedorJSONRapido(DefaultJSONProvider):
+    """`DefaultJSONProvider` con `orjson` (si existe) y negociación de MessagePack."""
+
+    def __init__(self, app: Flask, usar_orjson: Optional[bool] = None) -> None:
+        super().__init__(app)
+        self.usar_orjson = (orjson is not None) if usar_orjson is None else (usar_orjson and orjson is not None)
+
+    @property
+    def motor(self) -> str:
+        return "orjson" if self.usar_orjson else "json"
+
+    def _opciones_orjson(self) -> int:
+        # Fechas vía `default` (formato HTTP, como el proveedor estándar de Flask)
+        opciones = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            opciones |= orjson.OPT_SORT_KEYS
+        return opciones
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        if self.usar_orjson:
+            return orjson.dumps(obj, default=self.default, option=self._opciones_orjson())
+        return json.dumps(obj, default=self.default, ensure_ascii=self.ensure_ascii,
+                          sort_keys=self.sort_keys, separators=(",", ":")).encode("utf-8")
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if self.usar_orjson and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=self._opciones_orjson()).decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if self.usar_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        formato = _formato_solicitado()
+        inicio = time.perf_counter()
+        if formato == "msgpack":
+            cuerpo = msgpack.packb(obj, default=self.default, use_bin_type=True)
+            mimetype = MIMES_MSGPACK[0]
+        else:
+            # bytes directos: sin str intermedio ni codificación adicional
+            cuerpo = self.dumps_bytes(obj)
+            mimetype = self.mimetype
+        metricas.observar("serializacion.segundos", time.perf_counter() - inicio,
+                          endpoint=(request.endpoint if request else None) or "-", formato=formato)
+        respuesta = self._app.response_class(cuerpo, mimetype=mimetype)
+        if msgpack is not None and Configuracion.JSON_MSGPACK_HABILITADO:
+            respuesta.vary.add("Accept")
+        return respuesta
+
+
+def configurar_serializacion(app: Flask) -> None:
+    """Instala el proveedor JSON en la aplicación según `JSON_PROVEEDOR`."""
+    preferido = Configuracion.JSON_PROVEEDOR
+    if preferido == "orjson" and orjson is None:
+        logger.warning("JSON_PROVEEDOR=orjson pero falta el paquete 'orjson' (pip install orjson); se usa json estándar")
+    if Configuracion.JSON_MSGPACK_HABILITADO and msgpack is None:
+        logger.info("MessagePack no disponible (pip install msgpack); solo se responde JSON")
+    app.json = ProveedorJSONRapido(app, usar_orjson=(preferido != "estandar"))
+
+
+def info_serializacion(app: Flask) -> dict:
+    proveedor = app.json
+    return {
+        "json": getattr(proveedor, "motor", "json"),
+        "msgpack": msgpack is not None and Configuracion.JSON_MSGPACK_HABILITADO,
+    }
@@ -8,11 +8,20 @@ import base64, os
 from datetime import datetime
 from typing import Optional
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, url_for
 from ..core.autenticacion import requerir_api_key
 from ..servicios.cliente_zoom import ClienteZoom
 from ..servicios.cliente_armi import ClienteArmi
 from ..configuracion import Configuracion
+from ..servicios.cache_tokens import tokens_zoom, TokenNoObtenido, vigencia_de
+from ..servicios.buscador_geografia import buscador_geografia
+from ..servicios.cobertura import indice_cobertura
+from ..servicios.flujo_ndjson import quiere_ndjson, flujo_zoom, respuesta_ndjson
+from ..servicios.grafo_pasos import GrafoPasos, tiempos as tiempos_pasos
+from ..servicios.trabajos import trabajos_envio, quiere_asincrono
+from ..servicios.lote_envios import Lote, payloads_desde_solicitud
+from ..servicios.idempotencia import envios_idempotentes, clave_idempotencia
+from ..core.errores import RecursoNoEncontrado
 from ..db.conexion import ejecutar_sp_resultados
 
 bp_privadas = Blueprint("privadas", __name__)
@@ -205,8 +214,8 @@ def _persistir_envio_zoom(payload: dict):
             
             # Referencias
             metadata.get("solicitud_id"),  # p_referencia_interna
-            payload.get("_token"),  # p_token_zoom
-            payload.get("_certificado"),  # p_certificado_zoom
+            token_data.get("token"),  # p_token_zoom
+            token_data.get("certificado"),  # p_certificado_zoom
             _to_int(autenticacion.get("codigo_cliente"), 407940),  # p_codigo_cliente_zoom
             
             # Remitente
@@ -305,7 +314,13 @@ def _persistir_envio_zoom(payload: dict):
 def crear_informecliente():
     payload = request.get_json(silent=True) or {}
     cliente = _cliente_Zoom()
-    data = cliente.informe_cliente(payload)
+    campos = {k: payload.get(k) for k in ("codcliente", "clave", "fechaDesde", "fechaHasta")}
+    if quiere_ndjson():
+        # Informes largos: cada registro sale apenas llega de ZOOM (ver flujo_ndjson)
+        if not cliente.validacion_campo_requerido(**campos):
+            return jsonify({"ok": False, "error": "Todos los campos son requeridos para informe_cliente"}), 400
+        return flujo_zoom(cliente, Configuracion.RUTA_ZOOM_INFORMECLIENTE, "POST", cuerpo=campos, privado=True)
+    data = cliente.informe_cliente(**campos)
     if data.get("error"):
         return jsonify({"ok": False, "error": data.get("error")}), 400
     return jsonify({"ok": True, "data": data}), 201
@@ -360,7 +375,57 @@ def crear_envio_zoom_orquestado():
         logger.error("No se recibió payload en el envío orquestado")
         return jsonify({"ok": False, "error": "No se recibió payload"}), 400
     elif debug: logger.info(f"Creando envío orquestado: {payload.get('metadata', {}).get('solicitud_id', 'N/A')}")
-    
+
+    # Reintentos con la misma clave no crean otro envío (ver servicios/idempotencia)
+    clave = clave_idempotencia(payload)
+    if clave is None:
+        cuerpo, status, cabeceras = _crear_envio_orquestado(payload)
+        return jsonify(cuerpo), status, cabeceras
+    (cuerpo, status, cabeceras), repetida = envios_idempotentes.ejecutar(
+        clave, payload, lambda observador: _crear_envio_orquestado(payload, observador))
+    cabeceras = {**cabeceras, "Idempotent-Replayed": "true" if repetida else "false"}
+    return jsonify(cuerpo), status, cabeceras
+
+
+def _crear_envio_orquestado(payload: dict, observador=None) -> tuple[dict, int, dict]:
+    """Envío orquestado síncrono (201) o encolado como trabajo (202); `(cuerpo, status, cabeceras)`.
+
+    `observador(paso, estado)` sigue los pasos del modo síncrono (ver `procesar_envio_orquestado`).
+    """
+    if quiere_asincrono():
+        # Validar ya, procesar después: 202 con el id del trabajo (ver servicios/trabajos)
+        completar_codciudad(payload)
+        validaciones_ok, error = validar_payload_estructura(payload)
+        if not validaciones_ok:
+            return {"ok": False, "error": f"Error en la estructura: {error}"}, 400, {}
+        trabajo = trabajos_envio.encolar(payload)
+        url_estado = url_for("privadas.estado_envio_zoom_orquestado", id_trabajo=trabajo["id_trabajo"])
+        cuerpo = {"ok": True, "id_trabajo": trabajo["id_trabajo"], "estado": trabajo["estado"], "url_estado": url_estado}
+        return cuerpo, 202, {"Location": url_estado}
+
+    resultado, status = procesar_envio_orquestado(payload, _cliente_Zoom(), observador)
+    return resultado, status, {}
+
+
+@bp_privadas.get("/delivery/zoom/envio/<id_trabajo>")
+@requerir_api_key(Delivery_Empresa="ZOOM")
+def estado_envio_zoom_orquestado(id_trabajo: str):
+    """Progreso por paso y resultado final de un envío orquestado asíncrono."""
+    trabajo = trabajos_envio.consultar(id_trabajo)
+    if trabajo is None:
+        raise RecursoNoEncontrado(f"Trabajo {id_trabajo} no encontrado")
+    return jsonify({"ok": True, **trabajo})
+
+
+def procesar_envio_orquestado(payload: dict, cliente_zoom: ClienteZoom, observador=None,
+                              servicios_compartidos: Optional[dict] = None,
+                              fondo: bool = False) -> tuple[dict, int]:
+    """Pasos 1-10 del envío orquestado; devuelve `(resultado, status)`.
+
+    `observador(paso, estado)` recibe el avance de cada paso (ver `GrafoPasos.ejecutar`).
+    `servicios_compartidos`: respuesta de serviciosClientes ya consultada (lotes), evita repetirla.
+    `fondo`: trabajos y lotes corren los pasos en su propio pool (ver `GrafoPasos.ejecutar`).
+    """
     # Resultado acumulado de todo el proceso
     resultado = {
         "metadata": payload.get("metadata", {}),
@@ -370,10 +435,12 @@ def crear_envio_zoom_orquestado():
         "respuesta_final": {}
     }
     
-    cliente_zoom = _cliente_Zoom()
-    
     try:
         resultado["ok"] = True
+        # Completar codciudad a partir del nombre de la ciudad cuando no viene
+        completados = completar_codciudad(payload)
+        if completados:
+            resultado["datos_intermedios"]["codciudad_completado"] = completados
             #===== PASO 1: VALIDACIÓN INICIAL =====
         validaciones_ok, error = validar_payload_estructura(payload)        
         if not validaciones_ok:
@@ -385,74 +452,128 @@ def crear_envio_zoom_orquestado():
         
         resultado["pasos_completados"].append("validacion_estructura")
         
+        # Pasos 2-9 como grafo de dependencias (ver servicios/grafo_pasos): las llamadas a ZOOM
+        # independientes corren en paralelo; solo token -> envío -> tracking/etiqueta es secuencial.
+        # Los resultados se interpretan después en el orden original de los pasos.
+        configuracion_envio = payload.get("configuracion_envio", {})
+        tipo_envio = configuracion_envio.get("tipo_envio")
+
+        def paso_crear_envio(previos):
+            if tipo_envio not in ["nacional", "internacional", "casillero_aereo", "casillero_maritimo"]:
+                return None
+            # Token y certificado llegan solo por `previos`: el payload lo leen pasos en otros hilos
+            token = previos["autenticacion"].get("token")
+            certificado = previos["autenticacion"].get("certificado")
+            if not token:
+                # Sin token no se llama a createShipment; el error de autenticación ya queda en el resultado
+                return {"error": "No se obtuvo token de ZOOM; el envío no se intentó"}
+            # Si ZOOM rechaza el token cacheado, se renueva y se reintenta una vez
+            login, clave = payload["autenticacion_zoom"]["login"], payload["autenticacion_zoom"]["clave"]
+            return tokens_zoom.con_reintento(
+                login, clave, token,
+                _cargador_token_zoom(cliente_zoom, login, clave),
+                lambda token_vigente: crear_envio_segun_tipo(cliente_zoom, payload, tipo_envio, token_vigente, certificado),
+            )
+
+        def guia_de(envio_creado):
+            return (envio_creado or {}).get("entidadRespuesta", [{}])[0].get("numguia")
+
+        def paso_tracking(previos):
+            guia = guia_de(previos["creacion_envio"])
+            if not guia:
+                return None
+            return cliente_zoom.obtener_ultimotrack(
+                codigo=guia,
+                codigo_cliente=payload["autenticacion_zoom"]["codigo_cliente"],
+                tipo_busqueda=1  # Por número de guía
+            )
+
+        def paso_etiqueta(previos):
+            guia = guia_de(previos["creacion_envio"])
+            if not guia or not configuracion_envio.get("generar_etiqueta", True):
+                return None
+            etiqueta = cliente_zoom.etiqueta_termica({
+                "codguia": [guia],
+                "termicaPdf": "1",
+                "terminos": "1"
+            })
+            # guardar de etiqueta en pdf
+            crear_pdf_etiqueta_zoom(cliente_zoom, etiqueta=etiqueta["entidadRespuesta"]["guiaPDF"], guia_zoom=guia)
+            return etiqueta
+
+        grafo = GrafoPasos()
+        grafo.agregar("autenticacion", lambda _: obtener_autenticacion_zoom(cliente_zoom, payload))
+        if configuracion_envio.get("validar_servicios", True) and servicios_compartidos is not None:
+            grafo.agregar("validacion_servicios", lambda _: servicios_compartidos)
+        elif configuracion_envio.get("validar_servicios", True):
+            grafo.agregar("validacion_servicios", lambda _: cliente_zoom.servicios_clientes({
+                "login": payload["autenticacion_zoom"]["login"]
+            }))
+        grafo.agregar("calculo_tarifa", lambda _: calcular_tarifa_envio(cliente_zoom, payload))
+        grafo.agregar("registro_remitente", lambda _: guardar_remitente_zoom(cliente_zoom, payload))
+        grafo.agregar("registro_destinatario", lambda _: guardar_destinatario_zoom(cliente_zoom, payload))
+        grafo.agregar("creacion_envio", paso_crear_envio, depende_de=("autenticacion",))
+        grafo.agregar("tracking_inicial", paso_tracking, depende_de=("creacion_envio",))
+        grafo.agregar("generacion_etiqueta", paso_etiqueta, depende_de=("creacion_envio",))
+        pasos = grafo.ejecutar(observador=observador, fondo=fondo)
+        resultado["datos_intermedios"]["tiempos_pasos"] = tiempos_pasos(pasos)
+
         # ===== PASO 2: OBTENER TOKEN Y CERTIFICADO =====
-        token_data = obtener_autenticacion_zoom(cliente_zoom, payload)
+        token_data = pasos["autenticacion"].resultado()
         if "error" in token_data:
             logger.error(f"Error obteniendo token: {token_data['error']}")
             resultado["errores"].append(f"Error al obtener token: {token_data['error']}")
             resultado["ok"] = False
-            #return jsonify({"ok": False, "error": token_data["error"]}), 401
         elif debug: logger.info("Token y certificado obtenidos correctamente")
-        
-        # # Guardar token para uso posterior
+
         token = token_data.get("token")
-        #print (f"Token obtenido: {token}")
         certificado = token_data.get("certificado")
-        payload["_token"] = token
-        payload["_certificado"] = certificado
-        
         resultado["datos_intermedios"]["autenticacion"] = {
             "token_obtenido": bool(token),
             "certificado_obtenido": bool(certificado)
         }
         resultado["pasos_completados"].append("autenticacion")
-        
-        # # ===== PASO 3: VALIDAR SERVICIOS DEL CLIENTE =====
-        # # Solo si el cliente quiere validar sus servicios disponibles
-        if payload.get("configuracion_envio", {}).get("validar_servicios", True):
+
+        # ===== PASO 3: VALIDAR SERVICIOS DEL CLIENTE =====
+        # Solo si el cliente quiere validar sus servicios disponibles
+        servicios_disponibles = None
+        if "validacion_servicios" in pasos:
             try:
-                servicios = cliente_zoom.servicios_clientes({
-                    "login": payload["autenticacion_zoom"]["login"]
-                })                
+                servicios = pasos["validacion_servicios"].resultado()
                 # Verificar que el servicio solicitado esté disponible
                 codservicio = payload["servicio"]["codservicio"]
-                servicios_disponibles = [s["codserviciofin"] for s in servicios.get("entidadRespuesta", [])]   
+                servicios_disponibles = [s["codserviciofin"] for s in servicios.get("entidadRespuesta", [])]
                 if codservicio not in servicios_disponibles:
                     logger.warning(f"Servicio {codservicio} no disponible para cliente")
                     resultado["errores"].append("Servicio no disponible para el cliente")
                     resultado["datos_intermedios"]["servicios_validados"] = False
                     resultado["ok"] = False
-                    #raise ValueError(f"Servicio {codservicio} no disponible para cliente")
-                else: 
-                    resultado["datos_intermedios"]["servicios_validados"] = True                    
+                else:
+                    resultado["datos_intermedios"]["servicios_validados"] = True
                     if debug: logger.info(f"Servicio {codservicio} valido para el cliente")
-                
+
             except Exception as e:
                 logger.error(f"Error validando servicios del cliente: {str(e)}")
                 resultado["ok"] = False
-                resultado["errores"].append(f"Error validando servicios del cliente: {str(e)}")                
+                resultado["errores"].append(f"Error validando servicios del cliente: {str(e)}")
                 # Continuamos aunque falle la validación de servicios
-        
+
         resultado["pasos_completados"].append("validacion_servicios")
-        
-        # # ===== PASO 4: CALCULAR TARIFA =====
-        tarifa_calculada = calcular_tarifa_envio(cliente_zoom, payload)
+
+        # ===== PASO 4: CALCULAR TARIFA =====
+        tarifa_calculada = pasos["calculo_tarifa"].resultado()
         if "error" in tarifa_calculada:
             resultado["ok"] = False
-            if payload.get("configuracion_envio", {}).get("requerir_tarifa_valida", True):
+            if configuracion_envio.get("requerir_tarifa_valida", True):
                 logger.error(f"Error calculando tarifa: {tarifa_calculada['error']}")
                 resultado["errores"].append(f"Error al calcular tarifa: {tarifa_calculada['error']}")
         else:
-            if debug: 
+            if debug:
                 logger.info("Tarifa calculada correctamente")
                 resultado["pasos_completados"].append("calculo_tarifa")
 
-
-        
-        # # # ===== PASO 5: REGISTRAR/ACTUALIZAR REMITENTE =====
-        # #if payload.get("remitente", {}).get("configuracion", {}).get("guardar_remitente", True):
-        remitente_id = guardar_remitente_zoom(cliente_zoom, payload)
-        
+        # ===== PASO 5: REGISTRAR/ACTUALIZAR REMITENTE =====
+        remitente_id = pasos["registro_remitente"].resultado()
         if remitente_id:
             resultado["datos_intermedios"]["remitente_id"] = remitente_id
             resultado["pasos_completados"].append("registro_remitente")
@@ -461,53 +582,38 @@ def crear_envio_zoom_orquestado():
             resultado["errores"].append("No se pudo guardar remitente")
             logger.warning("No se pudo guardar remitente, continuando...")
             resultado["ok"] = False
-            
-        
-        # # # ===== PASO 6: REGISTRAR/ACTUALIZAR DESTINATARIO =====
-        # # if payload.get("destinatario", {}).get("configuracion", {}).get("guardar_destinatario", True):
-        destinatario = guardar_destinatario_zoom(cliente_zoom, payload)
-        if destinatario.get("codrespuesta") == "COD_001":
-            # resultado["datos_intermedios"]["destinatario_id"] = destinatario_id
+
+        # ===== PASO 6: REGISTRAR/ACTUALIZAR DESTINATARIO =====
+        destinatario = pasos["registro_destinatario"].resultado()
+        if (destinatario or {}).get("codrespuesta") == "COD_001":
             if debug: logger.info(f"Destinatario guardado con exito: {destinatario}")
             resultado["pasos_completados"].append("registro_destinatario")
         else:
-            resultado["errores"].append("No se pudo guardar destinatario")            
+            resultado["errores"].append("No se pudo guardar destinatario")
             logger.warning("No se pudo guardar destinatario")
             resultado["ok"] = False
-        
-        # # # ===== PASO 7: CREAR EL ENVÍO =====
-        
-        tipo_envio = payload["configuracion_envio"]["tipo_envio"]   
-        if tipo_envio in ["nacional", "internacional", "casillero_aereo", "casillero_maritimo"]:
-            envio_creado = crear_envio_segun_tipo(cliente_zoom, payload, tipo_envio,token)
-            guia_zoom = envio_creado.get("entidadRespuesta", [{}])[0].get("numguia")
+
+        # ===== PASO 7: CREAR EL ENVÍO =====
+        envio_creado = pasos["creacion_envio"].resultado()
+        guia_zoom = guia_de(envio_creado)
+        if envio_creado is not None:
             if not guia_zoom and (envio_creado.get("codrespuesta") != "CODE_001"):
-                logger.error(f"Error creando envío: {envio_creado.get('error', 'Respuesta inesperada')}")   
-                resultado["errores"].append(f"Error creando envío: {envio_creado['error']}")
+                logger.error(f"Error creando envío: {envio_creado.get('error', 'Respuesta inesperada')}")
+                resultado["errores"].append(f"Error creando envío: {envio_creado.get('error', 'Respuesta inesperada')}")
                 resultado["respuesta_final"]["envio"] = "Envío no creado"
                 resultado["respuesta_final"]["guia_zoom"] = "Guía no generada"
                 resultado["ok"] = False
             else:
                 if debug: logger.info(f"Envío creado con éxito, guía Zoom: {guia_zoom}")
-                #guia_zoom = envio_creado.get("entidadRespuesta", {}).get("numguia") 
                 resultado["respuesta_final"]["envio"] = "Envío creado exitosamente"
                 resultado["respuesta_final"]["guia_zoom"] = guia_zoom
                 resultado["pasos_completados"].append("creacion_envio")
-                #resultado["respuesta_final"]["guia_zoom"] = guia_zoom
-            
-            
-            
-            
-        
-        # # ===== PASO 8: OBTENER SEGUIMIENTO INMEDIATO =====
+
+        # ===== PASO 8: OBTENER SEGUIMIENTO INMEDIATO =====
+        tracking = None
         if guia_zoom:
             try:
-                tracking = cliente_zoom.obtener_ultimotrack(
-                    codigo=guia_zoom,
-                    codigo_cliente=payload["autenticacion_zoom"]["codigo_cliente"],
-                    tipo_busqueda=1  # Por número de guía
-                )
-                #resultado["respuesta_final"]["tracking"] = tracking
+                tracking = pasos["tracking_inicial"].resultado()
                 if tracking.get("codrespuesta", []) == "COD_000":
                     resultado["pasos_completados"].append("Tracking inicial")
                     if debug: logger.info(f"Seguimiento inicial obtenido para guía {guia_zoom}")
@@ -518,32 +624,20 @@ def crear_envio_zoom_orquestado():
             except Exception as e:
                 logger.error(f"Error obteniendo seguimiento inicial: {str(e)}")
                 resultado["ok"] = False
-        
-        # # ===== PASO 9: GENERAR ETIQUETA TÉRMICA =====
-        if (guia_zoom and 
-            payload.get("configuracion_envio", {}).get("generar_etiqueta", True)):
-            
-            try:
-                etiqueta = cliente_zoom.etiqueta_termica({
-                    "codguia": [guia_zoom],
-                    "termicaPdf": "1",
-                    "terminos": "1"
-                })
 
+        # ===== PASO 9: GENERAR ETIQUETA TÉRMICA =====
+        etiqueta = None
+        if guia_zoom and configuracion_envio.get("generar_etiqueta", True):
+            try:
+                etiqueta = pasos["generacion_etiqueta"].resultado()
                 resultado["respuesta_final"]["etiqueta_envio"] = etiqueta["entidadRespuesta"]["guiaPDF"]
-                
-                logger.info(f"Etiqueta generada exitosamente para guía {guia_zoom}")                
+                logger.info(f"Etiqueta generada exitosamente para guía {guia_zoom}")
                 resultado["pasos_completados"].append("generacion_etiqueta")
-
-                # guardar de etiqueta en pdf
-                crear_pdf_etiqueta_zoom(cliente_zoom, etiqueta=etiqueta["entidadRespuesta"]["guiaPDF"], guia_zoom=guia_zoom)
-                
-
             except Exception as e:
                 logger.warning(f"No se pudo generar etiqueta: {str(e)}")
                 resultado["errores"].append("generacion_etiqueta_fallida")
                 resultado["ok"] = False
-        
+
         # # ===== PASO 10: GUARDAR EN BASE DE DATOS LOCAL =====
         try:
             # agergamos todas lasresultados previos al payload para guardarlo todo junto
@@ -580,17 +674,120 @@ def crear_envio_zoom_orquestado():
         
         resultado["timestamp_final"] = datetime.now().isoformat()
         
-        return jsonify(resultado), 201
+        return resultado, 201
         
     except Exception as e:
         logger.exception("Error crítico en proceso orquestado")
-        return jsonify({
+        return {
             "ok": False,
             "error": f"Error crítico en proceso: {str(e)}",
             "pasos_completados": resultado.get("pasos_completados", []),
             "errores": resultado.get("errores", []),
             "ultimo_paso": resultado.get("pasos_completados", [])[-1] if resultado.get("pasos_completados") else None
-        }), 500
+        }, 500
+
+
+def _procesar_trabajo_envio(payload: dict, observador) -> tuple[dict, int]:
+    """Procesador de la cola `trabajos_envio` (corre en un hilo del pool, con contexto de aplicación)."""
+    return procesar_envio_orquestado(payload, _cliente_Zoom(), observador, fondo=True)
+
+
+trabajos_envio.registrar_procesador(_procesar_trabajo_envio)
+
+
+# --- Lotes de envíos (ver servicios/lote_envios) ---
+@bp_privadas.post("/delivery/zoom/envio/lote")
+@requerir_api_key(Delivery_Empresa="ZOOM")
+def crear_lote_envios_zoom():
+    """Lote de envíos orquestados (arreglo JSON o CSV); resultados por ítem en NDJSON."""
+    payloads = payloads_desde_solicitud()
+    for payload in payloads:
+        completar_codciudad(payload)
+    return _responder_lote(Lote.crear(payloads))
+
+
+@bp_privadas.post("/delivery/zoom/envio/lote/<id_lote>/reanudar")
+@requerir_api_key(Delivery_Empresa="ZOOM")
+def reanudar_lote_envios_zoom(id_lote: str):
+    """Devuelve los ítems ya terminados y procesa los que quedaron pendientes."""
+    lote = Lote.cargar(id_lote)
+    if lote is None:
+        raise RecursoNoEncontrado(f"Lote {id_lote} no encontrado")
+    return _responder_lote(lote)
+
+
+@bp_privadas.get("/delivery/zoom/envio/lote/<id_lote>")
+@requerir_api_key(Delivery_Empresa="ZOOM")
+def estado_lote_envios_zoom(id_lote: str):
+    lote = Lote.cargar(id_lote, con_payload=False)
+    if lote is None:
+        raise RecursoNoEncontrado(f"Lote {id_lote} no encontrado")
+    items = [{k: v for k, v in item.linea().items() if k != "resultado"} for item in lote.items]
+    return jsonify({"ok": True, **lote.resumen(), "items": items})
+
+
+def _responder_lote(lote: Lote):
+    cliente_zoom = _cliente_Zoom()
+    pendientes = [item.payload for item in lote.items if item.estado not in ("COMPLETADO", "FALLIDO")]
+    servicios_por_login = _servicios_compartidos_lote(cliente_zoom, pendientes)
+
+    def procesar(item, observador):
+        payload = json.loads(json.dumps(item.payload))
+        validaciones_ok, error = validar_payload_estructura(payload)
+        if not validaciones_ok:
+            return {"ok": False, "errores": [f"Error en la estructura: {error}"]}, 400
+        # Las etiquetas se piden después, varias guías por llamada (ver _etiquetas_lote)
+        payload.setdefault("configuracion_envio", {})["generar_etiqueta"] = False
+        login = payload["autenticacion_zoom"].get("login")
+        return procesar_envio_orquestado(payload, _cliente_Zoom(), observador,
+                                         servicios_compartidos=servicios_por_login.get(login), fondo=True)
+
+    lineas = lote.ejecutar(procesar, current_app._get_current_object(),
+                           al_terminar=lambda l: _etiquetas_lote(cliente_zoom, l))
+    respuesta = respuesta_ndjson(lineas, meta=lote.resumen)
+    respuesta.call_on_close(lote.liberar)
+    return respuesta
+
+
+def _servicios_compartidos_lote(cliente_zoom: ClienteZoom, payloads: list) -> dict:
+    """Token (queda en `tokens_zoom`) y serviciosClientes una sola vez por login del lote."""
+    servicios_por_login = {}
+    for payload in payloads:
+        login = (payload.get("autenticacion_zoom") or {}).get("login")
+        if not login or login in servicios_por_login:
+            continue
+        servicios_por_login[login] = None
+        try:
+            obtener_autenticacion_zoom(cliente_zoom, payload)
+            if payload.get("configuracion_envio", {}).get("validar_servicios", True):
+                servicios_por_login[login] = cliente_zoom.servicios_clientes({"login": login})
+        except Exception as e:
+            # Cada ítem lo reintentará por su cuenta
+            logger.warning(f"No se pudo precargar token/servicios del lote para {login}: {e}")
+    return servicios_por_login
+
+
+def _etiquetas_lote(cliente_zoom: ClienteZoom, lote: Lote):
+    """Etiquetas térmicas de las guías nuevas del lote, `LOTE_ETIQUETAS_POR_LLAMADA` guías por llamada."""
+    items = [item for item in lote.items
+             if item.guia() and item.payload.get("configuracion_envio", {}).get("generar_etiqueta", True)
+             and "etiqueta_lote" not in item.resultado.get("respuesta_final", {})]
+    tamano = max(1, Configuracion.LOTE_ETIQUETAS_POR_LLAMADA)
+    for numero, inicio in enumerate(range(0, len(items), tamano), start=1):
+        grupo = items[inicio:inicio + tamano]
+        guias = [item.guia() for item in grupo]
+        try:
+            etiqueta = cliente_zoom.etiqueta_termica({"codguia": guias, "termicaPdf": "1", "terminos": "1"})
+            pdf = etiqueta["entidadRespuesta"]["guiaPDF"]
+            crear_pdf_etiqueta_zoom(cliente_zoom, etiqueta=pdf, guia_zoom=f"lote_{lote.id_lote}_{numero}")
+        except Exception as e:
+            logger.warning(f"No se pudo generar etiqueta del lote {lote.id_lote} ({numero}): {e}")
+            yield {"etiquetas": numero, "guias": guias, "ok": False, "error": str(e)}
+            continue
+        for item in grupo:
+            item.resultado["respuesta_final"]["etiqueta_lote"] = numero
+            lote.marcar(item, item.estado, item.resultado, item.codigo_http)
+        yield {"etiquetas": numero, "guias": guias, "ok": True, "etiqueta_envio": pdf}
 
 
 # ===== FUNCIONES AUXILIARES =====
@@ -622,6 +819,34 @@ def crear_pdf_etiqueta_zoom(cliente: ClienteZoom, etiqueta: dict, guia_zoom: str
         return {"error": f"Error generando etiqueta: {str(e)}"}
     
 
+def completar_codciudad(payload: dict) -> dict:
+    """Completa `ciudad.codciudad` con la búsqueda por nombre si falta.
+
+    Solo se usa una coincidencia inequívoca; el destino solo en envíos nacionales
+    (en internacionales la ciudad destino no es del catálogo ZOOM).
+    """
+    completados = {}
+    tipo_envio = payload.get("configuracion_envio", {}).get("tipo_envio")
+    ubicaciones = ["ubicacion_origen"] + (["ubicacion_destino"] if tipo_envio == "nacional" else [])
+    for ubicacion in ubicaciones:
+        ciudad = (payload.get(ubicacion) or {}).get("ciudad")
+        if not isinstance(ciudad, dict) or ciudad.get("codciudad") not in (None, "") or not ciudad.get("nombre"):
+            continue
+        codestado = (payload[ubicacion].get("estado") or {}).get("codestado")
+        try:
+            encontrada = buscador_geografia.resolver_codciudad(ciudad["nombre"], codestado=codestado)
+        except Exception as e:
+            logger.warning(f"No se pudo buscar codciudad para {ubicacion}: {e}")
+            continue
+        if encontrada:
+            codciudad = encontrada["codciudad"]
+            ciudad["codciudad"] = int(codciudad) if codciudad.isdigit() else codciudad
+            completados[ubicacion] = {"nombre": ciudad["nombre"], "codciudad": encontrada["codciudad"],
+                                      "coincidencia": encontrada["nombre"], "puntaje": encontrada["puntaje"]}
+            if debug: logger.info(f"codciudad completado en {ubicacion}: {completados[ubicacion]}")
+    return completados
+
+
 def validar_payload_estructura(payload: dict) -> tuple[bool, str]:
     """Valida la estructura básica del payload"""
     
@@ -702,10 +927,37 @@ def validar_payload_estructura(payload: dict) -> tuple[bool, str]:
         logger.error(f"Tipo de envío no válido: {tipo_envio}")
         return False, f"Tipo de envío no válido: {tipo_envio}"
     elif debug: logger.info(f"Payload recibido: {payload}")
+
+    # Validar cobertura del destino nacional contra el índice local de zonas no servidas
+    if tipo_envio == "nacional" and Configuracion.ZOOM_COBERTURA_VALIDAR_ENVIO and indice_cobertura.cargado:
+        destino = payload["ubicacion_destino"]
+        cobertura = indice_cobertura.verificar({
+            "codciudad": destino["ciudad"].get("codciudad"),
+            "codmunicipio": (destino.get("municipio") or {}).get("codmunicipio"),
+            "codparroquia": (destino.get("parroquia") or {}).get("codparroquia"),
+            "codpostal": destino["ciudad"].get("codpostal"),
+        })
+        if cobertura["servida"] is False:
+            logger.error(f"Destino no servido por ZOOM: {cobertura['motivo']}")
+            return False, f"Destino no servido por ZOOM: {cobertura['motivo']}"
     if debug: logger.info(f"Payload recibido completo y con éxito: {payload}")
     return True, ""
 
 
+def _cargador_token_zoom(cliente: ClienteZoom, login: str, clave: str):
+    """Función que pide un token nuevo a ZOOM: devuelve `(token, vigencia_segundos)`."""
+    def cargar():
+        token_resp = cliente.crear_token({
+            "login": login,
+            "clave": clave
+        })
+        entidad = token_resp.get("entidadRespuesta") if isinstance(token_resp, dict) else None
+        if isinstance(entidad, dict) and entidad.get("token"):
+            return entidad["token"], vigencia_de(entidad)
+        raise TokenNoObtenido(token_resp)
+    return cargar
+
+
 def obtener_autenticacion_zoom(cliente: ClienteZoom, payload: dict) -> dict:
     """Obtiene token y certificado de Zoom"""
     
@@ -722,36 +974,35 @@ def obtener_autenticacion_zoom(cliente: ClienteZoom, payload: dict) -> dict:
             logger.error("Faltan credenciales de login o clave")
             return {"error": "Faltan credenciales de login o clave"}                    
         elif debug: logger.info(f"Payload recibido: {payload}")
-        token_resp = cliente.crear_token({
-            "login": login,
-            "clave": clave
-        })
-        
-        #token = token_resp["entidadRespuesta"].get("token")        
-        if isinstance(token_resp, dict) and token_resp["entidadRespuesta"].get("token"):
-            token = token_resp["entidadRespuesta"].get("token")
-            resultado["token"] = token
-            if debug: logger.info(f"Token obtenido exitosamente para login: {login}, clave: {clave}")
-        else:
-            resultado["error"] = token_resp
-            logger.error(f"Error obteniendo token: {token_resp}, no se procede. login: {login}, clave: {clave}")
+
+        # Token cacheado por login (ver cache_tokens); solo se pide a ZOOM si no hay uno vigente
+        try:
+            entrada = tokens_zoom.obtener(login, clave, _cargador_token_zoom(cliente, login, clave))
+        except TokenNoObtenido as e:
+            resultado["error"] = e.respuesta
+            logger.error(f"Error obteniendo token: {e.respuesta}, no se procede. login: {login}")
             return resultado
-    
-        
+        token = entrada.token
+        resultado["token"] = token
+        if debug: logger.info(f"Token obtenido exitosamente para login: {login}")
+
         # 2. Obtener certificado (para envios internacionales o si se requiere)
         # no siempre es necesario y aun no existe en el payload requerido campo "requerir_certificado"
         if token and payload.get("configuracion_envio", {}).get("requerir_certificado", False):
-            cert_resp = cliente.zoom_cert({
-                "login": login,
-                "password": clave,
-                "token": token,
-                "frase_privada": auth.get("frase_secreta", "")
-            })
-            if isinstance(cert_resp, dict) and "certificado" in cert_resp:
-                resultado["certificado"] = cert_resp["certificado"]
-            else:
-                resultado["certificado"] = cert_resp
-            logger.info(f"Certificado obtenido para los datos de login: {login} y clave: {clave}")
+            def cargar_certificado(token_vigente: str):
+                cert_resp = cliente.zoom_cert({
+                    "login": login,
+                    "password": clave,
+                    "token": token_vigente,
+                    "frase_privada": auth.get("frase_secreta", "")
+                })
+                if isinstance(cert_resp, dict) and "certificado" in cert_resp:
+                    return cert_resp["certificado"]
+                return cert_resp
+
+            resultado["certificado"] = tokens_zoom.certificado(login, clave, auth.get("frase_secreta", ""),
+                                                               entrada, cargar_certificado)
+            logger.info(f"Certificado obtenido para el login: {login}")
     
     except Exception as e:
         logger.error(f"Error en autenticación: {str(e)}")
@@ -922,13 +1173,14 @@ def guardar_destinatario_zoom(cliente: ClienteZoom, payload: dict) -> Optional[s
         return None
 
 
-def crear_envio_segun_tipo(cliente: ClienteZoom, payload: dict, tipo_envio: str, token: str) -> dict:
+def crear_envio_segun_tipo(cliente: ClienteZoom, payload: dict, tipo_envio: str, token: str,
+                           certificado: Optional[str] = None) -> dict:
     """Crea el envío según el tipo"""
     
     if tipo_envio == "nacional":
         return crear_envio_nacional(cliente, payload, token)
     elif tipo_envio in ["internacional", "casillero_aereo", "casillero_maritimo"]:
-        return crear_envio_internacional(cliente, payload, tipo_envio)
+        return crear_envio_internacional(cliente, payload, tipo_envio, certificado)
     else:
         return {"error": f"Tipo de envío no soportado: {tipo_envio}"}
 
@@ -1002,7 +1254,8 @@ def crear_envio_nacional(cliente: ClienteZoom, payload: dict, token: str) -> dic
     
 
 
-def crear_envio_internacional(cliente: ClienteZoom, payload: dict, tipo_envio: str) -> dict:
+def crear_envio_internacional(cliente: ClienteZoom, payload: dict, tipo_envio: str,
+                              certificado: Optional[str] = None) -> dict:
     """Crea envío internacional o casillero"""
     
     if tipo_envio == "internacional":
@@ -1017,7 +1270,7 @@ def crear_envio_internacional(cliente: ClienteZoom, payload: dict, tipo_envio: s
     envio_data = {
         "login": payload["autenticacion_zoom"]["login"],
         "clave": payload["autenticacion_zoom"]["clave"],
-        "certificado": payload.get("_certificado", ""),
+        "certificado": certificado or "",
         "codservicio": codservicio,
         "remitente": payload["remitente"]["datos_personales"]["nombre_completo"],
         "contacto_remitente": payload["remitente"]["datos_personales"].get("contacto", 
@@ -3,31 +3,38 @@ Proxy genérico para acceder a cualquier endpoint documentado de ZOOM.
 Útil para pruebas rápidas mientras se implementan endpoints específicos.
 
 Advertencia: Mantener protegido; respeta `X-API-Key` para marcar llamadas privadas.
+Cada ruta se rige por su política en `PROXY_RUTAS` (ver `servicios/proxy_zoom`):
+métodos permitidos, caché, timeout, coalescencia y modo passthrough/envoltura.
 """
 from flask import Blueprint, request, jsonify, current_app
 from ..servicios.cliente_zoom import ClienteZoom
+from ..servicios.proxy_zoom import politica_de, proxy_passthrough, proxy_envoltura, PASSTHROUGH
 
 bp_proxy = Blueprint("proxy", __name__)
 
 
-def _cliente() -> ClienteZoom:
+def _cliente(timeout=None) -> ClienteZoom:
     cfg = current_app.config
     return ClienteZoom(
         base_url=cfg["ZOOM_BASE_URL"],
         api_key=cfg.get("ZOOM_API_KEY", ""),
         frase_secreta=cfg.get("ZOOM_FRASE_SECRETA", ""),
-        timeout=cfg.get("ZOOM_TIMEOUT", 10.0),
+        timeout=timeout or cfg.get("ZOOM_TIMEOUT", 10.0),
         reintentos=cfg.get("ZOOM_REINTENTOS", 3),
     )
 
 
 @bp_proxy.route("/proxy/<path:ruta>", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
 def proxy_zoom(ruta: str):
-    cliente = _cliente()
     metodo = request.method
+    politica = politica_de(ruta, metodo)
+    cliente = _cliente(politica.timeout)
     params = request.args.to_dict(flat=True)
-    body = request.get_json(silent=True) or {}
     privado = bool(request.headers.get("X-API-Key"))
 
-    data = cliente._solicitar(ruta, metodo=metodo, parametros=params or None, cuerpo=body or None, privado=privado)
+    if politica.modo == PASSTHROUGH:
+        return proxy_passthrough(cliente, ruta, politica, params or None, privado)
+
+    body = request.get_json(silent=True) or {}
+    data = proxy_envoltura(cliente, ruta, politica, params or None, body or None, privado)
     return jsonify({"ok": True, "ruta": ruta, "metodo": metodo, "data": data})
@@ -2,11 +2,27 @@
 Rutas públicas (catálogos, tracking, precios) – Español
 ------------------------------------------------------
 """
-from flask import Blueprint, request, jsonify, current_app
+import concurrent.futures
+import json
+import time
+from typing import Any, Optional
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from ..servicios.cliente_zoom import ClienteZoom
+from ..servicios.matriz_tarifas import matriz_tarifas
+from ..servicios.buscador_geografia import buscador_geografia
+from ..servicios.cobertura import indice_cobertura
+from ..servicios.indice_geografia import indice_geografia, PAIS, ESTADO, CIUDAD, MUNICIPIO
+from ..servicios.comparador_precios import comparar_precios, SERVICIOS
+from ..servicios.bucle_async import ejecutar_y_esperar
+from ..servicios.cache_catalogos import cache_catalogos, clave_catalogo, FRESCO, OBSOLETO
+from ..servicios.flujo_ndjson import quiere_ndjson, flujo_datos, flujo_zoom
+from ..servicios.tracking_lote import rastrear_lote, normalizar_guias, MODOS, MODO_ULTIMO
 from ..configuracion import Configuracion
+from ..core.cache_http import registrar_cache_http
 
 bp_publicas = Blueprint("publicas", __name__)
+# ETag / Last-Modified / Cache-Control por ruta (el blueprint se registra en /api)
+registrar_cache_http(bp_publicas, url_prefix="/api")
 
 
 def _cliente() -> ClienteZoom:
@@ -19,6 +35,11 @@ def _cliente() -> ClienteZoom:
         reintentos=cfg.get("ZOOM_REINTENTOS", 3),
     )
 
+def _catalogo_en_cache(ruta: str, params: Optional[dict] = None) -> Any:
+    """Respuesta del catálogo si ya está en la caché (vigente u obsoleta); None si no."""
+    entrada, estado = cache_catalogos.obtener(clave_catalogo(ruta, params))
+    return entrada.valor if estado in (FRESCO, OBSOLETO) else None
+
 @bp_publicas.get("/getInfoTracking")
 def obtener_infotracking():
     tipo_busqueda = request.args.get("tipo_busqueda")
@@ -51,8 +72,12 @@ def listar_ciudades():
     estado = request.args.get("estado")
     codestado = request.args.get("codestado")
     idioma = request.args.get("idioma")
-    cliente = _cliente()
-    data = cliente.obtener_ciudades(estado=estado, codestado=codestado, idioma=idioma)
+    # `estado` se acepta como alias de `codestado`
+    codestado = codestado or estado
+    data = indice_geografia.ciudades(codestado) if codestado and not idioma else None
+    if data is None:
+        cliente = _cliente()
+        data = cliente.obtener_ciudades(codestado=codestado, idioma=idioma)
     if data.get("error"):
         return jsonify({"ok": False, "error": data.get("error")}), 400
     return jsonify({"ok": True, "data": data, "params": {"estado": estado, "codestado": codestado,"idioma": idioma}})
@@ -63,8 +88,18 @@ def obtener_oficinas():
     codservicio = request.args.get("codservicio")
     siglas = request.args.get("siglas")
     codpais = request.args.get("codpais")    
-    cliente = _cliente()
-    data = cliente.obtener_oficinas(codciudad=codciudad, codservicio=codservicio, siglas=siglas, codpais=codpais)
+    data = indice_geografia.oficinas_de(codciudad, codservicio) if not siglas and not codpais else None
+    if quiere_ndjson():
+        if not codciudad or not codservicio:
+            return jsonify({"ok": False, "error": "codciudad y codservicio son requeridos"}), 400
+        params = {"siglas": siglas, "codpais": codpais, "codciudad": codciudad, "codservicio": codservicio}
+        data = data if data is not None else _catalogo_en_cache(Configuracion.RUTA_ZOOM_OFICINAS, params)
+        if data is not None:
+            return flujo_datos(data)
+        return flujo_zoom(_cliente(), Configuracion.RUTA_ZOOM_OFICINAS, parametros=params)
+    if data is None:
+        cliente = _cliente()
+        data = cliente.obtener_oficinas(codciudad=codciudad, codservicio=codservicio, siglas=siglas, codpais=codpais)
     if data.get("error"):
         return jsonify({"ok": False, "error": data.get("error")}), 400
     return jsonify({"ok": True, "data": data, "params": {"codciudad": codciudad, "codservicio": codservicio, "siglas": siglas, "codpais": codpais}})
@@ -98,11 +133,18 @@ def calcular_tarifa():
     peso = request.args.get("peso")
     valor_mercancia = request.args.get("valor_mercancia")
     valor_declarado = request.args.get("valor_declarado")
+
+    # Punto precalculado en la matriz de tarifas: se responde sin consultar a ZOOM
+    precalculada = matriz_tarifas.buscar(request.args)
+    if precalculada:
+        data, edad = precalculada
+        return jsonify({"ok": True, "data": data, "cache": {"estado": "matriz", "edad": round(edad, 1)}, "params": request.args.to_dict()})
+
     cliente = _cliente()
     data = cliente.obtener_tarifa(tipo_tarifa=tipo_tarifa, modalidad_tarifa=modalidad_tarifa, ciudad_remitente=ciudad_remitente, ciudad_destinatario=ciudad_destinatario, oficina_retirar=oficina_retirar, cantidad_piezas=cantidad_piezas, peso=peso, valor_mercancia=valor_mercancia, valor_declarado=valor_declarado)
     if data.get("error"):
         return jsonify({"ok": False, "error": data.get("error")}), 400
-    return jsonify({"ok": True, "data": data, "params": {"tipo_tarifa": tipo_tarifa, "modalidad_tarifa": modalidad_tarifa, "ciudad_remitente": ciudad_remitente, "ciudad_destinatario": ciudad_destinatario, "oficina_retirar": oficina_retirar, "cantidad_piezas": cantidad_piezas, "peso": peso, "valor_mercancia": valor_mercancia, "valor_declarado": valor_declarado}})
+    return jsonify({"ok": True, "data": data, "cache": cliente.ultima_cache, "params": {"tipo_tarifa": tipo_tarifa, "modalidad_tarifa": modalidad_tarifa, "ciudad_remitente": ciudad_remitente, "ciudad_destinatario": ciudad_destinatario, "oficina_retirar": oficina_retirar, "cantidad_piezas": cantidad_piezas, "peso": peso, "valor_mercancia": valor_mercancia, "valor_declarado": valor_declarado}})
 
 @bp_publicas.get("/getZoomTrackWs")
 def rastrear_envio():
@@ -148,8 +190,10 @@ def obtener_lasttrack():
 def listar_municipios():
     codciudad = request.args.get("codciudad")
     remitente = request.args.get("remitente")
-    cliente = _cliente()
-    data = cliente.obtener_municipios(codciudad=codciudad, remitente=remitente)
+    data = indice_geografia.municipios(codciudad) if not remitente else None
+    if data is None:
+        cliente = _cliente()
+        data = cliente.obtener_municipios(codciudad=codciudad, remitente=remitente)
     if data.get("error"):
         return jsonify({"ok": False, "error": data.get("error")}), 400
     return jsonify({"ok": True, "data": data, "params": {"codciudad": codciudad, "remitente": remitente}})
@@ -159,12 +203,59 @@ def listar_parroquias():
     codmunicipio = request.args.get("codmunicipio")
     codciudad = request.args.get("codciudad")
     remitente = request.args.get("remitente")
-    cliente = _cliente()
-    data = cliente.obtener_parroquias(codmunicipio=codmunicipio, codciudad=codciudad, remitente=remitente)
+    data = indice_geografia.parroquias(codmunicipio, codciudad) if not remitente else None
+    if data is None:
+        cliente = _cliente()
+        data = cliente.obtener_parroquias(codmunicipio=codmunicipio, codciudad=codciudad, remitente=remitente)
     if data.get("error"):
         return jsonify({"ok": False, "error": data.get("error")}), 400
     return jsonify({"ok": True, "data": data, "params": {"codmunicipio": codmunicipio, "codciudad": codciudad, "remitente": remitente}})
 
+@bp_publicas.get("/catalog/arbol")
+def arbol_geografico():
+    """Subárbol geográfico completo en una sola respuesta, desde el índice en memoria.
+
+    Raíz: `codestado`, `codciudad` o `codmunicipio` (sin ninguno, todo el país).
+    Opcionales: `profundidad` (niveles a bajar) y `codservicio` (incluye oficinas por ciudad).
+    """
+    profundidad = request.args.get("profundidad", type=int)
+    codservicio = request.args.get("codservicio")
+    nivel, codigo = PAIS, ""
+    for campo, nivel_campo in (("codmunicipio", MUNICIPIO), ("codciudad", CIUDAD), ("codestado", ESTADO)):
+        if request.args.get(campo):
+            nivel, codigo = nivel_campo, request.args.get(campo)
+            break
+    if not indice_geografia.cargado:
+        return jsonify({"ok": False, "error": "Índice geográfico no disponible"}), 503
+    data = indice_geografia.subarbol(nivel, codigo, profundidad=profundidad, codservicio=codservicio)
+    if data is None:
+        return jsonify({"ok": False, "error": f"{nivel} {codigo} no encontrado"}), 404
+    return jsonify({"ok": True, "data": data, "params": request.args.to_dict()})
+
+@bp_publicas.get("/buscar/ciudades")
+def buscar_ciudades():
+    """Ciudades por nombre aproximado (sin acentos, tolera errores de tipeo). Filtro opcional: `codestado`."""
+    q = request.args.get("q", "")
+    if not q.strip():
+        return jsonify({"ok": False, "error": "q es requerido"}), 400
+    limite = min(request.args.get("limite", type=int) or Configuracion.ZOOM_BUSQUEDA_LIMITE, 50)
+    inicio = time.perf_counter()
+    data = buscador_geografia.buscar_ciudades(q, limite=limite, codestado=request.args.get("codestado"))
+    return jsonify({"ok": True, "data": data, "duracion_ms": round((time.perf_counter() - inicio) * 1000, 3),
+                    "params": request.args.to_dict()})
+
+@bp_publicas.get("/buscar/oficinas")
+def buscar_oficinas():
+    """Oficinas por nombre aproximado. Filtro opcional: `codciudad`."""
+    q = request.args.get("q", "")
+    if not q.strip():
+        return jsonify({"ok": False, "error": "q es requerido"}), 400
+    limite = min(request.args.get("limite", type=int) or Configuracion.ZOOM_BUSQUEDA_LIMITE, 50)
+    inicio = time.perf_counter()
+    data = buscador_geografia.buscar_oficinas(q, limite=limite, codciudad=request.args.get("codciudad"))
+    return jsonify({"ok": True, "data": data, "duracion_ms": round((time.perf_counter() - inicio) * 1000, 3),
+                    "params": request.args.to_dict()})
+
 @bp_publicas.get("/getOficinasGE")
 def listar_oficinasGE():
     codigo_ciudad_destino = request.args.get("codigo_ciudad_destino")
@@ -225,8 +316,10 @@ def obtener_modalidad_cod():
 @bp_publicas.get("/getEstados")
 def listar_estados():
     filtro = request.args.get("filtro")
-    cliente = _cliente()
-    data = cliente.obtener_estados(filtro=filtro)
+    data = indice_geografia.estados() if not filtro else None
+    if data is None:
+        cliente = _cliente()
+        data = cliente.obtener_estados(filtro=filtro)
     if data.get("error"):
         return jsonify({"ok": False, "error": data.get("error")}), 400
     return jsonify({"ok": True, "data": data, "params": {"filtro": filtro}})
@@ -277,7 +370,7 @@ def consultar_precios_ws():
     cliente = _cliente()
     
     match tipo_precio:
-        case 1,2:
+        case 1 | 2:
             # COD=1 y Nacional=2
             tipo_tarifa = request.args.get("tipo_tarifa", type=int)
             modalidad_tarifa = request.args.get("modalidad_tarifa", type=int)
@@ -331,9 +424,7 @@ def consultar_precios_ws():
                 codpais_remitente, codpais_destinatario, oficina_retirar, peso,
                 valor_mercancia, codtipoenv, codservicio, ciudad_destinatario
             )
-            if data.get("error"):
-                return jsonify({"ok": False, "error": data.get("error")}), 400
-            return jsonify({"ok": True, "data": data})
+            
         case 5:
             # Casillero Internacional Marítimo
             codpais_remitente = request.args.get("codpais_remitente", type=int)
@@ -369,11 +460,11 @@ def consultar_precios_ws():
             data = cliente.consultar_precio_venta_divisas_efectivo(monto)
             
         case _:
-            data.error = "tipo_precio no soportado"
+            data = {"error": "tipo_precio no soportado"}
                     
     if data.get("error"):
         return jsonify({"ok": False, "error": data.get("error")}), 400
-    return jsonify({"ok": True, "data": data})
+    return jsonify({"ok": True, "data": data, "cache": cliente.ultima_cache})
 #-----------------consultarPreciosWs
 @bp_publicas.get("/consultaTrackingWs")
 def consulta_trackingws():
@@ -386,6 +477,35 @@ def consulta_trackingws():
         return jsonify({"ok": False, "error": data.get("error")}), 400
     return jsonify({"ok": True, "data": data, "params": {"tipo_busqueda": tipo_busqueda, "numero": numero, "web": web}})
 
+@bp_publicas.post("/cobertura")
+def verificar_cobertura():
+    """Verifica muchas direcciones contra las zonas no servidas, en memoria.
+
+    Cuerpo: {"direcciones": [{"id": ..., "codciudad": ..., "codmunicipio": ..., "codparroquia": ..., "codpostal": ..., "zona": ...}]}
+    `servida` es null cuando la ciudad no está en el índice.
+    """
+    cuerpo = request.get_json(silent=True) or {}
+    if not isinstance(cuerpo, dict):
+        return jsonify({"ok": False, "error": "El cuerpo debe ser un objeto JSON"}), 400
+    direcciones = cuerpo.get("direcciones")
+    if not isinstance(direcciones, list) or not direcciones:
+        return jsonify({"ok": False, "error": "'direcciones' debe ser una lista no vacía"}), 400
+    if len(direcciones) > Configuracion.COBERTURA_LOTE_MAX:
+        return jsonify({"ok": False, "error": f"Máximo {Configuracion.COBERTURA_LOTE_MAX} direcciones por consulta"}), 400
+    if not indice_cobertura.cargado:
+        return jsonify({"ok": False, "error": "Índice de cobertura no disponible"}), 503
+    resultados = []
+    for direccion in direcciones:
+        if not isinstance(direccion, dict):
+            resultados.append({"servida": None, "motivo": "dirección inválida"})
+            continue
+        resultado = indice_cobertura.verificar(direccion)
+        if "id" in direccion:
+            resultado["id"] = direccion["id"]
+        resultados.append(resultado)
+    no_servidas = sum(1 for r in resultados if r["servida"] is False)
+    return jsonify({"ok": True, "total": len(resultados), "no_servidas": no_servidas, "resultados": resultados})
+
 @bp_publicas.get("/zonasNoServidasWs")
 def zonas_no_servidasws():
     codciudad = request.args.get("codciudad")
@@ -405,6 +525,11 @@ def tipo_documento():
 
 @bp_publicas.get("/listadoGenericoCiudades")
 def listado_generico_ciudades():
+    if quiere_ndjson():
+        data = _catalogo_en_cache(Configuracion.RUTA_ZOOM_LISTADOGENERICOCIUDADES)
+        if data is not None:
+            return flujo_datos(data)
+        return flujo_zoom(_cliente(), Configuracion.RUTA_ZOOM_LISTADOGENERICOCIUDADES)
     cliente = _cliente()
     data = cliente.obtener_listado_generico_ciudades()
     if data.get("error"):
@@ -420,6 +545,78 @@ def listar_ciudadesws():
         return jsonify({"ok": False, "error": data.get("error")}), 400
     return jsonify({"ok": True, "data": data})
 
+@bp_publicas.post("/tracking/batch")
+def tracking_lote():
+    """Tracking de varias guías en paralelo.
+
+    Cuerpo: {"guias": [...], "modo": "ultimo" | "trackws", "codigo_cliente": ..., "tipo_busqueda": ..., "web": ...}
+    Con `?stream=ndjson` (o `Accept: application/x-ndjson`) cada resultado se envía
+    en una línea apenas llega; la última línea resume el lote.
+    """
+    cuerpo = request.get_json(silent=True) or {}
+    if not isinstance(cuerpo, dict):
+        return jsonify({"ok": False, "error": "El cuerpo debe ser un objeto JSON"}), 400
+    try:
+        guias = normalizar_guias(cuerpo.get("guias"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    modo = cuerpo.get("modo", MODO_ULTIMO)
+    if modo not in MODOS:
+        return jsonify({"ok": False, "error": f"modo inválido, use uno de: {', '.join(MODOS)}"}), 400
+    if not guias:
+        return jsonify({"ok": False, "error": "Debe indicar al menos una guía"}), 400
+    if len(guias) > Configuracion.TRACKING_LOTE_MAX:
+        return jsonify({"ok": False, "error": f"Máximo {Configuracion.TRACKING_LOTE_MAX} guías por lote"}), 400
+    if modo == MODO_ULTIMO and not cuerpo.get("codigo_cliente"):
+        return jsonify({"ok": False, "error": "codigo_cliente es requerido para el modo 'ultimo'"}), 400
+
+    opciones = {k: cuerpo.get(k) for k in ("codigo_cliente", "tipo_busqueda", "web")}
+    resultados = rastrear_lote(guias, modo=modo, opciones=opciones)
+
+    if quiere_ndjson():
+        def generar():
+            errores = 0
+            for guia, datos, error in resultados:
+                errores += bool(error)
+                linea = {"guia": guia, "ok": False, "error": error} if error else {"guia": guia, "ok": True, "data": datos}
+                yield json.dumps(linea, ensure_ascii=False, default=str) + "\n"
+            yield json.dumps({"fin": True, "total": len(guias), "errores": errores}) + "\n"
+        return Response(stream_with_context(generar()), mimetype="application/x-ndjson")
+
+    datos_por_guia, errores = {}, {}
+    for guia, datos, error in resultados:
+        if error:
+            errores[guia] = error
+        else:
+            datos_por_guia[guia] = datos
+    return jsonify({"ok": not errores, "total": len(guias), "resultados": datos_por_guia, "errores": errores})
+
+@bp_publicas.post("/precios/comparar")
+def comparar_precios_envio():
+    """Compara en paralelo los tipos de precio aplicables a un envío.
+
+    Cuerpo: descripción del envío con los parámetros de consultarPreciosWs
+    (`peso`, `ciudad_remitente`, `ciudad_destinatario`, `tipo_tarifa`, `siglas_pd`,
+    `codpais_destinatario`, ...) y opcionalmente `tipos_precio` (lista de 1-5).
+    """
+    descripcion = request.get_json(silent=True) or {}
+    if not isinstance(descripcion, dict):
+        return jsonify({"ok": False, "error": "El cuerpo debe ser un objeto JSON"}), 400
+    tipos = descripcion.get("tipos_precio")
+    if tipos is not None:
+        if not isinstance(tipos, list) or any(
+            not isinstance(t, int) or isinstance(t, bool) or t not in SERVICIOS for t in tipos
+        ):
+            return jsonify({"ok": False, "error": f"tipos_precio debe ser una lista con valores de: {sorted(SERVICIOS)}"}), 400
+        tipos = list(dict.fromkeys(tipos))
+    try:
+        ranking = ejecutar_y_esperar(comparar_precios(descripcion, tipos), Configuracion.PRECIOS_COMPARAR_TIMEOUT)
+    except concurrent.futures.TimeoutError:
+        return jsonify({"ok": False, "error": "Tiempo de espera agotado consultando precios"}), 504
+    if not ranking:
+        return jsonify({"ok": False, "error": "La descripción no tiene los campos de ningún tipo de precio"}), 400
+    return jsonify({"ok": any(r["ok"] for r in ranking), "data": ranking})
+
 #------------------------------ armi -----------------------------
 
 
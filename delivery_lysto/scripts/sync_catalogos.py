@@ -0,0 +1,44 @@
+"""
+Sincroniza el snapshot local de catálogos ZOOM.
+Rastrea estados, ciudades, municipios, parroquias, oficinas, sucursales,
+zonas no servidas, tipos de tarifa y modalidades, y escribe una nueva versión del snapshot
+solo con las diferencias respecto a la anterior.
+Uso:
+    python -m delivery_lysto.scripts.sync_catalogos [--archivo RUTA] [--paralelo N]
+"""
+import argparse
+import asyncio
+
+from ..configuracion import Configuracion
+from ..servicios.rastreo_catalogos import rastrear_catalogos
+from ..servicios.snapshot_catalogos import escribir_snapshot
+from ..servicios.transporte_zoom import cerrar_transporte_async
+
+
+async def _rastrear(paralelo: int):
+    try:
+        return await rastrear_catalogos(max_paralelo=paralelo)
+    finally:
+        await cerrar_transporte_async()
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Sincroniza el snapshot de catálogos ZOOM")
+    p.add_argument("--archivo", default=Configuracion.ZOOM_SNAPSHOT_ARCHIVO)
+    p.add_argument("--paralelo", type=int, default=Configuracion.ZOOM_RASTREO_MAX_PARALELO)
+    args = p.parse_args()
+
+    respuestas = asyncio.run(_rastrear(args.paralelo))
+    if not respuestas:
+        print("No se obtuvo ningún catálogo de ZOOM; el snapshot no se modifica.")
+        return
+    resumen = escribir_snapshot(respuestas, args.archivo)
+    print(
+        f"Snapshot {args.archivo} v{resumen['version']}: {resumen['nuevas']} nuevas, "
+        f"{resumen['modificadas']} modificadas, {resumen['sin_cambios']} sin cambios, "
+        f"{resumen['eliminadas']} eliminadas, {resumen['conservadas']} conservadas (sin respuesta de ZOOM)."
+    )
+
+
+if __name__ == "__main__":
+    main()
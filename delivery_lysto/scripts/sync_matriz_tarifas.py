@@ -0,0 +1,30 @@
+"""
+Recalcula la matriz local de tarifas precalculadas.
+Consulta CalcularTarifa para cada par origen/destino de ZOOM_MATRIZ_PARES y
+cada tipo de tarifa, modalidad y banda de peso configurados.
+Uso:
+    python -m delivery_lysto.scripts.sync_matriz_tarifas [--archivo RUTA]
+"""
+import argparse
+
+from ..configuracion import Configuracion
+from ..servicios.matriz_tarifas import matriz_tarifas, puntos_configurados
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Recalcula la matriz de tarifas precalculadas")
+    p.add_argument("--archivo", default=Configuracion.ZOOM_MATRIZ_ARCHIVO)
+    args = p.parse_args()
+
+    if not puntos_configurados():
+        print("ZOOM_MATRIZ_PARES está vacío; no hay puntos que calcular.")
+        return
+    resumen = matriz_tarifas.recalcular(args.archivo)
+    print(
+        f"Matriz {args.archivo}: {resumen['calculados']}/{resumen['esperados']} puntos, "
+        f"{resumen['errores']} errores, {resumen['duracion']}s."
+    )
+
+
+if __name__ == "__main__":
+    main()
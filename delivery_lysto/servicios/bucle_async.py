@@ -0,0 +1,74 @@
+"""
+Event loop en segundo plano – Español
+-------------------------------------
+Las vistas Flask son sincrónicas; para usar `ClienteZoomAsync` desde ellas se
+mantiene un único event loop por proceso en un hilo daemon. Las corrutinas se
+envían con `ejecutar(...)` y devuelven un `concurrent.futures.Future`.
+"""
+from __future__ import annotations
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_hilo: Optional[threading.Thread] = None
+_pid: Optional[int] = None
+
+
+def _correr(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def obtener_bucle() -> asyncio.AbstractEventLoop:
+    """Loop compartido del proceso (se recrea tras un fork)."""
+    global _loop, _hilo, _pid
+    pid = os.getpid()
+    if _loop is not None and _pid == pid and _hilo is not None and _hilo.is_alive():
+        return _loop
+    with _lock:
+        if _loop is None or _pid != pid or _hilo is None or not _hilo.is_alive():
+            _loop = asyncio.new_event_loop()
+            _hilo = threading.Thread(target=_correr, args=(_loop,), name="bucle-zoom", daemon=True)
+            _hilo.start()
+            _pid = pid
+            logger.info("Event loop en segundo plano iniciado para llamadas asíncronas a ZOOM")
+        return _loop
+
+
+def ejecutar(corrutina: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+    """Programa la corrutina en el loop de fondo; no bloquea."""
+    return asyncio.run_coroutine_threadsafe(corrutina, obtener_bucle())
+
+
+def ejecutar_y_esperar(corrutina: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+    """Ejecuta la corrutina en el loop de fondo y espera su resultado (se cancela si vence `timeout`)."""
+    futuro = ejecutar(corrutina)
+    try:
+        return futuro.result(timeout)
+    except concurrent.futures.TimeoutError:
+        futuro.cancel()
+        raise
+
+
+def detener_bucle() -> None:
+    global _loop
+    with _lock:
+        if _loop is not None and _pid == os.getpid() and _loop.is_running():
+            from .transporte_zoom import cerrar_transporte_async
+            try:
+                asyncio.run_coroutine_threadsafe(cerrar_transporte_async(), _loop).result(5)
+            except Exception:
+                pass
+            _loop.call_soon_threadsafe(_loop.stop)
+        _loop = None
+
+
+atexit.register(detener_bucle)
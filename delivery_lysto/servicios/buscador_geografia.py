@@ -0,0 +1,284 @@
+"""
+Búsqueda de ciudades y oficinas por nombre – Español
+----------------------------------------------------
+Índice en memoria, insensible a acentos y mayúsculas, sobre los catálogos de
+ciudades y oficinas de ZOOM:
+
+- Prefijos: lista ordenada de `(palabra, id)` consultada con `bisect`.
+- Trigramas: `{trigrama: [ids]}` para tolerar errores de tipeo.
+
+Puntaje: nombre exacto 1.0, el nombre empieza con la consulta 0.95, todas las
+palabras de la consulta son prefijo de alguna palabra del nombre 0.85; si no,
+coeficiente de Dice de trigramas (× 0.8).
+
+Fuentes: el índice geográfico si está cargado; si no, `listadoGenericoCiudades`
+para ciudades y las oficinas del snapshot local. El índice se reconstruye en
+segundo plano cuando la fuente cambia o pasa `ZOOM_BUSQUEDA_TTL`.
+"""
+from __future__ import annotations
+import bisect
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .rastreo_catalogos import registros, codigo_de
+from .indice_geografia import indice_geografia, CAMPOS_CODIGO, CIUDAD, OFICINA
+from .snapshot_catalogos import leer_snapshot
+from ..configuracion import Configuracion
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_NOMBRE = {
+    CIUDAD: ("nombre", "nombre_ciudad", "nombreciudad", "ciudad", "descripcion"),
+    OFICINA: ("nombre", "nombre_oficina", "nombreoficina", "oficina", "descripcion"),
+}
+CAMPOS_ESTADO = ("codestado", "codigo_estado")
+CAMPOS_CIUDAD = ("codciudad", "codigo_ciudad")
+
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+
+def normalizar(texto: Any) -> str:
+    """Minúsculas, sin acentos ni signos: 'Ciudad Bolívar' -> 'ciudad bolivar'."""
+    texto = unicodedata.normalize("NFKD", str(texto or ""))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _NO_ALFANUMERICO.sub(" ", texto).strip()
+
+
+def trigramas(texto: str) -> set:
+    relleno = f"  {texto} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+@dataclass
+class Documento:
+    codigo: str
+    nombre: str
+    normalizado: str
+    registro: dict
+    codestado: Optional[str] = None
+    codciudad: Optional[str] = None
+    total_trigramas: int = 0
+
+
+@dataclass
+class IndiceNombres:
+    """Índice de prefijos + trigramas sobre una lista de documentos."""
+    documentos: List[Documento] = field(default_factory=list)
+    palabras: List[Tuple[str, int]] = field(default_factory=list)
+    postings: Dict[str, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def construir(cls, documentos: List[Documento]) -> "IndiceNombres":
+        indice = cls(documentos=documentos)
+        postings: Dict[str, List[int]] = {}
+        for i, doc in enumerate(documentos):
+            for palabra in set(doc.normalizado.split()):
+                indice.palabras.append((palabra, i))
+            tris = trigramas(doc.normalizado)
+            doc.total_trigramas = len(tris)
+            for t in tris:
+                postings.setdefault(t, []).append(i)
+        indice.palabras.sort()
+        indice.postings = postings
+        return indice
+
+    def _con_prefijo(self, prefijo: str) -> set:
+        inicio = bisect.bisect_left(self.palabras, (prefijo, -1))
+        ids = set()
+        for palabra, i in self.palabras[inicio:]:
+            if not palabra.startswith(prefijo):
+                break
+            ids.add(i)
+        return ids
+
+    def buscar(self, consulta: str, limite: int = 10, filtro=None) -> List[Tuple[float, Documento]]:
+        q = normalizar(consulta)
+        if not q:
+            return []
+        puntajes: Dict[int, float] = {}
+
+        # Prefijos: cada palabra de la consulta debe ser prefijo de alguna palabra del nombre
+        comunes: Optional[set] = None
+        for palabra in q.split():
+            ids = self._con_prefijo(palabra)
+            comunes = ids if comunes is None else comunes & ids
+        for i in comunes or ():
+            nombre = self.documentos[i].normalizado
+            puntajes[i] = 1.0 if nombre == q else 0.95 if nombre.startswith(q) else 0.85
+
+        # Trigramas: similitud aproximada (errores de tipeo, palabras incompletas)
+        tris_q = trigramas(q)
+        compartidos = Counter()
+        for t in tris_q:
+            compartidos.update(self.postings.get(t, ()))
+        for i, n in compartidos.items():
+            dice = 2.0 * n / (len(tris_q) + self.documentos[i].total_trigramas)
+            puntajes[i] = max(puntajes.get(i, 0.0), 0.8 * dice)
+
+        candidatos = [
+            (round(p, 4), self.documentos[i]) for i, p in puntajes.items()
+            if p >= Configuracion.ZOOM_BUSQUEDA_PUNTAJE_MINIMO and (filtro is None or filtro(self.documentos[i]))
+        ]
+        candidatos.sort(key=lambda x: (-x[0], len(x[1].normalizado), x[1].normalizado))
+        return candidatos[:limite]
+
+
+def _documento(nivel: str, registro: dict, codestado: Optional[str] = None, codciudad: Optional[str] = None) -> Optional[Documento]:
+    codigo = codigo_de(registro, *CAMPOS_CODIGO[nivel])
+    nombre = codigo_de(registro, *CAMPOS_NOMBRE[nivel])
+    if not codigo or not nombre:
+        return None
+    return Documento(
+        codigo=codigo, nombre=nombre, normalizado=normalizar(nombre), registro=registro,
+        codestado=codestado or codigo_de(registro, *CAMPOS_ESTADO),
+        codciudad=codciudad or codigo_de(registro, *CAMPOS_CIUDAD),
+    )
+
+
+class BuscadorGeografia:
+    """Índices de búsqueda de ciudades y oficinas, reconstruidos cuando cambia la fuente."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.ciudades = IndiceNombres()
+        self.oficinas = IndiceNombres()
+        self.construido: Optional[float] = None
+        self.origen: Optional[str] = None
+        self._version_fuente: Any = None
+        self._reconstruyendo = False
+        self.consultas = 0
+
+    # ------------------------------------------------------------ fuentes
+
+    def _fuente_indice(self) -> Tuple[List[Documento], List[Documento]]:
+        with indice_geografia._lock:
+            ciudades = [
+                _documento(CIUDAD, r, codestado=indice_geografia.padres.get((CIUDAD, cod)))
+                for cod, r in indice_geografia.registros[CIUDAD].items()
+            ]
+            oficinas = [
+                _documento(OFICINA, indice_geografia.registros[OFICINA][cod], codciudad=codciudad)
+                for (codciudad, _), codigos in indice_geografia.oficinas.items()
+                for cod in codigos if cod in indice_geografia.registros[OFICINA]
+            ]
+        return [d for d in ciudades if d], list({d.codigo: d for d in oficinas if d}.values())
+
+    def _fuente_catalogos(self) -> Tuple[List[Documento], List[Documento]]:
+        from .cliente_zoom import ClienteZoom
+        cliente = ClienteZoom(
+            base_url=Configuracion.ZOOM_BASE_URL,
+            timeout=Configuracion.ZOOM_TIMEOUT,
+            reintentos=Configuracion.ZOOM_REINTENTOS,
+        )
+        ciudades = [_documento(CIUDAD, r) for r in registros(cliente.obtener_listado_generico_ciudades())]
+        oficinas: Dict[str, Documento] = {}
+        try:
+            _, filas = leer_snapshot(Configuracion.ZOOM_SNAPSHOT_ARCHIVO)
+        except Exception as e:
+            logger.warning(f"No se pudo leer el snapshot para la búsqueda de oficinas: {e}")
+            filas = {}
+        for (ruta, params), fila in filas.items():
+            if ruta != Configuracion.RUTA_ZOOM_OFICINAS:
+                continue
+            codciudad = dict(params).get("codciudad")
+            for r in registros(json.loads(fila["datos"])):
+                doc = _documento(OFICINA, r, codciudad=codciudad)
+                if doc:
+                    oficinas[doc.codigo] = doc
+        return [d for d in ciudades if d], list(oficinas.values())
+
+    def _version(self) -> Any:
+        if Configuracion.ZOOM_GEOGRAFIA_HABILITADA and indice_geografia.cargado:
+            return ("indice", indice_geografia.version)
+        return ("catalogos", None)
+
+    # ---------------------------------------------------------- construcción
+
+    def reconstruir(self) -> None:
+        version = self._version()
+        inicio = time.perf_counter()
+        if version[0] == "indice":
+            ciudades, oficinas = self._fuente_indice()
+        else:
+            ciudades, oficinas = self._fuente_catalogos()
+        indice_ciudades = IndiceNombres.construir(ciudades)
+        indice_oficinas = IndiceNombres.construir(oficinas)
+        with self._lock:
+            self.ciudades, self.oficinas = indice_ciudades, indice_oficinas
+            self.construido = time.time()
+            self.origen = version[0]
+            self._version_fuente = version
+        logger.info(
+            f"Índice de búsqueda construido desde {version[0]}: {len(ciudades)} ciudades, "
+            f"{len(oficinas)} oficinas en {(time.perf_counter() - inicio) * 1000:.1f} ms"
+        )
+
+    def _reconstruir_fondo(self) -> None:
+        try:
+            self.reconstruir()
+        except Exception as e:
+            logger.warning(f"No se pudo reconstruir el índice de búsqueda: {e}")
+        finally:
+            self._reconstruyendo = False
+
+    def asegurar(self) -> None:
+        """Construye el índice la primera vez; luego lo renueva en segundo plano si quedó viejo."""
+        if self.construido is None:
+            with self._lock:
+                pendiente = self.construido is None
+            if pendiente:
+                self.reconstruir()
+            return
+        vencido = time.time() - self.construido > Configuracion.ZOOM_BUSQUEDA_TTL
+        if (vencido or self._version() != self._version_fuente) and not self._reconstruyendo:
+            self._reconstruyendo = True
+            threading.Thread(target=self._reconstruir_fondo, name="buscador-geografia", daemon=True).start()
+
+    # ------------------------------------------------------------ consultas
+
+    def buscar_ciudades(self, q: str, limite: Optional[int] = None, codestado: Optional[str] = None) -> List[Dict[str, Any]]:
+        self.asegurar()
+        self.consultas += 1
+        # Sin estado conocido (p. ej. listadoGenericoCiudades) el registro no se descarta
+        filtro = (lambda d: d.codestado in (None, str(codestado))) if codestado else None
+        return [
+            {"codciudad": d.codigo, "nombre": d.nombre, "codestado": d.codestado, "puntaje": p, "datos": d.registro}
+            for p, d in self.ciudades.buscar(q, limite or Configuracion.ZOOM_BUSQUEDA_LIMITE, filtro)
+        ]
+
+    def buscar_oficinas(self, q: str, limite: Optional[int] = None, codciudad: Optional[str] = None) -> List[Dict[str, Any]]:
+        self.asegurar()
+        self.consultas += 1
+        filtro = (lambda d: d.codciudad == str(codciudad)) if codciudad else None
+        return [
+            {"codoficina": d.codigo, "nombre": d.nombre, "codciudad": d.codciudad, "puntaje": p, "datos": d.registro}
+            for p, d in self.oficinas.buscar(q, limite or Configuracion.ZOOM_BUSQUEDA_LIMITE, filtro)
+        ]
+
+    def resolver_codciudad(self, nombre: str, codestado: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Mejor ciudad para `nombre` si es inequívoca (puntaje >= umbral y sin empate)."""
+        resultados = self.buscar_ciudades(nombre, limite=2, codestado=codestado)
+        if not resultados or resultados[0]["puntaje"] < Configuracion.ZOOM_BUSQUEDA_UMBRAL_CODCIUDAD:
+            return None
+        if len(resultados) > 1 and resultados[1]["puntaje"] == resultados[0]["puntaje"]:
+            return None
+        return resultados[0]
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "origen": self.origen,
+            "construido": self.construido,
+            "ciudades": len(self.ciudades.documentos),
+            "oficinas": len(self.oficinas.documentos),
+            "consultas": self.consultas,
+        }
+
+
+buscador_geografia = BuscadorGeografia()
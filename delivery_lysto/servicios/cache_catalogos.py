@@ -0,0 +1,199 @@
+"""
+Caché TTL para catálogos de ZOOM – Español
+------------------------------------------
+Caché en memoria (por worker) delante de los métodos `obtener_*` de catálogo:
+
+- TTL por catálogo (ruta ZOOM), configurable en `Configuracion.ZOOM_CACHE_TTLS`.
+- Clave = ruta + parámetros normalizados (sin None/"" y ordenados).
+- Expulsión LRU al superar `ZOOM_CACHE_MAX_ENTRADAS`.
+- stale-while-revalidate: vencido el TTL, la entrada se sigue sirviendo durante
+  `ZOOM_CACHE_TTL_OBSOLETO` segundos mientras se refresca en segundo plano.
+- Solo se guardan respuestas exitosas (`es_exitosa`): un error de ZOOM no se
+  cachea, y un refresco fallido conserva la entrada anterior.
+
+Los valores se comparten entre solicitudes: no deben mutarse.
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from ..configuracion import Configuracion
+
+logger = logging.getLogger(__name__)
+
+ClaveCatalogo = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+FRESCO = "fresco"
+OBSOLETO = "obsoleto"
+
+
+@dataclass
+class EntradaCache:
+    valor: Any
+    creado: float
+    expira: float
+    obsoleto_hasta: float
+
+    def edad(self, ahora: Optional[float] = None) -> float:
+        return (ahora or time.time()) - self.creado
+
+
+class CacheTTL:
+    """Caché LRU con expiración por entrada y ventana de datos obsoletos."""
+
+    def __init__(self, max_entradas: int = 1024) -> None:
+        self.max_entradas = max(1, max_entradas)
+        self._datos: "OrderedDict[Hashable, EntradaCache]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refrescando: set = set()
+        self.aciertos = 0
+        self.obsoletos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    def obtener(self, clave: Hashable) -> Tuple[Optional[EntradaCache], Optional[str]]:
+        """Devuelve `(entrada, estado)` con estado FRESCO, OBSOLETO o None (fallo)."""
+        ahora = time.time()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None, None
+            if ahora < entrada.expira:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return entrada, FRESCO
+            if ahora < entrada.obsoleto_hasta:
+                self._datos.move_to_end(clave)
+                self.obsoletos += 1
+                return entrada, OBSOLETO
+            del self._datos[clave]
+            self.fallos += 1
+            return None, None
+
+    def guardar(self, clave: Hashable, valor: Any, ttl: float, ttl_obsoleto: float = 0.0,
+                creado: Optional[float] = None) -> EntradaCache:
+        creado = creado or time.time()
+        expira = creado + ttl
+        entrada = EntradaCache(valor=valor, creado=creado, expira=expira, obsoleto_hasta=expira + max(0.0, ttl_obsoleto))
+        with self._lock:
+            self._datos[clave] = entrada
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.expulsiones += 1
+        return entrada
+
+    def invalidar(self, clave: Optional[Hashable] = None) -> None:
+        with self._lock:
+            if clave is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(clave, None)
+
+    def marcar_refresco(self, clave: Hashable) -> bool:
+        """Reserva el refresco de una clave; False si ya hay uno en curso."""
+        with self._lock:
+            if clave in self._refrescando:
+                return False
+            self._refrescando.add(clave)
+            return True
+
+    def liberar_refresco(self, clave: Hashable) -> None:
+        with self._lock:
+            self._refrescando.discard(clave)
+
+    def elementos(self):
+        with self._lock:
+            return list(self._datos.items())
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "max_entradas": self.max_entradas,
+                "aciertos": self.aciertos,
+                "obsoletos": self.obsoletos,
+                "fallos": self.fallos,
+                "expulsiones": self.expulsiones,
+                "refrescando": len(self._refrescando),
+            }
+
+
+cache_catalogos = CacheTTL(Configuracion.ZOOM_CACHE_MAX_ENTRADAS)
+_refrescos = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-zoom")
+
+
+def es_exitosa(valor: Any) -> bool:
+    """Solo se cachean respuestas sin error (los errores ZOOM usan códigos CODE_xxx)."""
+    if isinstance(valor, list):
+        return True
+    if not isinstance(valor, dict) or valor.get("error"):
+        return False
+    codigo = str(valor.get("codrespuesta") or valor.get("Codrespuesta") or "")
+    return not codigo.startswith("CODE_")
+
+
+def ttl_catalogo(ruta: str) -> Optional[float]:
+    """TTL (segundos) de la ruta si es un catálogo cacheable; None si no aplica."""
+    if not Configuracion.ZOOM_CACHE_HABILITADO:
+        return None
+    ttl = Configuracion.ZOOM_CACHE_TTLS.get(ruta.strip("/"))
+    return float(ttl) if ttl else None
+
+
+def normalizar_parametros(parametros: Optional[Dict[str, Any]]) -> Tuple[Tuple[str, str], ...]:
+    if not parametros:
+        return ()
+    normalizados = []
+    for k, v in parametros.items():
+        if v is None:
+            continue
+        v = str(v).strip()
+        if v == "":
+            continue
+        normalizados.append((str(k), v))
+    return tuple(sorted(normalizados))
+
+
+def clave_catalogo(ruta: str, parametros: Optional[Dict[str, Any]] = None) -> ClaveCatalogo:
+    return (ruta.strip("/"), normalizar_parametros(parametros))
+
+
+def obtener_o_cargar(clave: Hashable, cargar: Callable[[], Any], ttl: float) -> Any:
+    """Devuelve el valor cacheado o lo carga con `cargar()` (sincrónico).
+
+    Si la entrada está obsoleta se devuelve de inmediato y se programa un
+    refresco en segundo plano (uno solo por clave).
+    """
+    entrada, estado = cache_catalogos.obtener(clave)
+    if estado == FRESCO:
+        return entrada.valor
+    if estado == OBSOLETO:
+        if cache_catalogos.marcar_refresco(clave):
+            _refrescos.submit(_refrescar, clave, cargar, ttl)
+        return entrada.valor
+    valor = cargar()
+    if es_exitosa(valor):
+        cache_catalogos.guardar(clave, valor, ttl, Configuracion.ZOOM_CACHE_TTL_OBSOLETO)
+    return valor
+
+
+def _refrescar(clave: Hashable, cargar: Callable[[], Any], ttl: float) -> None:
+    try:
+        valor = cargar()
+        if not es_exitosa(valor):
+            # Se sigue sirviendo la versión obsoleta hasta que venza su ventana
+            logger.warning(f"Refresco de catálogo {clave} con error ZOOM; se conserva la entrada anterior")
+            return
+        cache_catalogos.guardar(clave, valor, ttl, Configuracion.ZOOM_CACHE_TTL_OBSOLETO)
+        logger.info(f"Catálogo refrescado en segundo plano: {clave[0] if isinstance(clave, tuple) else clave}")
+    except Exception as e:
+        # Se sigue sirviendo la versión obsoleta hasta que venza su ventana
+        logger.warning(f"No se pudo refrescar catálogo {clave}: {e}")
+    finally:
+        cache_catalogos.liberar_refresco(clave)
@@ -0,0 +1,144 @@
+"""
+Caché de cotizaciones ZOOM – Español
+------------------------------------
+Caché TTL delante de `CalcularTarifa` y `consultarPreciosWs` (tipos de precio
+de envío), para las consultas repetidas mientras el cliente edita el carrito:
+
+- Los parámetros se normalizan solo para armar la clave: montos a dos decimales
+  y, si se configura el paso de facturación de ZOOM (`ZOOM_COTIZACION_PASO_PESO`,
+  `ZOOM_COTIZACION_PASO_DIMENSION`, 0 por defecto), peso y dimensiones
+  redondeados hacia arriba a ese paso. A ZOOM siempre se envían los parámetros
+  originales del cliente.
+- TTL `ZOOM_COTIZACION_TTL`, recortado para que nunca cruce el cambio de día
+  tarifario (`ZOOM_COTIZACION_HORA_CORTE` en `ZOOM_COTIZACION_ZONA_HORARIA`).
+- Solo se guardan respuestas exitosas; no hay ventana de datos obsoletos.
+
+`obtener_o_cargar_cotizacion` devuelve también los metadatos de caché
+(`estado` acierto/fallo y `edad` en segundos) para incluirlos en la respuesta.
+"""
+from __future__ import annotations
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from .cache_catalogos import CacheTTL, FRESCO, es_exitosa
+from ..configuracion import Configuracion
+
+logger = logging.getLogger(__name__)
+
+ACIERTO = "acierto"
+FALLO = "fallo"
+
+CAMPOS_PESO = ("peso", "pesob")
+CAMPOS_DIMENSION = ("alto", "ancho", "largo")
+CAMPOS_MONTO = ("valor_declarado", "valor_mercancia")
+
+cache_cotizaciones = CacheTTL(Configuracion.ZOOM_COTIZACION_MAX_ENTRADAS)
+
+
+def es_cotizacion(ruta: str, metodo: str, parametros: Optional[Dict[str, Any]]) -> bool:
+    """True si la consulta es una cotización cacheable."""
+    if not Configuracion.ZOOM_COTIZACION_CACHE_HABILITADA or metodo.upper() != "GET":
+        return False
+    ruta = ruta.strip("/")
+    if ruta == Configuracion.RUTA_ZOOM_CALCULAR_TARIFA:
+        return True
+    if ruta == Configuracion.RUTA_ZOOM_CONSULTAPRECIOWS:
+        try:
+            return int((parametros or {}).get("tipo_precio")) in Configuracion.ZOOM_COTIZACION_TIPOS_PRECIO
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _numero(valor: Any) -> Optional[float]:
+    if valor is None or isinstance(valor, bool):
+        return None
+    try:
+        return float(str(valor).replace(",", ".").strip())
+    except ValueError:
+        return None
+
+
+def _compacto(valor: float) -> Any:
+    """2.0 -> 2; 2.50 -> 2.5 (evita claves distintas para el mismo número)."""
+    valor = round(valor, 3)
+    return int(valor) if valor.is_integer() else valor
+
+
+def redondear_a_paso(valor: float, paso: float) -> float:
+    """Redondea hacia arriba al múltiplo de `paso` (paso 0 = sin redondeo)."""
+    if not paso or paso <= 0:
+        return valor
+    # Tolerancia para no subir de banda por errores de coma flotante (p. ej. 1.0000001)
+    return math.ceil(round(valor / paso, 6)) * paso
+
+
+def normalizar_cotizacion(parametros: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Copia de los parámetros con peso/dimensiones/montos normalizados (solo para la clave de caché)."""
+    if not parametros:
+        return parametros
+    normalizados = dict(parametros)
+    for campo, valor in parametros.items():
+        numero = _numero(valor)
+        if numero is None:
+            continue
+        if campo in CAMPOS_PESO:
+            normalizados[campo] = _compacto(redondear_a_paso(numero, Configuracion.ZOOM_COTIZACION_PASO_PESO))
+        elif campo in CAMPOS_DIMENSION:
+            normalizados[campo] = _compacto(redondear_a_paso(numero, Configuracion.ZOOM_COTIZACION_PASO_DIMENSION))
+        elif campo in CAMPOS_MONTO:
+            normalizados[campo] = _compacto(round(numero, 2))
+    return normalizados
+
+
+def segundos_hasta_corte(ahora: Optional[datetime] = None) -> float:
+    """Segundos hasta el próximo cambio de día tarifario."""
+    zona = ZoneInfo(Configuracion.ZOOM_COTIZACION_ZONA_HORARIA)
+    ahora = ahora or datetime.now(zona)
+    corte = ahora.replace(hour=Configuracion.ZOOM_COTIZACION_HORA_CORTE, minute=0, second=0, microsecond=0)
+    if corte <= ahora:
+        corte += timedelta(days=1)
+    return (corte - ahora).total_seconds()
+
+
+def ultimo_corte(ahora: Optional[datetime] = None) -> float:
+    """Instante (epoch) del último cambio de día tarifario."""
+    zona = ZoneInfo(Configuracion.ZOOM_COTIZACION_ZONA_HORARIA)
+    ahora = ahora or datetime.now(zona)
+    corte = ahora.replace(hour=Configuracion.ZOOM_COTIZACION_HORA_CORTE, minute=0, second=0, microsecond=0)
+    if corte > ahora:
+        corte -= timedelta(days=1)
+    return corte.timestamp()
+
+
+def ttl_cotizacion() -> float:
+    return max(0.0, min(float(Configuracion.ZOOM_COTIZACION_TTL), segundos_hasta_corte()))
+
+
+def meta_acierto(entrada) -> Dict[str, Any]:
+    return {"estado": ACIERTO, "edad": round(entrada.edad(), 1)}
+
+
+def meta_fallo() -> Dict[str, Any]:
+    return {"estado": FALLO, "edad": 0}
+
+
+def guardar_cotizacion(clave, valor: Any) -> None:
+    if not es_exitosa(valor):
+        return
+    ttl = ttl_cotizacion()
+    if ttl > 0:
+        cache_cotizaciones.guardar(clave, valor, ttl)
+
+
+def obtener_o_cargar_cotizacion(clave, cargar: Callable[[], Any]) -> Tuple[Any, Dict[str, Any]]:
+    """Devuelve `(valor, meta)` desde la caché o cargando con `cargar()`."""
+    entrada, estado = cache_cotizaciones.obtener(clave)
+    if estado == FRESCO:
+        return entrada.valor, meta_acierto(entrada)
+    valor = cargar()
+    guardar_cotizacion(clave, valor)
+    return valor, meta_fallo()
@@ -0,0 +1,221 @@
+"""
+Caché de tokens ZOOM por login – Español
+----------------------------------------
+Evita llamar a `crearToken` (y `zoomCert`) en cada envío orquestado:
+
+- Un token por login (la clave se guarda solo como hash, para no compartir el
+  token entre credenciales distintas del mismo login).
+- Expiración: `ZOOM_TOKEN_TTL` o el tiempo que informe ZOOM en la respuesta.
+- Refresco anticipado: dentro de `ZOOM_TOKEN_REFRESCO_ANTICIPADO` segundos del
+  vencimiento se sigue entregando el token y se renueva en segundo plano.
+- Single-flight: si varios hilos necesitan el mismo token, solo uno lo pide.
+- Si ZOOM rechaza un token cacheado de forma explícita (HTTP 401/403 o un código
+  de `ZOOM_TOKEN_CODIGOS_RECHAZO`), se invalida, se pide otro y se reintenta una
+  vez (`con_reintento`).
+- El certificado (`zoomCert`) se guarda por token y frase secreta, y solo si
+  ZOOM devolvió uno; una respuesta de error no se cachea.
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .coalescencia import GrupoVuelo
+from ..configuracion import Configuracion
+from ..core.errores import ErrorZoom
+from ..core.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+# Campos en los que ZOOM podría informar la vigencia del token (segundos)
+CAMPOS_EXPIRACION = ("expira_en", "expires_in", "tiempo_expiracion", "vigencia")
+
+
+class TokenNoObtenido(Exception):
+    """ZOOM no devolvió token; `respuesta` conserva lo recibido."""
+
+    def __init__(self, respuesta: Any):
+        super().__init__(f"No se obtuvo token de ZOOM: {respuesta}")
+        self.respuesta = respuesta
+
+
+@dataclass
+class EntradaToken:
+    token: str
+    obtenido: float
+    expira: float
+    # hash de la frase secreta -> certificado
+    certificados: Dict[str, Any] = field(default_factory=dict)
+
+    def vigente(self, ahora: float) -> bool:
+        return ahora < self.expira
+
+    def por_vencer(self, ahora: float) -> bool:
+        return ahora >= self.expira - Configuracion.ZOOM_TOKEN_REFRESCO_ANTICIPADO
+
+
+def token_rechazado(resultado: Any) -> bool:
+    """True si ZOOM rechazó el token de forma explícita: HTTP 401/403 o un código de
+    `ZOOM_TOKEN_CODIGOS_RECHAZO`. Cualquier otro error no se reintenta (createShipment
+    no es idempotente: ZOOM pudo haberlo recibido)."""
+    codigos = Configuracion.ZOOM_TOKEN_CODIGOS_RECHAZO
+    if isinstance(resultado, ErrorZoom):
+        mensaje = resultado.mensaje or ""
+        return mensaje.startswith(("HTTP 401", "HTTP 403")) or (resultado.codigo_zoom or "") in codigos
+    if isinstance(resultado, dict):
+        codigo = str(resultado.get("codrespuesta") or resultado.get("Codrespuesta") or "")
+        return bool(codigo) and codigo in codigos
+    return False
+
+
+def es_certificado(valor: Any) -> bool:
+    """El cargador devuelve el certificado o, si ZOOM no lo entregó, su respuesta completa (dict)."""
+    return valor not in (None, "") and not isinstance(valor, dict)
+
+
+def vigencia_de(entidad: Any) -> float:
+    """Segundos de vigencia informados por ZOOM o `ZOOM_TOKEN_TTL`."""
+    if isinstance(entidad, dict):
+        for campo in CAMPOS_EXPIRACION:
+            try:
+                valor = float(entidad.get(campo))
+                if valor > 0:
+                    return valor
+            except (TypeError, ValueError):
+                continue
+    return float(Configuracion.ZOOM_TOKEN_TTL)
+
+
+class CacheTokens:
+    """Tokens (y certificados) de ZOOM por credencial, seguros entre hilos."""
+
+    def __init__(self, max_entradas: int = 1024) -> None:
+        self.max_entradas = max(1, max_entradas)
+        self._entradas: "OrderedDict[Tuple[str, str], EntradaToken]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._vuelos = GrupoVuelo()
+        self._refrescando: set = set()
+        self._refrescos = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tokens-zoom")
+
+    @staticmethod
+    def _hash(texto: str) -> str:
+        return hashlib.blake2b(str(texto).encode("utf-8"), digest_size=16).hexdigest()
+
+    @classmethod
+    def _clave(cls, login: str, clave: str) -> Tuple[str, str]:
+        return (str(login), cls._hash(clave))
+
+    def _cargar(self, clave_cache, cargar: Callable[[], Tuple[str, float]]) -> EntradaToken:
+        token, vigencia = cargar()
+        ahora = time.time()
+        entrada = EntradaToken(token=token, obtenido=ahora, expira=ahora + vigencia)
+        with self._lock:
+            self._entradas[clave_cache] = entrada
+            self._entradas.move_to_end(clave_cache)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        metricas.incrementar("tokens_zoom.emitidos")
+        return entrada
+
+    def obtener(self, login: str, clave: str, cargar: Callable[[], Tuple[str, float]]) -> EntradaToken:
+        """Devuelve un token vigente; `cargar()` -> `(token, vigencia_segundos)`."""
+        clave_cache = self._clave(login, clave)
+        ahora = time.time()
+        with self._lock:
+            entrada = self._entradas.get(clave_cache)
+        if entrada is not None and entrada.vigente(ahora):
+            metricas.incrementar("tokens_zoom.aciertos")
+            if entrada.por_vencer(ahora):
+                self._refrescar_en_segundo_plano(clave_cache, cargar)
+            return entrada
+        metricas.incrementar("tokens_zoom.fallos")
+        return self._vuelos.hacer(clave_cache, lambda: self._cargar(clave_cache, cargar))
+
+    def _refrescar_en_segundo_plano(self, clave_cache, cargar) -> None:
+        with self._lock:
+            if clave_cache in self._refrescando:
+                return
+            self._refrescando.add(clave_cache)
+
+        def refrescar():
+            try:
+                anterior = self._entradas.get(clave_cache)
+                nueva = self._vuelos.hacer(clave_cache, lambda: self._cargar(clave_cache, cargar))
+                # El certificado pertenece al token anterior: se vuelve a pedir bajo demanda
+                logger.info(f"Token ZOOM renovado de forma anticipada para login {clave_cache[0]}")
+                if anterior is not None and anterior.token == nueva.token:
+                    nueva.certificados = dict(anterior.certificados)
+            except Exception as e:
+                logger.warning(f"No se pudo renovar token ZOOM para login {clave_cache[0]}: {e}")
+            finally:
+                with self._lock:
+                    self._refrescando.discard(clave_cache)
+
+        self._refrescos.submit(refrescar)
+
+    def certificado(self, login: str, clave: str, frase_secreta: str, entrada: EntradaToken,
+                    cargar: Callable[[str], Any]) -> Any:
+        """Certificado del token de la entrada y la frase secreta (se pide una vez por par).
+
+        Si `cargar` no devuelve un certificado (p. ej. el dict de error de ZOOM) se
+        devuelve tal cual, sin guardarlo: la próxima solicitud lo vuelve a pedir.
+        """
+        frase = self._hash(frase_secreta or "")
+        if frase in entrada.certificados:
+            return entrada.certificados[frase]
+        clave_vuelo = ("certificado",) + self._clave(login, clave) + (entrada.token, frase)
+        valor = self._vuelos.hacer(clave_vuelo, lambda: cargar(entrada.token))
+        if es_certificado(valor):
+            entrada.certificados[frase] = valor
+        else:
+            logger.warning(f"zoomCert sin certificado para login {login}; no se cachea: {valor}")
+        return valor
+
+    def invalidar(self, login: str, clave: str, token: Optional[str] = None) -> None:
+        """Descarta el token cacheado (solo si sigue siendo `token`, cuando se indica)."""
+        clave_cache = self._clave(login, clave)
+        with self._lock:
+            entrada = self._entradas.get(clave_cache)
+            if entrada is not None and (token is None or entrada.token == token):
+                del self._entradas[clave_cache]
+                metricas.incrementar("tokens_zoom.invalidados")
+
+    def con_reintento(
+        self,
+        login: str,
+        clave: str,
+        token: str,
+        cargar: Callable[[], Tuple[str, float]],
+        operacion: Callable[[str], Any],
+    ) -> Any:
+        """Ejecuta `operacion(token)`; si ZOOM rechaza el token, lo renueva y reintenta una vez."""
+        try:
+            resultado = operacion(token)
+            if not token_rechazado(resultado):
+                return resultado
+            logger.warning(f"ZOOM rechazó el token cacheado del login {login}: {resultado}")
+        except ErrorZoom as e:
+            if not token_rechazado(e):
+                raise
+            logger.warning(f"ZOOM rechazó el token cacheado del login {login}: {e.mensaje}")
+        self.invalidar(login, clave, token=token)
+        entrada = self.obtener(login, clave, cargar)
+        return operacion(entrada.token)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        ahora = time.time()
+        with self._lock:
+            entradas = list(self._entradas.values())
+        return {
+            "entradas": len(entradas),
+            "vigentes": sum(1 for e in entradas if e.vigente(ahora)),
+            "refrescando": len(self._refrescando),
+        }
+
+
+tokens_zoom = CacheTokens(Configuracion.ZOOM_TOKEN_MAX_ENTRADAS)
@@ -0,0 +1,169 @@
+"""
+Circuit breaker por ruta ZOOM – Español
+---------------------------------------
+Evita que un endpoint degradado de ZOOM (p. ej. `CalcularTarifa`) bloquee a
+todos los hilos del worker con timeouts y reintentos:
+
+- CERRADO: las llamadas pasan; se cuentan los fallos consecutivos.
+- ABIERTO: tras `umbral_fallos` fallos seguidos, la ruta falla de inmediato con
+  `ErrorUpstream` durante `apertura` segundos.
+- SEMIABIERTO: vencida la apertura, se dejan pasar hasta `sondas` llamadas de
+  prueba; un éxito cierra el circuito y un fallo lo vuelve a abrir.
+
+Solo cuentan como fallo los errores de red y las respuestas HTTP 5xx; los
+errores de negocio de ZOOM (Codrespuesta) indican que el servicio responde.
+"""
+from __future__ import annotations
+import logging
+import math
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..configuracion import Configuracion
+from ..core.errores import ErrorUpstream
+
+logger = logging.getLogger(__name__)
+
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+
+class CircuitoAbierto(ErrorUpstream):
+    def __init__(self, ruta: str, reintentar_en: float):
+        super().__init__(f"Servicio ZOOM '{ruta}' no disponible temporalmente; reintente en {math.ceil(reintentar_en)}s")
+        self.ruta = ruta
+        self.reintentar_en = reintentar_en
+
+
+class Circuito:
+    """Circuit breaker de una ruta (seguro entre hilos)."""
+
+    def __init__(self, ruta: str, umbral_fallos: int = 5, apertura: float = 30.0, sondas: int = 1) -> None:
+        self.ruta = ruta
+        self.umbral_fallos = max(1, int(umbral_fallos))
+        self.apertura = max(0.0, float(apertura))
+        self.sondas = max(1, int(sondas))
+        self.estado = CERRADO
+        self.fallos_consecutivos = 0
+        self.abierto_desde: Optional[float] = None
+        self._sondas_en_curso = 0
+        self._lock = threading.Lock()
+        self.rechazadas = 0
+        self.aperturas = 0
+
+    def permitir(self) -> None:
+        """Reserva el paso de una llamada o lanza `CircuitoAbierto`."""
+        with self._lock:
+            if self.estado == ABIERTO:
+                restante = self.abierto_desde + self.apertura - time.time()
+                if restante > 0:
+                    self.rechazadas += 1
+                    raise CircuitoAbierto(self.ruta, restante)
+                self.estado = SEMIABIERTO
+                self._sondas_en_curso = 0
+                logger.info(f"Circuito ZOOM '{self.ruta}' semiabierto: probando")
+            if self.estado == SEMIABIERTO:
+                if self._sondas_en_curso >= self.sondas:
+                    self.rechazadas += 1
+                    raise CircuitoAbierto(self.ruta, self.apertura)
+                self._sondas_en_curso += 1
+
+    def abierto(self) -> bool:
+        """True si la ruta está abierta (sin reservar paso); útil entre reintentos."""
+        with self._lock:
+            return self.estado == ABIERTO and time.time() < self.abierto_desde + self.apertura
+
+    def registrar(self, exito: Optional[bool]) -> None:
+        """Registra el resultado de una llamada autorizada por `permitir()`.
+
+        `exito=None` indica que la llamada no llegó a ZOOM: solo libera la sonda.
+        """
+        with self._lock:
+            if self.estado == SEMIABIERTO:
+                self._sondas_en_curso = max(0, self._sondas_en_curso - 1)
+            if exito is None:
+                return
+            if exito:
+                if self.estado != CERRADO:
+                    logger.info(f"Circuito ZOOM '{self.ruta}' cerrado")
+                self.estado = CERRADO
+                self.fallos_consecutivos = 0
+                self.abierto_desde = None
+                return
+            self.fallos_consecutivos += 1
+            if self.estado == SEMIABIERTO or self.fallos_consecutivos >= self.umbral_fallos:
+                if self.estado != ABIERTO:
+                    self.aperturas += 1
+                    logger.warning(
+                        f"Circuito ZOOM '{self.ruta}' abierto por {self.apertura:.0f}s "
+                        f"({self.fallos_consecutivos} fallos consecutivos)"
+                    )
+                self.estado = ABIERTO
+                self.abierto_desde = time.time()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            datos = {
+                "estado": self.estado,
+                "fallos_consecutivos": self.fallos_consecutivos,
+                "umbral_fallos": self.umbral_fallos,
+                "apertura": self.apertura,
+                "aperturas": self.aperturas,
+                "rechazadas": self.rechazadas,
+            }
+            if self.estado == ABIERTO:
+                datos["reintentar_en"] = round(max(0.0, self.abierto_desde + self.apertura - time.time()), 1)
+            return datos
+
+
+class _CircuitoNulo:
+    """Circuito siempre cerrado (cuando el breaker está deshabilitado)."""
+
+    def permitir(self) -> None:
+        pass
+
+    def abierto(self) -> bool:
+        return False
+
+    def registrar(self, exito: Optional[bool]) -> None:
+        pass
+
+
+_circuito_nulo = _CircuitoNulo()
+
+
+class RegistroCircuitos:
+    """Un circuito por ruta ZOOM, creado bajo demanda."""
+
+    def __init__(self) -> None:
+        self._circuitos: Dict[str, Circuito] = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, ruta: str):
+        if not Configuracion.ZOOM_CIRCUITO_HABILITADO:
+            return _circuito_nulo
+        ruta = ruta.strip("/")
+        circuito = self._circuitos.get(ruta)
+        if circuito is None:
+            with self._lock:
+                circuito = self._circuitos.get(ruta)
+                if circuito is None:
+                    ajustes = Configuracion.ZOOM_CIRCUITO_POR_RUTA.get(ruta, {})
+                    circuito = Circuito(
+                        ruta,
+                        umbral_fallos=ajustes.get("umbral_fallos", Configuracion.ZOOM_CIRCUITO_UMBRAL_FALLOS),
+                        apertura=ajustes.get("apertura", Configuracion.ZOOM_CIRCUITO_APERTURA),
+                        sondas=ajustes.get("sondas", Configuracion.ZOOM_CIRCUITO_SONDAS),
+                    )
+                    self._circuitos[ruta] = circuito
+        return circuito
+
+    def estadisticas(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            circuitos = list(self._circuitos.values())
+        return {c.ruta: c.estadisticas() for c in circuitos}
+
+
+circuitos_zoom = RegistroCircuitos()
@@ -4,9 +4,11 @@ Cliente HTTP para APIs de ARMI – Español
 Centraliza las llamadas HTTP (públicas y privadas), autenticación y manejo de errores.
 """
 import logging
+import time
 from typing import Any, Dict, Optional
 import httpx
 from ..configuracion import Configuracion
+from .reintentos import politica_armi
 
 logger = logging.getLogger(__name__)
 
@@ -42,7 +44,9 @@ class ClienteArmi:
         cuerpo: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         url = f"{self.base_url}/{ruta.lstrip('/')}"
-        for intento in range(self.reintentos + 1):
+        politica_armi.iniciar()
+        for intento in range(1, self.reintentos + 2):
+            espera = None
             try:
                 with httpx.Client(timeout=self.timeout) as client:
                     if metodo.upper() == "GET":
@@ -58,12 +62,15 @@ class ClienteArmi:
                 return resp.json()
             except httpx.HTTPStatusError as e:
                 logger.error(f"ARMI error HTTP {e.response.status_code}: {e.response.text}")
-                if intento == self.reintentos:
+                espera = politica_armi.espera(intento, metodo, self.reintentos, respuesta=e.response)
+                if espera is None:
                     return {"error": str(e)}
             except Exception as e:
                 logger.error(f"ARMI error: {str(e)}")
-                if intento == self.reintentos:
+                espera = politica_armi.espera(intento, metodo, self.reintentos, error=e)
+                if espera is None:
                     return {"error": str(e)}
+            time.sleep(espera)
         return {"error": "No se pudo completar la solicitud ARMI"}
 
     def validar_campo_requerido(self, **campos: Any) -> bool:
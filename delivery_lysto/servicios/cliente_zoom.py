@@ -10,10 +10,18 @@ import logging
 from typing import Any, Dict, Optional
 import httpx
 from ..configuracion import Configuracion
+from .transporte_zoom import obtener_cliente_http
+from .cache_catalogos import ttl_catalogo, clave_catalogo, obtener_o_cargar
+from .circuito import circuitos_zoom
+from .reintentos import politica_zoom
+from .limitador import limitar
+from .coalescencia import vuelos_zoom, coalescer_habilitado
+from .cache_cotizaciones import es_cotizacion, normalizar_cotizacion, obtener_o_cargar_cotizacion
 
 from ..core.errores import (
     lanzar_por_codigo,
     ErrorZoom,
+    ErrorUpstream,
 )
 
 logger = logging.getLogger(__name__)
@@ -29,6 +37,7 @@ class ClienteZoom:
         frase_secreta: str = "",
         timeout: float = 10.0,
         reintentos: int = 3,
+        http_client: Optional[httpx.Client] = None,
 
         #privado: bool = False,
     ) -> None:
@@ -39,6 +48,14 @@ class ClienteZoom:
         self.frase_secreta = frase_secreta
         self.timeout = timeout
         self.reintentos = max(0, reintentos)
+        # Cliente HTTP con pool compartido por worker (ver transporte_zoom)
+        self._http = http_client
+        # Metadatos de caché de la última cotización (ver cache_cotizaciones)
+        self.ultima_cache: Optional[Dict[str, Any]] = None
+
+    @property
+    def http(self) -> httpx.Client:
+        return self._http or obtener_cliente_http()
 
     def _headers_publicos(self) -> Dict[str, str]:
         return {"Content-Type": "application/json"}
@@ -59,6 +76,33 @@ class ClienteZoom:
     def validacion_campo_requerido(self, **kwargs) -> bool:
         return all(v is not None for v in kwargs.values())
 
+    def _construir_url(self, ruta: str, privado: bool = False, url_alternativa: Optional[bool] = False) -> str:
+        url = f"{Configuracion.ZOOM_BASE_URL_qa2}/{ruta.lstrip('/')}" if url_alternativa else f"{self.base_url}/{ruta.lstrip('/')}" if privado else f"{Configuracion.ZOOM_BASE_URL}/{ruta.lstrip('/')}"
+        if not (url.startswith("http://") or url.startswith("https://")):
+            raise ErrorZoom("ZOOM_BASE_URL inválida: falta esquema http/https")
+        return url
+
+    def _procesar_respuesta(self, resp: httpx.Response) -> Any:
+        """Parsea la respuesta y aplica el mapeo `Codrespuesta` -> excepción."""
+        # Intentar parsear JSON
+        try:
+            data = resp.json()
+        except Exception:
+            data = {"status_code": resp.status_code, "texto": resp.text}
+
+        # Manejo de códigos de ZOOM (si existen en respuesta)
+        if isinstance(data, dict) and "Codrespuesta" in data:
+            codigo = data.get("Codrespuesta")
+            mensaje = data.get("Mensaje", "Error en respuesta de ZOOM")
+            if codigo and codigo != "OK":
+                lanzar_por_codigo(codigo, mensaje)
+
+        # Levantar por status HTTP si no es exitoso y no trae código propio
+        if resp.status_code >= 400:
+            raise ErrorZoom(f"HTTP {resp.status_code}: {data}")
+
+        return data
+
     def _solicitar(
         self,
         ruta: str,
@@ -71,49 +115,135 @@ class ClienteZoom:
         token: Optional[str] = None,
         
     ) -> Any:
-        url = f"{Configuracion.ZOOM_BASE_URL_qa2}/{ruta.lstrip('/')}" if url_alternativa else f"{self.base_url}/{ruta.lstrip('/')}" if privado else f"{Configuracion.ZOOM_BASE_URL}/{ruta.lstrip('/')}"
-        print(f"URL solicitada: {url} cuerpo: {cuerpo}")
-        if not (url.startswith("http://") or url.startswith("https://")):
-            raise ErrorZoom("ZOOM_BASE_URL inválida: falta esquema http/https")
-        backoff = 0.5
-
-        for intento in range(1, self.reintentos + 2):
-            try:
-                headers = self._headers_privados(cuerpo, usatoken=usatoken, token=token) if privado else self._headers_publicos()
-                with httpx.Client(timeout=self.timeout, follow_redirects=True) as cliente:
-                    resp = cliente.request(metodo.upper(), url, params=parametros, json=cuerpo, headers=headers)
-                logger.info(f"ZOOM {metodo.upper()} {url} -> {resp.status_code} (final URL: {str(resp.request.url)})")
-                # Intentar parsear JSON
+        cotizacion = not privado and es_cotizacion(ruta, metodo, parametros)
+
+        def enviar():
+            return self._enviar(ruta, metodo, parametros, cuerpo, privado, url_alternativa, usatoken, token)
+
+        # GET idénticos concurrentes comparten una sola llamada a ZOOM (ver coalescencia)
+        cargar = enviar
+        if coalescer_habilitado(metodo):
+            clave_vuelo = self._clave_vuelo(ruta, parametros, privado, url_alternativa, usatoken, token)
+            cargar = lambda: vuelos_zoom.hacer(clave_vuelo, enviar)
+
+        if cotizacion:
+            # A ZOOM van los parámetros originales; la normalización solo arma la clave de caché
+            clave = clave_catalogo(ruta, normalizar_cotizacion(parametros))
+            valor, self.ultima_cache = obtener_o_cargar_cotizacion(clave, cargar)
+            return valor
+
+        # Catálogos públicos: se sirven desde la caché TTL (ver cache_catalogos)
+        ttl = ttl_catalogo(ruta) if metodo.upper() == "GET" and not privado else None
+        if ttl:
+            return obtener_o_cargar(clave_catalogo(ruta, parametros), cargar, ttl)
+        return cargar()
+
+    def _clave_vuelo(self, ruta, parametros, privado, url_alternativa, usatoken, token) -> tuple:
+        """Clave de coalescencia: todo lo que cambia la respuesta de un GET."""
+        destino = self._construir_url(ruta, privado=privado, url_alternativa=url_alternativa)
+        credencial = token if usatoken else (self.api_key if privado else None)
+        return (destino, clave_catalogo(ruta, parametros)[1], credencial)
+
+    def _enviar(
+        self,
+        ruta: str,
+        metodo: str = "GET",
+        parametros: Optional[Dict[str, Any]] = None,
+        cuerpo: Optional[Dict[str, Any]] = None,
+        privado: bool = False,
+        url_alternativa: Optional[bool] = False,
+        usatoken: Optional[bool] = False,
+        token: Optional[str] = None,
+    ) -> Any:
+        """Ejecuta la llamada HTTP contra ZOOM con reintentos (sin caché)."""
+        url = self._construir_url(ruta, privado=privado, url_alternativa=url_alternativa)
+        # Sin el cuerpo: lleva login/clave/token
+        logger.debug(f"URL solicitada: {metodo} {url}")
+        # Falla rápido si la ruta está abierta (ver circuito)
+        circuito = circuitos_zoom.obtener(ruta)
+        circuito.permitir()
+        politica_zoom.iniciar()
+        exito = None
+
+        try:
+            for intento in range(1, self.reintentos + 2):
                 try:
-                    data = resp.json()
-                except Exception:
-                    data = {"status_code": resp.status_code, "texto": resp.text}
-
-                # Manejo de códigos de ZOOM (si existen en respuesta)
-                if isinstance(data, dict) and "Codrespuesta" in data:
-                    codigo = data.get("Codrespuesta")
-                    mensaje = data.get("Mensaje", "Error en respuesta de ZOOM")
-                    if codigo and codigo != "OK":
-                        lanzar_por_codigo(codigo, mensaje)
-
-                # Levantar por status HTTP si no es exitoso y no trae código propio
-                if resp.status_code >= 400:
-                    raise ErrorZoom(f"HTTP {resp.status_code}: {data}")
-
-                return data
-
-            except (httpx.ConnectError, httpx.ReadTimeout) as e:
-                logger.warning(f"Error de red ({e}), intento {intento} de {self.reintentos + 1}")
-                if intento > self.reintentos:
-                    raise ErrorZoom("Fallo de red al comunicar con ZOOM")
-                time.sleep(backoff)
-                backoff *= 2
-            except ErrorZoom:
-                # Errores mapeados desde ZOOM: no reintentar
-                raise
-            except Exception as e:
-                logger.exception("Error inesperado en cliente ZOOM")
-                raise ErrorZoom(str(e))
+                    headers = self._headers_privados(cuerpo, usatoken=usatoken, token=token) if privado else self._headers_publicos()
+                    with limitar(ruta):
+                        resp = self.http.request(metodo.upper(), url, params=parametros, json=cuerpo, headers=headers, timeout=self.timeout)
+                    logger.info(f"ZOOM {metodo.upper()} {url} -> {resp.status_code} (final URL: {str(resp.request.url)})")
+                except httpx.TransportError as e:
+                    exito = False
+                    logger.warning(f"Error de red ({e}), intento {intento} de {self.reintentos + 1}")
+                    espera = politica_zoom.espera(intento, metodo, self.reintentos, error=e)
+                    if espera is None:
+                        raise ErrorZoom("Fallo de red al comunicar con ZOOM")
+                except ErrorZoom:
+                    # Rechazo local del limitador: no cuenta para el circuito
+                    raise
+                except Exception as e:
+                    logger.exception("Error inesperado en cliente ZOOM")
+                    raise ErrorZoom(str(e))
+                else:
+                    # Un 5xx cuenta como fallo del circuito; errores de negocio no
+                    exito = resp.status_code < 500
+                    espera = politica_zoom.espera(intento, metodo, self.reintentos, respuesta=resp)
+                    if espera is None:
+                        return self._procesar_respuesta(resp)
+                    logger.warning(f"ZOOM respondió {resp.status_code}, intento {intento} de {self.reintentos + 1}")
+
+                if circuito.abierto():
+                    # Otro hilo abrió el circuito: no insistir
+                    raise ErrorUpstream(f"Servicio ZOOM '{ruta}' no disponible (circuito abierto)")
+                time.sleep(espera)
+        finally:
+            circuito.registrar(exito)
+
+    def abrir_flujo(
+        self,
+        ruta: str,
+        metodo: str = "GET",
+        parametros: Optional[Dict[str, Any]] = None,
+        cuerpo: Optional[Dict[str, Any]] = None,
+        privado: bool = False,
+        contenido: Optional[bytes] = None,
+        cabeceras: Optional[Dict[str, str]] = None,
+        procesar_errores: bool = True,
+    ) -> httpx.Response:
+        """Abre la respuesta de ZOOM en modo streaming (sin caché ni reintentos).
+
+        Devuelve la respuesta con el cuerpo sin leer; quien llama la consume con
+        `iter_bytes()` / `iter_text()` / `iter_raw()` y debe cerrarla. Con
+        `procesar_errores`, un status >= 400 se lee completo y se procesa como en
+        `_solicitar` (lanza `ErrorZoom`). `contenido` envía el cuerpo tal cual
+        (bytes) en lugar de `cuerpo` como JSON; `cabeceras` se suman a las propias.
+        """
+        url = self._construir_url(ruta, privado=privado)
+        circuito = circuitos_zoom.obtener(ruta)
+        circuito.permitir()
+        exito = None
+        try:
+            headers = self._headers_privados(cuerpo) if privado else self._headers_publicos()
+            headers.update(cabeceras or {})
+            peticion = self.http.build_request(metodo.upper(), url, params=parametros,
+                                               json=cuerpo if contenido is None else None, content=contenido,
+                                               headers=headers, timeout=self.timeout)
+            with limitar(ruta):
+                resp = self.http.send(peticion, stream=True)
+            logger.info(f"ZOOM {metodo.upper()} {url} -> {resp.status_code} (streaming)")
+            exito = resp.status_code < 500
+        except httpx.TransportError as e:
+            exito = False
+            raise ErrorZoom(f"Fallo de red al comunicar con ZOOM: {e}")
+        finally:
+            circuito.registrar(exito)
+        if procesar_errores and resp.status_code >= 400:
+            try:
+                resp.read()
+                self._procesar_respuesta(resp)
+            finally:
+                resp.close()
+        return resp
 
     # Métodos de conveniencia públicos
     def obtener_infotracking(self, tipo_busqueda: Optional[int], codigo: str, codigo_cliente:int):
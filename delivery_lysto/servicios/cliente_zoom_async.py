@@ -0,0 +1,192 @@
+"""
+Cliente HTTP asíncrono para APIs de ZOOM – Español
+--------------------------------------------------
+Versión asyncio de `ClienteZoom` sobre `httpx.AsyncClient`. Reutiliza los
+métodos de conveniencia del cliente sincrónico: todos terminan en
+`self._solicitar(...)`, que aquí es una corrutina, por lo que basta con
+hacer `await cliente.obtener_ciudades(...)`, `await cliente.create_shipment(...)`, etc.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+import httpx
+
+from .cliente_zoom import ClienteZoom
+from .transporte_zoom import obtener_cliente_http_async
+from .cache_catalogos import (
+    cache_catalogos,
+    ttl_catalogo,
+    clave_catalogo,
+    es_exitosa,
+    FRESCO,
+    OBSOLETO,
+)
+from .circuito import circuitos_zoom
+from .reintentos import politica_zoom
+from .limitador import limitar_async
+from .coalescencia import vuelos_zoom_async, coalescer_habilitado
+from .cache_cotizaciones import (
+    cache_cotizaciones,
+    es_cotizacion,
+    normalizar_cotizacion,
+    guardar_cotizacion,
+    meta_acierto,
+    meta_fallo,
+)
+from ..configuracion import Configuracion
+from ..core.errores import ErrorZoom, ErrorUpstream
+
+logger = logging.getLogger(__name__)
+
+# Referencias a los refrescos en curso para que el GC no los cancele
+_tareas_refresco: set = set()
+
+
+class ClienteZoomAsync(ClienteZoom):
+    """Cliente HTTP para ZOOM (asíncrono).
+
+    Mismo mapeo `Codrespuesta` -> `lanzar_por_codigo` y misma política de
+    reintentos que `ClienteZoom`, pero sin bloquear el hilo durante la espera.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str = "",
+        frase_secreta: str = "",
+        timeout: float = 10.0,
+        reintentos: int = 3,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ) -> None:
+        super().__init__(
+            base_url=base_url,
+            api_key=api_key,
+            frase_secreta=frase_secreta,
+            timeout=timeout,
+            reintentos=reintentos,
+        )
+        self._http_async = http_client
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http_async or obtener_cliente_http_async()
+
+    async def _solicitar(
+        self,
+        ruta: str,
+        metodo: str = "GET",
+        parametros: Optional[Dict[str, Any]] = None,
+        cuerpo: Optional[Dict[str, Any]] = None,
+        privado: bool = False,
+        url_alternativa: Optional[bool] = False,
+        usatoken: Optional[bool] = False,
+        token: Optional[str] = None,
+    ) -> Any:
+        cotizacion = not privado and es_cotizacion(ruta, metodo, parametros)
+
+        def enviar():
+            return self._enviar(ruta, metodo, parametros, cuerpo, privado, url_alternativa, usatoken, token)
+
+        cargar = enviar
+        if coalescer_habilitado(metodo):
+            clave_vuelo = self._clave_vuelo(ruta, parametros, privado, url_alternativa, usatoken, token)
+            cargar = lambda: vuelos_zoom_async.hacer(clave_vuelo, enviar)
+
+        if cotizacion:
+            # A ZOOM van los parámetros originales; la normalización solo arma la clave de caché
+            clave = clave_catalogo(ruta, normalizar_cotizacion(parametros))
+            entrada, estado = cache_cotizaciones.obtener(clave)
+            if estado == FRESCO:
+                self.ultima_cache = meta_acierto(entrada)
+                return entrada.valor
+            valor = await cargar()
+            guardar_cotizacion(clave, valor)
+            self.ultima_cache = meta_fallo()
+            return valor
+
+        ttl = ttl_catalogo(ruta) if metodo.upper() == "GET" and not privado else None
+        if not ttl:
+            return await cargar()
+
+        # Catálogos públicos: misma caché TTL que el cliente sincrónico
+        clave = clave_catalogo(ruta, parametros)
+        entrada, estado = cache_catalogos.obtener(clave)
+        if estado == FRESCO:
+            return entrada.valor
+        if estado == OBSOLETO:
+            if cache_catalogos.marcar_refresco(clave):
+                tarea = asyncio.ensure_future(self._refrescar(clave, ruta, parametros, ttl))
+                _tareas_refresco.add(tarea)
+                tarea.add_done_callback(_tareas_refresco.discard)
+            return entrada.valor
+        valor = await cargar()
+        if es_exitosa(valor):
+            cache_catalogos.guardar(clave, valor, ttl, Configuracion.ZOOM_CACHE_TTL_OBSOLETO)
+        return valor
+
+    async def _refrescar(self, clave, ruta: str, parametros: Optional[Dict[str, Any]], ttl: float) -> None:
+        try:
+            valor = await self._enviar(ruta, "GET", parametros)
+            if not es_exitosa(valor):
+                # Se sigue sirviendo la versión obsoleta hasta que venza su ventana
+                logger.warning(f"Refresco de catálogo {clave} con error ZOOM; se conserva la entrada anterior")
+                return
+            cache_catalogos.guardar(clave, valor, ttl, Configuracion.ZOOM_CACHE_TTL_OBSOLETO)
+        except Exception as e:
+            logger.warning(f"No se pudo refrescar catálogo {clave}: {e}")
+        finally:
+            cache_catalogos.liberar_refresco(clave)
+
+    async def _enviar(
+        self,
+        ruta: str,
+        metodo: str = "GET",
+        parametros: Optional[Dict[str, Any]] = None,
+        cuerpo: Optional[Dict[str, Any]] = None,
+        privado: bool = False,
+        url_alternativa: Optional[bool] = False,
+        usatoken: Optional[bool] = False,
+        token: Optional[str] = None,
+    ) -> Any:
+        url = self._construir_url(ruta, privado=privado, url_alternativa=url_alternativa)
+        logger.debug(f"URL solicitada (async): {metodo} {url}")
+        # Falla rápido si la ruta está abierta (ver circuito)
+        circuito = circuitos_zoom.obtener(ruta)
+        circuito.permitir()
+        politica_zoom.iniciar()
+        exito = None
+
+        try:
+            for intento in range(1, self.reintentos + 2):
+                try:
+                    headers = self._headers_privados(cuerpo, usatoken=usatoken, token=token) if privado else self._headers_publicos()
+                    async with limitar_async(ruta):
+                        resp = await self.http.request(metodo.upper(), url, params=parametros, json=cuerpo, headers=headers, timeout=self.timeout)
+                    logger.info(f"ZOOM {metodo.upper()} {url} -> {resp.status_code} (async)")
+                except httpx.TransportError as e:
+                    exito = False
+                    logger.warning(f"Error de red ({e}), intento {intento} de {self.reintentos + 1}")
+                    espera = politica_zoom.espera(intento, metodo, self.reintentos, error=e)
+                    if espera is None:
+                        raise ErrorZoom("Fallo de red al comunicar con ZOOM")
+                except ErrorZoom:
+                    # Rechazo local del limitador: no cuenta para el circuito
+                    raise
+                except Exception as e:
+                    logger.exception("Error inesperado en cliente ZOOM (async)")
+                    raise ErrorZoom(str(e))
+                else:
+                    # Un 5xx cuenta como fallo del circuito; errores de negocio no
+                    exito = resp.status_code < 500
+                    espera = politica_zoom.espera(intento, metodo, self.reintentos, respuesta=resp)
+                    if espera is None:
+                        return self._procesar_respuesta(resp)
+                    logger.warning(f"ZOOM respondió {resp.status_code}, intento {intento} de {self.reintentos + 1}")
+
+                if circuito.abierto():
+                    # Otro hilo abrió el circuito: no insistir
+                    raise ErrorUpstream(f"Servicio ZOOM '{ruta}' no disponible (circuito abierto)")
+                await asyncio.sleep(espera)
+        finally:
+            circuito.registrar(exito)
@@ -0,0 +1,117 @@
+"""
+Coalescencia de solicitudes (single-flight) – Español
+-----------------------------------------------------
+Cuando varias solicitudes idénticas llegan a la vez (misma ruta y parámetros),
+solo la primera ("líder") llama a ZOOM; las demás esperan y reciben el mismo
+resultado o la misma excepción. Hay una variante para hilos (`GrupoVuelo`) y
+otra para asyncio (`GrupoVueloAsync`).
+"""
+from __future__ import annotations
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from ..configuracion import Configuracion
+
+
+class _Vuelo:
+    __slots__ = ("evento", "resultado", "error")
+
+    def __init__(self) -> None:
+        self.evento = threading.Event()
+        self.resultado: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class GrupoVuelo:
+    """Single-flight entre hilos de un mismo worker."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._vuelos: Dict[Hashable, _Vuelo] = {}
+        self.lideres = 0
+        self.coalescidas = 0
+
+    def hacer(self, clave: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            vuelo = self._vuelos.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = _Vuelo()
+                self._vuelos[clave] = vuelo
+                self.lideres += 1
+            else:
+                self.coalescidas += 1
+
+        if not lider:
+            vuelo.evento.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.resultado
+
+        try:
+            vuelo.resultado = fn()
+            return vuelo.resultado
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                self._vuelos.pop(clave, None)
+            vuelo.evento.set()
+
+    def en_vuelo(self) -> int:
+        with self._lock:
+            return len(self._vuelos)
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {"lideres": self.lideres, "coalescidas": self.coalescidas, "en_vuelo": self.en_vuelo()}
+
+
+class GrupoVueloAsync:
+    """Single-flight entre tareas asyncio (las claves se separan por event loop)."""
+
+    def __init__(self) -> None:
+        self._vuelos: Dict[Hashable, asyncio.Future] = {}
+        self.lideres = 0
+        self.coalescidas = 0
+
+    async def hacer(self, clave: Hashable, fabrica: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        clave = (id(loop), clave)
+        futuro = self._vuelos.get(clave)
+        if futuro is not None:
+            self.coalescidas += 1
+            # shield: si un seguidor se cancela no debe cancelar al líder
+            return await asyncio.shield(futuro)
+
+        futuro = loop.create_future()
+        self._vuelos[clave] = futuro
+        self.lideres += 1
+        try:
+            resultado = await fabrica()
+            futuro.set_result(resultado)
+            return resultado
+        except BaseException as e:
+            futuro.set_exception(e)
+            # Marcar la excepción como recuperada si nadie más la esperaba
+            futuro.exception()
+            raise
+        finally:
+            self._vuelos.pop(clave, None)
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {"lideres": self.lideres, "coalescidas": self.coalescidas, "en_vuelo": len(self._vuelos)}
+
+
+vuelos_zoom = GrupoVuelo()
+vuelos_zoom_async = GrupoVueloAsync()
+
+
+def coalescer_habilitado(metodo: str) -> bool:
+    """Solo se coalescen GET: son idempotentes y su resultado es compartible."""
+    return Configuracion.ZOOM_COALESCER_GET and metodo.upper() == "GET"
+
+
+def estadisticas_coalescencia() -> Dict[str, Any]:
+    return {"hilos": vuelos_zoom.estadisticas(), "async": vuelos_zoom_async.estadisticas()}
@@ -0,0 +1,236 @@
+"""
+Índice de cobertura ZOOM – Español
+----------------------------------
+Zonas no servidas (`zonasNoServidasWs`) de todas las ciudades, obtenidas por
+adelantado e indexadas por ciudad:
+
+    codciudad -> ZonasExcluidas(municipios, parroquias, codpostales, zonas)
+
+Con el índice cargado, verificar una dirección es una búsqueda en memoria:
+`/api/cobertura` revisa muchas direcciones en una sola llamada y
+`validar_payload_estructura` rechaza destinos no servidos sin consultar a ZOOM.
+
+Carga inicial desde el snapshot de catálogos (que incluye `zonasNoServidasWs`)
+y refresco completo en paralelo cada `ZOOM_COBERTURA_INTERVALO` segundos. Una
+ciudad que aún no está en el índice se reporta como `servida: None` (desconocida)
+y no se rechaza. Una respuesta de error de ZOOM (`CODE_xxx`) no se carga: la
+ciudad conserva sus zonas anteriores en vez de quedar como totalmente servida.
+"""
+from __future__ import annotations
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .cache_catalogos import ClaveCatalogo, es_exitosa
+from .rastreo_catalogos import registros, codigo_de, _ClienteCaptura, _en_paralelo
+from .indice_geografia import indice_geografia, CIUDAD
+from .buscador_geografia import normalizar
+from .snapshot_catalogos import leer_snapshot
+from ..configuracion import Configuracion
+from ..core.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_MUNICIPIO = ("codmunicipio", "codigo_municipio")
+CAMPOS_PARROQUIA = ("codparroquia", "codigo_parroquia")
+CAMPOS_POSTAL = ("codpostal", "codigo_postal", "zona_postal")
+CAMPOS_ZONA = ("zona", "nombre_zona", "sector", "descripcion")
+
+
+@dataclass
+class ZonasExcluidas:
+    municipios: set = field(default_factory=set)
+    parroquias: set = field(default_factory=set)
+    codpostales: set = field(default_factory=set)
+    zonas: set = field(default_factory=set)
+    verificado: float = 0.0
+
+    @classmethod
+    def desde_respuesta(cls, respuesta: Any, verificado: Optional[float] = None) -> "ZonasExcluidas":
+        """Cada registro excluye solo su nivel más específico (un sector dentro de un
+        municipio no excluye el municipio completo)."""
+        zonas = cls(verificado=verificado or time.time())
+        for r in registros(respuesta):
+            nombre = codigo_de(r, *CAMPOS_ZONA)
+            if nombre:
+                zonas.zonas.add(normalizar(nombre))
+                continue
+            for conjunto, campos in ((zonas.parroquias, CAMPOS_PARROQUIA), (zonas.codpostales, CAMPOS_POSTAL),
+                                     (zonas.municipios, CAMPOS_MUNICIPIO)):
+                valor = codigo_de(r, *campos)
+                if valor:
+                    conjunto.add(valor)
+                    break
+        return zonas
+
+    def total(self) -> int:
+        return len(self.municipios) + len(self.parroquias) + len(self.codpostales) + len(self.zonas)
+
+
+def _texto(valor: Any) -> str:
+    return "" if valor is None else str(valor).strip()
+
+
+class IndiceCobertura:
+    """Zonas no servidas por ciudad, en memoria."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.ciudades: Dict[str, ZonasExcluidas] = {}
+        self.origen: Optional[str] = None
+        self.actualizado: Optional[float] = None
+        self.verificaciones = 0
+        self.rechazos = 0
+        self.ultimo_refresco: Dict[str, Any] = {}
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def cargado(self) -> bool:
+        return bool(self.ciudades)
+
+    def cargar_respuestas(self, respuestas: Dict[ClaveCatalogo, Any], origen: str,
+                          verificado: Optional[Dict[ClaveCatalogo, float]] = None) -> int:
+        """Carga las respuestas `zonasNoServidasWs` (por clave de catálogo) en el índice.
+
+        Las respuestas con error se omiten y la ciudad conserva su entrada anterior.
+        """
+        verificado = verificado or {}
+        nuevas: Dict[str, ZonasExcluidas] = {}
+        for clave, respuesta in respuestas.items():
+            ruta, params = clave
+            if ruta != Configuracion.RUTA_ZOOM_ZONASNOSERVIDASWS:
+                continue
+            codciudad = dict(params).get("codciudad")
+            if not codciudad:
+                continue
+            if not es_exitosa(respuesta):
+                logger.warning(f"Cobertura de la ciudad {codciudad}: respuesta de error de ZOOM, se conserva la anterior")
+                continue
+            nuevas[codciudad] = ZonasExcluidas.desde_respuesta(respuesta, verificado.get(clave))
+        if not nuevas:
+            return 0
+        with self._lock:
+            self.ciudades.update(nuevas)
+            self.origen = origen
+            self.actualizado = time.time()
+        logger.info(f"Cobertura cargada desde {origen}: {len(nuevas)} ciudades")
+        return len(nuevas)
+
+    def cargar_snapshot(self, archivo: Optional[str] = None) -> int:
+        try:
+            _, filas = leer_snapshot(archivo or Configuracion.ZOOM_SNAPSHOT_ARCHIVO)
+        except Exception as e:
+            logger.warning(f"No se pudo leer el snapshot para la cobertura: {e}")
+            return 0
+        filas = {c: f for c, f in filas.items() if c[0] == Configuracion.RUTA_ZOOM_ZONASNOSERVIDASWS}
+        return self.cargar_respuestas(
+            {c: json.loads(f["datos"]) for c, f in filas.items()}, "snapshot",
+            {c: float(f["verificado"]) for c, f in filas.items()},
+        )
+
+    def _codigos_ciudades(self) -> List[str]:
+        if indice_geografia.cargado:
+            return list(indice_geografia.registros[CIUDAD])
+        from .cliente_zoom import ClienteZoom
+        cliente = ClienteZoom(
+            base_url=Configuracion.ZOOM_BASE_URL,
+            timeout=Configuracion.ZOOM_TIMEOUT,
+            reintentos=Configuracion.ZOOM_REINTENTOS,
+        )
+        codigos = [codigo_de(r, "codciudad", "codigo_ciudad", "id", "codigo")
+                   for r in registros(cliente.obtener_listado_generico_ciudades())]
+        return [c for c in codigos if c]
+
+    async def _rastrear(self, ciudades: List[str]) -> Dict[ClaveCatalogo, Any]:
+        cliente = _ClienteCaptura(
+            base_url=Configuracion.ZOOM_BASE_URL,
+            timeout=Configuracion.ZOOM_TIMEOUT,
+            reintentos=Configuracion.ZOOM_REINTENTOS,
+        )
+        await _en_paralelo([cliente.obtener_zonas_noservidasws(codciudad=c) for c in ciudades],
+                           Configuracion.ZOOM_RASTREO_MAX_PARALELO)
+        return cliente.capturas
+
+    def refrescar(self) -> Dict[str, Any]:
+        """Vuelve a pedir las zonas no servidas de todas las ciudades (bloqueante)."""
+        from .bucle_async import ejecutar_y_esperar
+        inicio = time.time()
+        ciudades = self._codigos_ciudades()
+        capturas = ejecutar_y_esperar(self._rastrear(ciudades)) if ciudades else {}
+        cargadas = self.cargar_respuestas(capturas, "rastreo")
+        self.ultimo_refresco = {
+            "fecha": inicio,
+            "duracion": round(time.time() - inicio, 2),
+            "ciudades": len(ciudades),
+            "cargadas": cargadas,
+        }
+        return self.ultimo_refresco
+
+    def _ciclo(self) -> None:
+        while True:
+            vencido = self.actualizado is None or time.time() - self.actualizado >= Configuracion.ZOOM_COBERTURA_INTERVALO
+            if vencido:
+                try:
+                    self.refrescar()
+                except Exception as e:
+                    logger.exception(f"Error refrescando la cobertura: {e}")
+            time.sleep(min(60.0, Configuracion.ZOOM_COBERTURA_INTERVALO))
+
+    def iniciar(self) -> None:
+        """Carga desde el snapshot y arranca el hilo de refresco (una vez por proceso)."""
+        if not self.cargado and self.cargar_snapshot():
+            # El snapshot cuenta como carga reciente según su fecha de verificación
+            self.actualizado = min(z.verificado for z in self.ciudades.values())
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._ciclo, name="cobertura-zoom", daemon=True)
+            self._hilo.start()
+
+    def verificar(self, direccion: Dict[str, Any]) -> Dict[str, Any]:
+        """`{"servida": True | False | None, "motivo": ...}` para una dirección.
+
+        Campos de la dirección: `codciudad` (requerido), `codmunicipio`,
+        `codparroquia`, `codpostal`, `zona`.
+        """
+        codciudad = _texto(direccion.get("codciudad"))
+        resultado: Dict[str, Any] = {"codciudad": codciudad or None}
+        if not codciudad:
+            return dict(resultado, servida=None, motivo="codciudad es requerido")
+        with self._lock:
+            self.verificaciones += 1
+            zonas = self.ciudades.get(codciudad) if Configuracion.ZOOM_COBERTURA_HABILITADA else None
+        if zonas is None:
+            return dict(resultado, servida=None, motivo="ciudad sin información de cobertura")
+        motivo = None
+        if _texto(direccion.get("codmunicipio")) in zonas.municipios:
+            motivo = f"municipio {direccion.get('codmunicipio')} no servido"
+        elif _texto(direccion.get("codparroquia")) in zonas.parroquias:
+            motivo = f"parroquia {direccion.get('codparroquia')} no servida"
+        elif _texto(direccion.get("codpostal")) in zonas.codpostales:
+            motivo = f"zona postal {direccion.get('codpostal')} no servida"
+        elif direccion.get("zona") and normalizar(direccion.get("zona")) in zonas.zonas:
+            motivo = f"zona {direccion.get('zona')} no servida"
+        if motivo:
+            with self._lock:
+                self.rechazos += 1
+            metricas.incrementar("cobertura.no_servidas")
+            return dict(resultado, servida=False, motivo=motivo)
+        return dict(resultado, servida=True, motivo=None)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "habilitada": Configuracion.ZOOM_COBERTURA_HABILITADA,
+                "origen": self.origen,
+                "ciudades": len(self.ciudades),
+                "zonas_excluidas": sum(z.total() for z in self.ciudades.values()),
+                "actualizado": self.actualizado,
+                "verificaciones": self.verificaciones,
+                "rechazos": self.rechazos,
+                "ultimo_refresco": self.ultimo_refresco,
+            }
+
+
+indice_cobertura = IndiceCobertura()
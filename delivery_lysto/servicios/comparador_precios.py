@@ -0,0 +1,148 @@
+"""
+Comparador de precios ZOOM – Español
+------------------------------------
+A partir de una sola descripción del envío consulta en paralelo (con
+`ClienteZoomAsync`) los `consultar_precio_*` aplicables: COD (1), Nacional (2),
+Internacional (3), Casillero aéreo (4) y Casillero marítimo (5). La latencia
+total es la de la consulta más lenta, no la suma.
+
+La descripción usa los nombres de parámetro de `consultarPreciosWs`
+(`ciudad_remitente`, `siglas_pd`, `codpais_destinatario`, ...) más `peso`;
+si no se indican `tipos_precio`, se consultan los que tengan sus campos
+requeridos presentes.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .cliente_zoom_async import ClienteZoomAsync
+from .cache_cotizaciones import es_exitosa
+from ..configuracion import Configuracion
+from ..core.errores import ErrorZoom
+
+logger = logging.getLogger(__name__)
+
+SERVICIOS = {
+    1: "COD",
+    2: "Nacional",
+    3: "Internacional",
+    4: "Casillero aéreo",
+    5: "Casillero marítimo",
+}
+
+# Campos mínimos para considerar un tipo de precio aplicable
+REQUERIDOS = {
+    1: ("tipo_tarifa", "modalidad_tarifa", "ciudad_remitente", "ciudad_destinatario", "peso"),
+    2: ("tipo_tarifa", "modalidad_tarifa", "ciudad_remitente", "ciudad_destinatario", "peso"),
+    3: ("siglas_po", "ciudad_o", "siglas_pd", "ciudad_d", "peso", "alto", "ancho", "largo"),
+    4: ("codpais_remitente", "codpais_destinatario", "peso"),
+    5: ("codpais_remitente", "codpais_destinatario", "peso", "alto", "ancho", "largo"),
+}
+
+
+def _presente(valor: Any) -> bool:
+    return valor is not None and str(valor).strip() != ""
+
+
+def tipos_aplicables(descripcion: Dict[str, Any]) -> List[int]:
+    """Tipos de precio cuyos campos requeridos vienen en la descripción."""
+    return [t for t, campos in REQUERIDOS.items() if all(_presente(descripcion.get(c)) for c in campos)]
+
+
+def _numero(valor: Any) -> Optional[float]:
+    if valor is None or isinstance(valor, bool):
+        return None
+    try:
+        return float(str(valor).replace(",", ".").strip())
+    except ValueError:
+        return None
+
+
+def extraer_total(data: Any) -> Optional[float]:
+    """Monto total de una respuesta de precios (primer campo de `ZOOM_PRECIO_CAMPOS_TOTAL` encontrado)."""
+    entidad = data.get("entidadRespuesta", data) if isinstance(data, dict) else data
+    if isinstance(entidad, list):
+        entidad = entidad[0] if entidad else None
+    if not isinstance(entidad, dict):
+        return None
+    por_nombre = {str(k).lower(): v for k, v in entidad.items()}
+    for campo in Configuracion.ZOOM_PRECIO_CAMPOS_TOTAL:
+        total = _numero(por_nombre.get(campo))
+        if total is not None:
+            return total
+    return None
+
+
+def _consulta(cliente: ClienteZoomAsync, tipo: int, d: Dict[str, Any]):
+    """Corrutina del `consultar_precio_*` correspondiente (valida en el momento de crearla)."""
+    if tipo in (1, 2):
+        return cliente.consultar_precio_cod_nacional(
+            tipo, d.get("tipo_tarifa"), d.get("modalidad_tarifa"), d.get("ciudad_remitente"),
+            d.get("ciudad_destinatario"), d.get("oficina_retirar", 0), d.get("cantidad_piezas", 1),
+            d.get("peso"), d.get("valor_declarado", 0),
+        )
+    if tipo == 3:
+        return cliente.consultar_precio_internacional(
+            d.get("peso"), d.get("fecha_envio") or datetime.now().strftime("%Y-%m-%d"),
+            d.get("siglas_pd"), d.get("ciudad_d"), d.get("siglas_po"), d.get("ciudad_o"),
+            d.get("valor_declarado", 0), d.get("merdoc", "M"), d.get("codciudadori", d.get("ciudad_remitente")),
+            d.get("alto"), d.get("ancho"), d.get("largo"),
+            d.get("zipcode_d"), d.get("suburb_d"), d.get("zipcode_o"), d.get("suburb_o"),
+        )
+    if tipo == 4:
+        return cliente.consultar_precio_casillero_aereo(
+            d.get("codpais_remitente"), d.get("codpais_destinatario"), d.get("oficina_retirar", 2),
+            d.get("peso"), d.get("valor_mercancia", 0), d.get("codtipoenv", 1), d.get("codservicio", 0),
+            d.get("ciudad_destinatario"),
+        )
+    if tipo == 5:
+        return cliente.consultar_precio_casillero_maritimo(
+            d.get("codpais_remitente"), d.get("codpais_destinatario"), d.get("oficina_retirar", 2),
+            d.get("peso"), d.get("valor_mercancia", 0), d.get("codtipoenv", 1), d.get("codservicio", 0),
+            d.get("ciudad_destinatario"), d.get("alto"), d.get("ancho"), d.get("largo"),
+        )
+    raise ValueError(f"tipo_precio no soportado: {tipo}")
+
+
+async def _cotizar(tipo: int, descripcion: Dict[str, Any]) -> Dict[str, Any]:
+    # Un cliente por consulta: `ultima_cache` es por instancia
+    cliente = ClienteZoomAsync(
+        base_url=Configuracion.ZOOM_BASE_URL,
+        timeout=Configuracion.ZOOM_TIMEOUT,
+        reintentos=Configuracion.ZOOM_REINTENTOS,
+    )
+    resultado: Dict[str, Any] = {"tipo_precio": tipo, "servicio": SERVICIOS.get(tipo, str(tipo))}
+    inicio = time.perf_counter()
+    try:
+        data = await _consulta(cliente, tipo, descripcion)
+    except ErrorZoom as e:
+        resultado.update(ok=False, error=e.mensaje)
+    except Exception as e:
+        resultado.update(ok=False, error=str(e))
+    else:
+        if not es_exitosa(data):
+            error = data.get("error") or data.get("mensaje") or data.get("codrespuesta") if isinstance(data, dict) else None
+            resultado.update(ok=False, error=error or "Respuesta sin precio", data=data)
+        else:
+            resultado.update(ok=True, total=extraer_total(data), data=data, cache=cliente.ultima_cache)
+    resultado["duracion"] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def _orden(resultado: Dict[str, Any]):
+    # Primero los exitosos con total (más barato primero), luego sin total, luego errores
+    total = resultado.get("total")
+    return (not resultado.get("ok"), total is None, total if total is not None else 0.0, resultado["tipo_precio"])
+
+
+async def comparar_precios(descripcion: Dict[str, Any], tipos: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """Consulta los tipos de precio en paralelo y devuelve la lista ordenada."""
+    tipos = tipos if tipos else tipos_aplicables(descripcion)
+    resultados = await asyncio.gather(*[_cotizar(t, descripcion) for t in tipos])
+    ranking = sorted(resultados, key=_orden)
+    for posicion, resultado in enumerate(ranking, start=1):
+        resultado["posicion"] = posicion
+    return ranking
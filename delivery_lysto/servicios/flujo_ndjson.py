@@ -0,0 +1,170 @@
+"""
+Respuestas NDJSON en streaming – Español
+----------------------------------------
+Modo `?stream=ndjson` para listados grandes (oficinas, ciudades, informes):
+en lugar de armar `{"ok": ..., "data": ...}` completo en memoria, cada
+registro sale en su propia línea apenas está disponible y la última línea
+resume el listado:
+
+    {"codoficina": "1", ...}
+    {"codoficina": "2", ...}
+    {"fin": true, "ok": true, "total": 2, "meta": {"codrespuesta": "COD_000", ...}}
+
+Si los registros no están ya en memoria (caché de catálogos / índice
+geográfico), se leen de ZOOM a medida que llega el cuerpo: `ExtractorRegistros`
+recorre el JSON por trozos y entrega cada objeto de la lista
+`entidadRespuesta` (o `data`, o la lista de primer nivel) sin esperar el
+resto. La memoria queda acotada al registro en curso.
+"""
+from __future__ import annotations
+import json
+import logging
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from flask import Response, current_app, request, stream_with_context
+
+from .cliente_zoom import ClienteZoom
+from .rastreo_catalogos import registros
+from .cache_cotizaciones import es_exitosa
+
+logger = logging.getLogger(__name__)
+
+MIME_NDJSON = "application/x-ndjson"
+
+# Claves del sobre ZOOM que contienen la lista de registros
+CAMPOS_LISTA = ("entidadRespuesta", "data")
+
+# Cadena JSON completa (o truncada al final del trozo) o un delimitador de estructura
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*("|\\?\Z)|[\[\]{}]', re.S)
+
+
+def quiere_ndjson() -> bool:
+    """`?stream=ndjson` o `Accept: application/x-ndjson`."""
+    return request.args.get("stream") == "ndjson" or MIME_NDJSON in request.headers.get("Accept", "")
+
+
+class ExtractorRegistros:
+    """Parser incremental: entrega los objetos de la lista de registros a medida que se completan.
+
+    Lo que queda fuera de la lista (el sobre: `codrespuesta`, `mensaje`, ...) se
+    conserva y se obtiene con `meta()` al terminar.
+    """
+
+    def __init__(self) -> None:
+        self._buf = ""
+        self._pos = 0
+        self._profundidad = 0
+        self._ultima_clave: Optional[str] = None
+        self._en_lista = False
+        self._lista_vista = False
+        self._nivel_lista = 0
+        self._inicio: Optional[int] = None
+        self._sobre: List[str] = []
+        self._corte = 0
+
+    def alimentar(self, texto: str) -> List[dict]:
+        self._buf += texto
+        buf, pos, nuevos = self._buf, self._pos, []
+        for m in _TOKEN.finditer(buf, pos):
+            token = m.group()
+            if token[0] == '"':
+                if m.group(1) != '"':
+                    break  # cadena cortada entre trozos: se reanuda con el siguiente
+                if self._profundidad == 1 and not self._en_lista:
+                    self._ultima_clave = token[1:-1]
+                pos = m.end()
+                continue
+            i = m.start()
+            if token in "{[":
+                if self._en_lista and self._profundidad == self._nivel_lista:
+                    if token == "{":
+                        self._inicio = i
+                elif (not self._lista_vista and token == "["
+                      and (self._profundidad == 0 or (self._profundidad == 1 and self._ultima_clave in CAMPOS_LISTA))):
+                    self._en_lista = self._lista_vista = True
+                    self._nivel_lista = self._profundidad + 1
+                    self._sobre.append(buf[self._corte:i + 1])
+                self._profundidad += 1
+            else:
+                self._profundidad -= 1
+                if self._en_lista and self._profundidad == self._nivel_lista and self._inicio is not None:
+                    nuevos.append(json.loads(buf[self._inicio:i + 1]))
+                    self._inicio = None
+                elif self._en_lista and self._profundidad == self._nivel_lista - 1:
+                    self._en_lista = False
+                    self._corte = i
+            pos = m.end()
+        self._pos = pos
+
+        # Dentro de la lista solo se conserva el registro en curso
+        if self._en_lista:
+            corte = self._inicio if self._inicio is not None else pos
+            self._buf = buf[corte:]
+            self._pos -= corte
+            if self._inicio is not None:
+                self._inicio = 0
+        return nuevos
+
+    def meta(self) -> Any:
+        """El sobre de la respuesta, sin la lista de registros."""
+        texto = "".join(self._sobre) + self._buf[self._corte:] if self._lista_vista else self._buf
+        sobre = json.loads(texto) if texto.strip() else None
+        if isinstance(sobre, dict):
+            return {k: v for k, v in sobre.items() if not (k in CAMPOS_LISTA and v == [])}
+        return None
+
+
+def registros_desde_zoom(respuesta, extractor: Optional[ExtractorRegistros] = None) -> Iterator[dict]:
+    """Registros de una respuesta abierta con `ClienteZoom.abrir_flujo`, a medida que llegan."""
+    extractor = extractor or ExtractorRegistros()
+    try:
+        for trozo in respuesta.iter_text():
+            yield from extractor.alimentar(trozo)
+    finally:
+        respuesta.close()
+
+
+def flujo_zoom(cliente: ClienteZoom, ruta: str, metodo: str = "GET", parametros: Optional[Dict[str, Any]] = None,
+               cuerpo: Optional[Dict[str, Any]] = None, privado: bool = False) -> Response:
+    """Respuesta NDJSON leyendo los registros de ZOOM de forma incremental.
+
+    La conexión se abre antes de devolver la respuesta, así un error de ZOOM
+    (status o `Codrespuesta`) sale como error JSON normal y no a mitad del stream.
+    """
+    respuesta = cliente.abrir_flujo(ruta, metodo, parametros=parametros, cuerpo=cuerpo, privado=privado)
+    extractor = ExtractorRegistros()
+    return respuesta_ndjson(registros_desde_zoom(respuesta, extractor), meta=extractor.meta)
+
+
+def flujo_datos(data: Any) -> Response:
+    """Respuesta NDJSON para una respuesta ZOOM que ya está en memoria (caché / índice)."""
+    sobre = {k: v for k, v in data.items() if k not in CAMPOS_LISTA} if isinstance(data, dict) else None
+    return respuesta_ndjson(iter(registros(data)), meta=lambda: sobre)
+
+
+def respuesta_ndjson(filas: Iterable[dict], meta: Optional[Callable[[], Any]] = None, **resumen: Any) -> Response:
+    """Una línea JSON por registro y una línea final `{"fin": true, ...}`."""
+
+    def generar():
+        proveedor = current_app.json
+        total = 0
+        try:
+            for fila in filas:
+                total += 1
+                yield proveedor.dumps(fila) + "\n"
+        except Exception as e:
+            logger.exception(f"Error generando NDJSON tras {total} registros")
+            yield proveedor.dumps({"fin": True, "ok": False, "total": total, "error": str(e)}) + "\n"
+            return
+        final = {"fin": True, "ok": True, "total": total, **resumen}
+        if meta is not None:
+            try:
+                final["meta"] = meta()
+            except ValueError:
+                final["meta"] = None
+            # ZOOM puede responder 200 con un código de error en el sobre
+            final["ok"] = not isinstance(final["meta"], dict) or es_exitosa(final["meta"])
+        yield proveedor.dumps(final) + "\n"
+
+    return Response(stream_with_context(generar()), mimetype=MIME_NDJSON)
@@ -0,0 +1,157 @@
+"""
+Grafo de pasos concurrentes – Español
+-------------------------------------
+Ejecuta un conjunto de pasos con dependencias explícitas: cada paso arranca
+apenas terminaron los pasos de los que depende, y los independientes corren en
+paralelo en un pool de hilos. Lo usa el envío orquestado, donde
+validar servicios, calcular tarifa y guardar remitente/destinatario no
+dependen entre sí; solo token -> createShipment -> tracking/etiqueta es una
+cadena real.
+
+    grafo = GrafoPasos()
+    grafo.agregar("token", lambda r: pedir_token())
+    grafo.agregar("tarifa", lambda r: calcular_tarifa())
+    grafo.agregar("envio", lambda r: crear_envio(r["token"]), depende_de=("token",))
+    resultados = grafo.ejecutar()
+    resultados["envio"].resultado()   # valor o relanza la excepción del paso
+
+Un paso que lanza una excepción queda en estado `error`; los que dependen de
+él no se ejecutan (`omitido`). `ejecutar(observador=fn)` avisa `fn(nombre, estado)`
+cuando un paso arranca (`en_curso`) y cuando termina; lo usan los trabajos
+asíncronos para publicar el progreso. Las solicitudes síncronas usan el pool
+`ORQUESTADOR_MAX_PARALELO`; trabajos y lotes (`ejecutar(fondo=True)`) usan otro,
+acotado por `ORQUESTADOR_MAX_PARALELO_FONDO`, para no quitarles hilos. Cada paso corre con una copia del contexto
+(`contextvars`), así conserva el contexto de Flask de la solicitud.
+"""
+from __future__ import annotations
+import contextvars
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..configuracion import Configuracion
+from ..core.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+ERROR = "error"
+OMITIDO = "omitido"
+EN_CURSO = "en_curso"
+
+_ejecutor = ThreadPoolExecutor(max_workers=Configuracion.ORQUESTADOR_MAX_PARALELO, thread_name_prefix="pasos")
+_ejecutor_fondo = ThreadPoolExecutor(max_workers=Configuracion.ORQUESTADOR_MAX_PARALELO_FONDO,
+                                     thread_name_prefix="pasos-fondo")
+
+
+@dataclass
+class Paso:
+    nombre: str
+    funcion: Callable[[Dict[str, Any]], Any]
+    depende_de: Tuple[str, ...] = ()
+
+
+@dataclass
+class ResultadoPaso:
+    nombre: str
+    estado: str
+    valor: Any = None
+    error: Optional[BaseException] = None
+    inicio: float = 0.0
+    duracion: float = 0.0
+
+    def resultado(self) -> Any:
+        """El valor del paso; relanza su excepción si falló."""
+        if self.error is not None:
+            raise self.error
+        return self.valor
+
+
+class GrafoPasos:
+    """Pasos con dependencias, ejecutados en paralelo cuando es posible."""
+
+    def __init__(self) -> None:
+        self.pasos: Dict[str, Paso] = {}
+
+    def agregar(self, nombre: str, funcion: Callable[[Dict[str, Any]], Any], depende_de: Tuple[str, ...] = ()) -> None:
+        """Agrega un paso. `funcion` recibe `{dependencia: valor}`.
+
+        Las dependencias deben estar agregadas antes (así el grafo no puede tener ciclos).
+        """
+        faltantes = [d for d in depende_de if d not in self.pasos]
+        if faltantes:
+            raise ValueError(f"Paso '{nombre}' depende de pasos no definidos: {', '.join(faltantes)}")
+        if nombre in self.pasos:
+            raise ValueError(f"Paso '{nombre}' duplicado")
+        self.pasos[nombre] = Paso(nombre, funcion, tuple(depende_de))
+
+    def _correr(self, paso: Paso, valores: Dict[str, Any], origen: float) -> ResultadoPaso:
+        inicio = time.perf_counter()
+        try:
+            valor, error, estado = paso.funcion(valores), None, OK
+        except Exception as e:
+            logger.warning(f"Paso '{paso.nombre}' falló: {e}")
+            valor, error, estado = None, e, ERROR
+        duracion = time.perf_counter() - inicio
+        metricas.observar("orquestador.paso_segundos", duracion, paso=paso.nombre)
+        return ResultadoPaso(paso.nombre, estado, valor, error, round(inicio - origen, 4), round(duracion, 4))
+
+    def ejecutar(self, paralelo: Optional[bool] = None,
+                 observador: Optional[Callable[[str, str], None]] = None,
+                 fondo: bool = False) -> Dict[str, ResultadoPaso]:
+        """Ejecuta todos los pasos y devuelve sus resultados por nombre, en el orden en que se agregaron.
+
+        `fondo=True` (trabajos y lotes) corre los pasos en el pool de fondo.
+        """
+        ejecutor = _ejecutor_fondo if fondo else _ejecutor
+        avisar = observador or (lambda nombre, estado: None)
+        paralelo = Configuracion.ORQUESTADOR_PARALELO if paralelo is None else paralelo
+        origen = time.perf_counter()
+        resultados: Dict[str, ResultadoPaso] = {}
+        pendientes = dict(self.pasos)
+        en_curso: Dict[Future, str] = {}
+
+        while pendientes or en_curso:
+            listos = []
+            for nombre, paso in list(pendientes.items()):
+                dependencias = [resultados.get(d) for d in paso.depende_de]
+                if any(r is None for r in dependencias):
+                    continue
+                del pendientes[nombre]
+                if any(r.estado != OK for r in dependencias):
+                    resultados[nombre] = ResultadoPaso(nombre, OMITIDO)
+                    avisar(nombre, OMITIDO)
+                else:
+                    listos.append((paso, {d: resultados[d].valor for d in paso.depende_de}))
+            if not listos and not en_curso:
+                continue  # solo hubo omisiones: volver a revisar los pendientes
+
+            # Un único paso listo y nada en curso (o modo secuencial): se corre en este hilo
+            if not paralelo or (len(listos) == 1 and not en_curso):
+                for paso, valores in listos:
+                    avisar(paso.nombre, EN_CURSO)
+                    resultados[paso.nombre] = self._correr(paso, valores, origen)
+                    avisar(paso.nombre, resultados[paso.nombre].estado)
+                continue
+            for paso, valores in listos:
+                avisar(paso.nombre, EN_CURSO)
+                contexto = contextvars.copy_context()
+                en_curso[ejecutor.submit(contexto.run, self._correr, paso, valores, origen)] = paso.nombre
+            hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                nombre = en_curso.pop(futuro)
+                resultados[nombre] = futuro.result()
+                avisar(nombre, resultados[nombre].estado)
+
+        metricas.observar("orquestador.grafo_segundos", time.perf_counter() - origen)
+        return {nombre: resultados[nombre] for nombre in self.pasos}
+
+
+def tiempos(resultados: Dict[str, ResultadoPaso]) -> Dict[str, Any]:
+    """Resumen `{paso: {"estado", "inicio_ms", "duracion_ms"}}` para la respuesta."""
+    return {
+        nombre: {"estado": r.estado, "inicio_ms": round(r.inicio * 1000, 1), "duracion_ms": round(r.duracion * 1000, 1)}
+        for nombre, r in resultados.items()
+    }
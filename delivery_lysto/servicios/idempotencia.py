@@ -0,0 +1,204 @@
+"""
+Idempotencia del envío orquestado – Español
+-------------------------------------------
+Si el cliente agota su timeout y reintenta, el reintento no debe crear otro
+envío en ZOOM ni otra fila en `tb_delivery_envio_cab_zoom`. La clave sale de la
+cabecera `Idempotency-Key` o, si no viene, de `metadata.solicitud_id`, y se
+separa por login ZOOM (dos comercios pueden repetir solicitud_id).
+
+- Duplicado concurrente en el mismo worker: espera a la solicitud en curso
+  (single-flight) y recibe su misma respuesta.
+- Duplicado concurrente en otro worker: la reserva en MySQL (índice único
+  `ambito, clave`) lo detecta; espera sondeando hasta `IDEMPOTENCIA_ESPERA_SEGUNDOS`
+  y, si la original no terminó, responde 409.
+- Duplicado posterior: recibe la respuesta guardada (memoria o MySQL) sin
+  llamar a ZOOM, con `Idempotent-Replayed: true`.
+- Misma clave con otro payload: 422.
+
+Se guardan las respuestas 2xx y 4xx. Un 5xx o una excepción solo liberan la
+clave si el paso irreversible (`creacion_envio`, seguido con el observador de
+pasos como en trabajos y lotes) nunca arrancó; si arrancó, ZOOM pudo haber
+creado el envío aunque la llamada fallara (timeout de lectura, error posterior),
+así que el 5xx se guarda y el reintento lo recibe en vez de crear otro envío.
+Las claves vencen a los `IDEMPOTENCIA_TTL_SEGUNDOS`; el evento
+`idempotencia_limpieza` de MySQL las borra.
+Sin MySQL la idempotencia queda limitada a la memoria del worker.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import request
+
+from .cache_catalogos import CacheTTL
+from .coalescencia import GrupoVuelo
+from .grafo_pasos import EN_CURSO as PASO_EN_CURSO
+from .trabajos import json_bd, cargar_json_bd
+from ..configuracion import Configuracion
+from ..core.errores import Conflicto, NoProcesable, ParametrosInvalidos
+from ..core.metricas import metricas
+from ..db.conexion import ejecutar_sp_bool, ejecutar_sp_resultados
+
+logger = logging.getLogger(__name__)
+
+RESERVADA = "RESERVADA"
+COMPLETADA = "COMPLETADA"
+EN_CURSO = "EN_CURSO"
+CONFLICTO = "CONFLICTO"
+
+CABECERA = "Idempotency-Key"
+MAX_LARGO_CLAVE = 255
+
+# (cuerpo, status, cabeceras)
+Respuesta = Tuple[Dict[str, Any], int, Dict[str, str]]
+# fn(observador) -> Respuesta; `observador(paso, estado)` como en `GrafoPasos.ejecutar`
+Procesador = Callable[[Callable[[str, str], None]], Respuesta]
+
+MENSAJE_INDETERMINADO = ("El envío falló después de iniciar createShipment y pudo haberse creado en ZOOM; "
+                         "revisar en ZOOM antes de reintentar con otra clave")
+
+
+def clave_idempotencia(payload: Dict[str, Any]) -> Optional[str]:
+    """`Idempotency-Key` o `metadata.solicitud_id`, prefijada con el login ZOOM; None si no hay."""
+    if not Configuracion.IDEMPOTENCIA_HABILITADA:
+        return None
+    clave = request.headers.get(CABECERA) or (payload.get("metadata") or {}).get("solicitud_id")
+    if clave in (None, ""):
+        return None
+    login = (payload.get("autenticacion_zoom") or {}).get("login") or ""
+    clave = f"{login}|{clave}"
+    if len(clave) > MAX_LARGO_CLAVE:
+        raise ParametrosInvalidos(f"{CABECERA} demasiado larga (máximo {MAX_LARGO_CLAVE} caracteres)")
+    return clave
+
+
+def huella(payload: Dict[str, Any]) -> str:
+    canonico = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(canonico.encode("utf-8"), digest_size=32).hexdigest()
+
+
+class Idempotencia:
+    """Respuestas idempotentes de un ámbito (p. ej. `envio_zoom`)."""
+
+    def __init__(self, ambito: str, paso_irreversible: str = "") -> None:
+        self.ambito = ambito
+        self.paso_irreversible = paso_irreversible
+        self._vuelos = GrupoVuelo()
+        self._memoria = CacheTTL(Configuracion.IDEMPOTENCIA_MEMORIA_MAX)
+        self._lock = threading.Lock()
+        self.repetidas = 0
+        self.ejecutadas = 0
+        self.conflictos = 0
+
+    def ejecutar(self, clave: str, payload: Dict[str, Any], fn: Procesador) -> Tuple[Respuesta, bool]:
+        """Ejecuta `fn(observador)` una sola vez por clave; devuelve `(respuesta, repetida)`."""
+        firma = huella(payload)
+        propia = []
+
+        def lider() -> Tuple[Respuesta, bool]:
+            propia.append(True)
+            return self._resolver(clave, firma, fn)
+
+        respuesta, repetida = self._vuelos.hacer((clave, firma), lider)
+        repetida = repetida or not propia  # quien esperó al líder recibe una respuesta repetida
+        with self._lock:
+            if repetida:
+                self.repetidas += 1
+            else:
+                self.ejecutadas += 1
+        metricas.incrementar("idempotencia.solicitudes", ambito=self.ambito, repetida=repetida)
+        return respuesta, repetida
+
+    def _resolver(self, clave: str, firma: str, fn: Procesador) -> Tuple[Respuesta, bool]:
+        entrada, _ = self._memoria.obtener(clave)
+        if entrada is not None:
+            guardada_firma, respuesta = entrada.valor
+            self._verificar_firma(guardada_firma, firma)
+            return respuesta, True
+
+        limite = time.monotonic() + Configuracion.IDEMPOTENCIA_ESPERA_SEGUNDOS
+        pausa, espero = 0.1, False
+        while True:
+            filas = ejecutar_sp_resultados("sp_idempotencia_reservar", self.ambito, clave, firma,
+                                           Configuracion.IDEMPOTENCIA_TTL_SEGUNDOS,
+                                           Configuracion.IDEMPOTENCIA_EN_CURSO_MAX_SEGUNDOS)
+            if not filas:
+                if espero:
+                    # La BD se cayó mientras otra solicitud tenía la clave: no arriesgar un duplicado
+                    raise Conflicto("Hay una solicitud con la misma clave de idempotencia en curso; reintente más tarde")
+                # Sin BD: solo protegen el single-flight y la memoria de este worker
+                return self._correr(clave, firma, fn, persistente=False), False
+            fila = filas[0]
+            estado = fila.get("resultado")
+            if estado == RESERVADA:
+                return self._correr(clave, firma, fn, persistente=True), False
+            if estado == CONFLICTO:
+                self._verificar_firma(None, firma)
+            if estado == COMPLETADA:
+                guardada = cargar_json_bd(fila.get("respuesta")) or {}
+                respuesta = (guardada.get("cuerpo") or {}, fila.get("codigo_http") or 200, guardada.get("cabeceras") or {})
+                self._memoria.guardar(clave, (firma, respuesta), Configuracion.IDEMPOTENCIA_TTL_SEGUNDOS)
+                return respuesta, True
+            # EN_CURSO en otro worker: esperar a que termine (o libere la clave)
+            if time.monotonic() >= limite:
+                raise Conflicto("Hay una solicitud con la misma clave de idempotencia en curso; reintente más tarde")
+            time.sleep(pausa)
+            pausa, espero = min(pausa * 2, 1.0), True
+
+    def _verificar_firma(self, guardada: Optional[str], firma: str) -> None:
+        if guardada != firma:
+            with self._lock:
+                self.conflictos += 1
+            raise NoProcesable("La clave de idempotencia ya se usó con un payload distinto")
+
+    def _correr(self, clave: str, firma: str, fn: Procesador, persistente: bool) -> Respuesta:
+        iniciado = threading.Event()
+
+        def observador(paso: str, estado: str) -> None:
+            if paso == self.paso_irreversible and estado == PASO_EN_CURSO:
+                iniciado.set()
+
+        try:
+            cuerpo, status, cabeceras = fn(observador)
+        except BaseException:
+            if iniciado.is_set():
+                # No liberar: el reintento podría duplicar un envío que ZOOM sí creó
+                self._completar(clave, firma, ({"ok": False, "error": MENSAJE_INDETERMINADO}, 500, {}), persistente)
+            else:
+                self._liberar(clave, persistente)
+            raise
+        respuesta = (cuerpo, status, dict(cabeceras or {}))
+        if status >= 500 and not iniciado.is_set():
+            self._liberar(clave, persistente)
+            return respuesta
+        self._completar(clave, firma, respuesta, persistente)
+        return respuesta
+
+    def _liberar(self, clave: str, persistente: bool) -> None:
+        if persistente:
+            ejecutar_sp_bool("sp_idempotencia_liberar", self.ambito, clave)
+
+    def _completar(self, clave: str, firma: str, respuesta: Respuesta, persistente: bool) -> None:
+        cuerpo, status, cabeceras = respuesta
+        self._memoria.guardar(clave, (firma, respuesta), Configuracion.IDEMPOTENCIA_TTL_SEGUNDOS)
+        if persistente:
+            ejecutar_sp_bool("sp_idempotencia_completar", self.ambito, clave,
+                             json_bd({"cuerpo": cuerpo, "cabeceras": cabeceras}), status)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "habilitada": Configuracion.IDEMPOTENCIA_HABILITADA,
+                "ejecutadas": self.ejecutadas,
+                "repetidas": self.repetidas,
+                "conflictos": self.conflictos,
+                "en_vuelo": self._vuelos.en_vuelo(),
+                "memoria": self._memoria.estadisticas(),
+            }
+
+
+envios_idempotentes = Idempotencia("envio_zoom", paso_irreversible="creacion_envio")
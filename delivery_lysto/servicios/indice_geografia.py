@@ -0,0 +1,378 @@
+"""
+Índice geográfico en memoria – Español
+--------------------------------------
+Árbol estado -> ciudad -> municipio -> parroquia (más oficinas por ciudad y
+`codservicio`) cargado una vez en memoria por worker:
+
+- `registros[nivel][codigo]`: registro ZOOM tal cual.
+- `hijos[(nivel, codigo)]`: lista de códigos hijos (raíz = `("pais", "")`).
+- `padres[(nivel, codigo)]`: código del padre.
+
+La carga inicial sale del snapshot local de catálogos si existe y, si no, de un
+rastreo completo en paralelo (`rastrear_catalogos`). Después, un hilo refresca
+de forma incremental: en cada vuelta vuelve a pedir a ZOOM los hijos de los
+`ZOOM_GEOGRAFIA_LOTE` nodos verificados hace más de `ZOOM_GEOGRAFIA_VIGENCIA`,
+aplica las diferencias y los nodos nuevos se rastrean en las vueltas siguientes.
+Una respuesta de error de ZOOM (`CODE_xxx`) no se aplica: el nodo conserva sus
+hijos y queda vencido para reintentarse en la vuelta siguiente.
+
+Las rutas de catálogo responden desde el índice con el mismo formato de ZOOM;
+si el nodo aún no está cargado (o la consulta lleva filtros) se consulta a ZOOM.
+"""
+from __future__ import annotations
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache_catalogos import clave_catalogo, ClaveCatalogo, es_exitosa
+from .rastreo_catalogos import registros, codigo_de, rastrear_catalogos, _ClienteCaptura, _en_paralelo
+from .snapshot_catalogos import leer_snapshot
+from ..configuracion import Configuracion
+from ..core.errores import ErrorZoom
+from ..core.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+PAIS = "pais"
+ESTADO = "estado"
+CIUDAD = "ciudad"
+MUNICIPIO = "municipio"
+PARROQUIA = "parroquia"
+OFICINA = "oficina"
+
+CAMPOS_CODIGO = {
+    ESTADO: ("codestado", "codigo_estado", "id", "codigo"),
+    CIUDAD: ("codciudad", "codigo_ciudad", "id", "codigo"),
+    MUNICIPIO: ("codmunicipio", "codigo_municipio", "id", "codigo"),
+    PARROQUIA: ("codparroquia", "codigo_parroquia", "id", "codigo"),
+    OFICINA: ("codoficina", "codigo_oficina", "id", "codigo"),
+}
+
+# Nivel de los hijos de cada nivel y clave con la que se anidan en el subárbol
+NIVEL_HIJO = {PAIS: ESTADO, ESTADO: CIUDAD, CIUDAD: MUNICIPIO, MUNICIPIO: PARROQUIA}
+CLAVE_HIJOS = {ESTADO: "estados", CIUDAD: "ciudades", MUNICIPIO: "municipios", PARROQUIA: "parroquias"}
+
+Nodo = Tuple[str, str]
+RAIZ: Nodo = (PAIS, "")
+
+
+def _texto(valor: Any) -> str:
+    return "" if valor is None else str(valor).strip()
+
+
+def _exigir_exitosa(respuesta: Any, descripcion: str) -> None:
+    """Lanza `ErrorZoom` si ZOOM respondió con error, para no vaciar los hijos del nodo."""
+    if not es_exitosa(respuesta):
+        codigo = respuesta.get("codrespuesta") or respuesta.get("Codrespuesta") if isinstance(respuesta, dict) else None
+        raise ErrorZoom(f"Respuesta de error de ZOOM para {descripcion}: {respuesta}", codigo_zoom=codigo, status=502)
+
+
+def _sobre(respuesta: Any) -> Dict[str, Any]:
+    """Respuesta ZOOM sin la lista de registros (para reconstruir el mismo formato)."""
+    if isinstance(respuesta, dict):
+        return {k: v for k, v in respuesta.items() if k not in ("entidadRespuesta", "data")}
+    return {}
+
+
+class IndiceGeografia:
+    """Índice en memoria del árbol geográfico de ZOOM."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self.registros: Dict[str, Dict[str, dict]] = {n: {} for n in CAMPOS_CODIGO}
+        self.hijos: Dict[Nodo, List[str]] = {}
+        self.padres: Dict[Nodo, str] = {}
+        self.oficinas: Dict[Tuple[str, str], List[str]] = {}
+        self.verificado: Dict[Nodo, float] = {}
+        self._sobres: Dict[str, Dict[str, Any]] = {}
+        self.cargado = False
+        self.origen: Optional[str] = None
+        self.consultas = 0
+        self.aciertos = 0
+        self.refrescos = 0
+        self.cambios = 0
+        # Cambia con cada carga o refresco con diferencias (para índices derivados)
+        self.version = 0
+        self._hilo: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------ carga
+
+    def _aplicar_hijos(self, padre: Nodo, respuesta: Any, ahora: float) -> int:
+        """Reemplaza los hijos de `padre` con los de `respuesta`; devuelve cuántos cambiaron.
+
+        Lanza `ErrorZoom` si la respuesta es de error (los hijos actuales se conservan).
+        """
+        _exigir_exitosa(respuesta, f"{padre[0]} {padre[1]}".strip())
+        nivel = NIVEL_HIJO[padre[0]]
+        nuevos: Dict[str, dict] = {}
+        for r in registros(respuesta):
+            cod = codigo_de(r, *CAMPOS_CODIGO[nivel])
+            if cod:
+                nuevos[cod] = r
+        with self._lock:
+            previos = self.hijos.get(padre, [])
+            tabla = self.registros[nivel]
+            cambios = sum(1 for cod, r in nuevos.items() if tabla.get(cod) != r)
+            for cod in set(previos) - set(nuevos):
+                self._eliminar((nivel, cod))
+                cambios += 1
+            for cod, r in nuevos.items():
+                tabla[cod] = r
+                self.padres[(nivel, cod)] = padre[1]
+            self.hijos[padre] = list(nuevos)
+            self.verificado[padre] = ahora
+            self._sobres.setdefault(nivel, _sobre(respuesta))
+        return cambios
+
+    def _aplicar_oficinas(self, codciudad: str, codservicio: str, respuesta: Any) -> int:
+        _exigir_exitosa(respuesta, f"oficinas de la ciudad {codciudad} (codservicio {codservicio})")
+        nuevos: Dict[str, dict] = {}
+        for r in registros(respuesta):
+            cod = codigo_de(r, *CAMPOS_CODIGO[OFICINA])
+            if cod:
+                nuevos[cod] = r
+        with self._lock:
+            tabla = self.registros[OFICINA]
+            cambios = sum(1 for cod, r in nuevos.items() if tabla.get(cod) != r)
+            cambios += len(set(self.oficinas.get((codciudad, codservicio), [])) - set(nuevos))
+            tabla.update(nuevos)
+            self.oficinas[(codciudad, codservicio)] = list(nuevos)
+            self._sobres.setdefault(OFICINA, _sobre(respuesta))
+        return cambios
+
+    def _eliminar(self, nodo: Nodo) -> None:
+        """Quita un nodo y todo su subárbol (con el lock tomado)."""
+        nivel, cod = nodo
+        for hijo in self.hijos.pop(nodo, []):
+            self._eliminar((NIVEL_HIJO[nivel], hijo))
+        if nivel == CIUDAD:
+            for clave in [k for k in self.oficinas if k[0] == cod]:
+                for codoficina in self.oficinas.pop(clave):
+                    self.registros[OFICINA].pop(codoficina, None)
+        self.registros[nivel].pop(cod, None)
+        self.padres.pop(nodo, None)
+        self.verificado.pop(nodo, None)
+
+    def cargar_respuestas(self, respuestas: Dict[ClaveCatalogo, Any], origen: str,
+                          verificado: Optional[Dict[ClaveCatalogo, float]] = None) -> int:
+        """Construye el índice a partir de respuestas de catálogo indexadas por clave (rastreo o snapshot)."""
+        verificado = verificado or {}
+        ahora = time.time()
+
+        def aplicar(padre: Nodo, clave: ClaveCatalogo) -> List[str]:
+            if not es_exitosa(respuestas.get(clave)):
+                return []
+            self._aplicar_hijos(padre, respuestas[clave], verificado.get(clave, ahora))
+            return self.hijos.get(padre, [])
+
+        if not es_exitosa(respuestas.get(clave_catalogo(Configuracion.RUTA_ZOOM_ESTADOS))):
+            logger.warning(f"Índice geográfico: {origen} sin estados, se conserva el índice actual")
+            return 0
+        with self._lock:
+            self._reiniciar()
+            for estado in aplicar(RAIZ, clave_catalogo(Configuracion.RUTA_ZOOM_ESTADOS)):
+                for ciudad in aplicar((ESTADO, estado), clave_catalogo(Configuracion.RUTA_ZOOM_CIUDADES, {"codestado": estado})):
+                    for codservicio in Configuracion.ZOOM_SNAPSHOT_CODSERVICIOS:
+                        clave = clave_catalogo(Configuracion.RUTA_ZOOM_OFICINAS, {"codciudad": ciudad, "codservicio": codservicio})
+                        if es_exitosa(respuestas.get(clave)):
+                            self._aplicar_oficinas(ciudad, codservicio, respuestas[clave])
+                    for municipio in aplicar((CIUDAD, ciudad), clave_catalogo(Configuracion.RUTA_ZOOM_MUNICIPIOS, {"codciudad": ciudad})):
+                        aplicar((MUNICIPIO, municipio), clave_catalogo(
+                            Configuracion.RUTA_ZOOM_PARROQUIAS, {"codmunicipio": municipio, "codciudad": ciudad}))
+            self.cargado = bool(self.hijos.get(RAIZ))
+            self.origen = origen
+            self.version += 1
+        total = sum(len(t) for t in self.registros.values())
+        logger.info(f"Índice geográfico cargado desde {origen}: {total} registros")
+        return total
+
+    def _reiniciar(self) -> None:
+        self.registros = {n: {} for n in CAMPOS_CODIGO}
+        self.hijos, self.padres, self.oficinas, self.verificado = {}, {}, {}, {}
+
+    def cargar_snapshot(self, archivo: Optional[str] = None) -> int:
+        try:
+            _, filas = leer_snapshot(archivo or Configuracion.ZOOM_SNAPSHOT_ARCHIVO)
+        except Exception as e:
+            logger.warning(f"No se pudo leer el snapshot para el índice geográfico: {e}")
+            return 0
+        if not filas:
+            return 0
+        respuestas = {clave: json.loads(f["datos"]) for clave, f in filas.items()}
+        verificado = {clave: float(f["verificado"]) for clave, f in filas.items()}
+        return self.cargar_respuestas(respuestas, "snapshot", verificado)
+
+    def rastrear(self) -> int:
+        """Rastreo completo en paralelo (bloqueante)."""
+        from .bucle_async import ejecutar_y_esperar
+        return self.cargar_respuestas(ejecutar_y_esperar(rastrear_catalogos()), "rastreo")
+
+    # --------------------------------------------------------- refresco
+
+    def _pendientes(self, lote: int) -> List[Nodo]:
+        """Nodos con hijos cuya última verificación supera la vigencia (más antiguos primero)."""
+        limite = time.time() - Configuracion.ZOOM_GEOGRAFIA_VIGENCIA
+        with self._lock:
+            candidatos = [RAIZ] + [
+                (nivel, cod)
+                for nivel in (ESTADO, CIUDAD, MUNICIPIO)
+                for cod in self.registros[nivel]
+            ]
+            vencidos = [n for n in candidatos if self.verificado.get(n, 0.0) <= limite]
+        vencidos.sort(key=lambda n: self.verificado.get(n, 0.0))
+        return vencidos[:max(1, lote)]
+
+    async def _refrescar_nodo(self, cliente: _ClienteCaptura, nodo: Nodo) -> int:
+        nivel, cod = nodo
+        ahora = time.time()
+        if nivel != PAIS and cod not in self.registros[nivel]:
+            return 0  # eliminado por el refresco de su padre en esta misma vuelta
+        if nivel == PAIS:
+            return self._aplicar_hijos(nodo, await cliente.obtener_estados(filtro=None), ahora)
+        if nivel == ESTADO:
+            return self._aplicar_hijos(nodo, await cliente.obtener_ciudades(codestado=cod, filtro=None, idioma=None), ahora)
+        if nivel == CIUDAD:
+            cambios = 0
+            for codservicio in Configuracion.ZOOM_SNAPSHOT_CODSERVICIOS:
+                cambios += self._aplicar_oficinas(cod, codservicio, await cliente.obtener_oficinas(
+                    codciudad=cod, codservicio=codservicio, siglas=None, codpais=None))
+            return cambios + self._aplicar_hijos(nodo, await cliente.obtener_municipios(codciudad=cod, remitente=None), ahora)
+        codciudad = self.padres.get(nodo)
+        return self._aplicar_hijos(nodo, await cliente.obtener_parroquias(
+            codmunicipio=cod, codciudad=codciudad, remitente=None), ahora)
+
+    async def refrescar_async(self, lote: Optional[int] = None) -> Dict[str, Any]:
+        """Vuelve a pedir los hijos de un lote de nodos vencidos y aplica las diferencias."""
+        nodos = self._pendientes(lote or Configuracion.ZOOM_GEOGRAFIA_LOTE)
+        cliente = _ClienteCaptura(
+            base_url=Configuracion.ZOOM_BASE_URL,
+            timeout=Configuracion.ZOOM_TIMEOUT,
+            reintentos=Configuracion.ZOOM_REINTENTOS,
+        )
+        resultados = await _en_paralelo([self._refrescar_nodo(cliente, n) for n in nodos],
+                                        Configuracion.ZOOM_RASTREO_MAX_PARALELO)
+        cambios = sum(r for r in resultados if isinstance(r, int))
+        errores = sum(1 for r in resultados if isinstance(r, Exception))
+        with self._lock:
+            self.refrescos += 1
+            self.cambios += cambios
+            if cambios:
+                self.version += 1
+            self.cargado = self.cargado or bool(self.hijos.get(RAIZ))
+        if cambios:
+            logger.info(f"Índice geográfico: {cambios} cambios en {len(nodos)} nodos refrescados")
+        return {"nodos": len(nodos), "cambios": cambios, "errores": errores}
+
+    def refrescar(self, lote: Optional[int] = None) -> Dict[str, Any]:
+        from .bucle_async import ejecutar_y_esperar
+        return ejecutar_y_esperar(self.refrescar_async(lote))
+
+    def _ciclo(self) -> None:
+        if not self.cargado:
+            try:
+                self.rastrear()
+            except Exception as e:
+                logger.exception(f"Rastreo inicial del índice geográfico fallido: {e}")
+        while True:
+            time.sleep(Configuracion.ZOOM_GEOGRAFIA_INTERVALO)
+            try:
+                self.refrescar()
+            except Exception as e:
+                logger.exception(f"Error refrescando el índice geográfico: {e}")
+
+    def iniciar(self) -> None:
+        """Carga desde el snapshot y arranca el hilo de rastreo/refresco (una vez por proceso)."""
+        if not self.cargado:
+            self.cargar_snapshot()
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._ciclo, name="indice-geografia", daemon=True)
+            self._hilo.start()
+
+    # ------------------------------------------------------------ consultas
+
+    def _respuesta(self, nivel: str, codigos: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self.consultas += 1
+            if codigos is None:
+                return None
+            self.aciertos += 1
+            tabla = self.registros[nivel]
+            datos = [tabla[c] for c in codigos if c in tabla]
+            sobre = dict(self._sobres.get(nivel) or {"codrespuesta": "COD_000"})
+        metricas.incrementar("indice_geografia.aciertos", nivel=nivel)
+        sobre["entidadRespuesta"] = datos
+        return sobre
+
+    def _hijos_de(self, nodo: Nodo) -> Optional[List[str]]:
+        if not Configuracion.ZOOM_GEOGRAFIA_HABILITADA or nodo not in self.verificado:
+            return None
+        return self.hijos.get(nodo)
+
+    def estados(self) -> Optional[Dict[str, Any]]:
+        return self._respuesta(ESTADO, self._hijos_de(RAIZ))
+
+    def ciudades(self, codestado: Any) -> Optional[Dict[str, Any]]:
+        return self._respuesta(CIUDAD, self._hijos_de((ESTADO, _texto(codestado))))
+
+    def municipios(self, codciudad: Any) -> Optional[Dict[str, Any]]:
+        return self._respuesta(MUNICIPIO, self._hijos_de((CIUDAD, _texto(codciudad))))
+
+    def parroquias(self, codmunicipio: Any, codciudad: Any) -> Optional[Dict[str, Any]]:
+        nodo = (MUNICIPIO, _texto(codmunicipio))
+        if self.padres.get(nodo) != _texto(codciudad):
+            return self._respuesta(PARROQUIA, None)
+        return self._respuesta(PARROQUIA, self._hijos_de(nodo))
+
+    def oficinas_de(self, codciudad: Any, codservicio: Any) -> Optional[Dict[str, Any]]:
+        codigos = None
+        if Configuracion.ZOOM_GEOGRAFIA_HABILITADA:
+            codigos = self.oficinas.get((_texto(codciudad), _texto(codservicio)))
+        return self._respuesta(OFICINA, codigos)
+
+    def subarbol(self, nivel: str = PAIS, codigo: Any = "", profundidad: Optional[int] = None,
+                 codservicio: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Nodo con sus descendientes anidados (`ciudades`, `municipios`, `parroquias`).
+
+        Con `codservicio` cada ciudad incluye además sus `oficinas` para ese servicio.
+        """
+        nodo = (nivel, _texto(codigo))
+        with self._lock:
+            if not Configuracion.ZOOM_GEOGRAFIA_HABILITADA or not self.cargado:
+                return None
+            if nivel != PAIS and nodo[1] not in self.registros.get(nivel, {}):
+                return None
+            return self._armar(nodo, profundidad, codservicio)
+
+    def _armar(self, nodo: Nodo, profundidad: Optional[int], codservicio: Optional[str]) -> Dict[str, Any]:
+        nivel, cod = nodo
+        salida = {"nivel": nivel} if nivel == PAIS else dict(self.registros[nivel][cod])
+        if nivel == CIUDAD and codservicio:
+            tabla = self.registros[OFICINA]
+            salida["oficinas"] = [tabla[c] for c in self.oficinas.get((cod, codservicio), []) if c in tabla]
+        hijo = NIVEL_HIJO.get(nivel)
+        if hijo and (profundidad is None or profundidad > 0):
+            siguiente = None if profundidad is None else profundidad - 1
+            salida[CLAVE_HIJOS[hijo]] = [
+                self._armar((hijo, c), siguiente, codservicio)
+                for c in self.hijos.get(nodo, []) if c in self.registros[hijo]
+            ]
+        return salida
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "habilitado": Configuracion.ZOOM_GEOGRAFIA_HABILITADA,
+                "cargado": self.cargado,
+                "origen": self.origen,
+                "registros": {n: len(t) for n, t in self.registros.items()},
+                "nodos_verificados": len(self.verificado),
+                "consultas": self.consultas,
+                "aciertos": self.aciertos,
+                "refrescos": self.refrescos,
+                "cambios": self.cambios,
+            }
+
+
+indice_geografia = IndiceGeografia()
@@ -0,0 +1,231 @@
+"""
+Limitador de salida hacia ZOOM – Español
+----------------------------------------
+Controla cuántas solicitudes se envían a zoom.red, global y por ruta:
+
+- Tasa (token bucket): `tasa` solicitudes/segundo con ráfagas de hasta `rafaga`.
+- Concurrencia: como máximo `concurrencia` solicitudes en curso.
+
+Una solicitud que no obtiene cupo espera en cola hasta `ZOOM_LIMITE_ESPERA_MAX`
+segundos; pasado ese tiempo se rechaza con `ServicioSaturado` (503) sin llegar a
+ZOOM. Un valor 0 en tasa o concurrencia desactiva ese límite.
+
+Funciona con hilos (`limitar`) y con asyncio (`limitar_async`); ambos comparten
+los mismos cupos, por lo que la espera asíncrona se hace por sondeo breve.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Optional
+
+from ..configuracion import Configuracion
+from ..core.errores import ServicioSaturado
+from ..core.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+_SONDEO_MAX = 0.05
+
+
+class Limitador:
+    """Token bucket + límite de concurrencia (seguro entre hilos)."""
+
+    def __init__(self, nombre: str, tasa: float = 0.0, rafaga: int = 1, concurrencia: int = 0) -> None:
+        self.nombre = nombre
+        self.tasa = max(0.0, float(tasa))
+        self.rafaga = max(1, int(rafaga))
+        self.concurrencia = max(0, int(concurrencia))
+        self._tokens = float(self.rafaga)
+        self._ultimo = time.monotonic()
+        self._en_curso = 0
+        self._esperando = 0
+        self._cond = threading.Condition()
+
+    # --- concurrencia ---
+    def _tomar_cupo(self) -> bool:
+        if self.concurrencia and self._en_curso >= self.concurrencia:
+            return False
+        self._en_curso += 1
+        return True
+
+    def _soltar_cupo(self) -> None:
+        with self._cond:
+            self._en_curso = max(0, self._en_curso - 1)
+            self._cond.notify()
+
+    # --- tasa ---
+    def _reservar_token(self, max_espera: float) -> Optional[float]:
+        """Reserva un token; devuelve la espera necesaria o None si supera `max_espera`."""
+        if not self.tasa:
+            return 0.0
+        ahora = time.monotonic()
+        self._tokens = min(float(self.rafaga), self._tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+        espera = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.tasa
+        if espera > max_espera:
+            return None
+        # Se permite saldo negativo: la reserva queda hecha y el llamador duerme `espera`
+        self._tokens -= 1
+        return espera
+
+    def _rechazar(self, motivo: str) -> ServicioSaturado:
+        metricas.incrementar("limitador.rechazos", limite=self.nombre, motivo=motivo)
+        logger.warning(f"Solicitud a ZOOM rechazada por límite '{self.nombre}' ({motivo})")
+        return ServicioSaturado(f"Límite de solicitudes a ZOOM alcanzado ({self.nombre}); intente más tarde")
+
+    def adquirir(self, limite_tiempo: float) -> None:
+        """Bloquea hasta obtener cupo y token antes de `limite_tiempo` (monotonic)."""
+        with self._cond:
+            self._esperando += 1
+            try:
+                while not self._tomar_cupo():
+                    restante = limite_tiempo - time.monotonic()
+                    if restante <= 0:
+                        raise self._rechazar("concurrencia")
+                    self._cond.wait(restante)
+            finally:
+                self._esperando -= 1
+            espera = self._reservar_token(max(0.0, limite_tiempo - time.monotonic()))
+            if espera is None:
+                self._en_curso -= 1
+                self._cond.notify()
+                raise self._rechazar("tasa")
+        if espera:
+            time.sleep(espera)
+
+    async def adquirir_async(self, limite_tiempo: float) -> None:
+        pausa = 0.001
+        with self._cond:
+            self._esperando += 1
+        try:
+            while True:
+                with self._cond:
+                    if self._tomar_cupo():
+                        break
+                if time.monotonic() >= limite_tiempo:
+                    raise self._rechazar("concurrencia")
+                await asyncio.sleep(pausa)
+                pausa = min(_SONDEO_MAX, pausa * 2)
+        finally:
+            with self._cond:
+                self._esperando -= 1
+        with self._cond:
+            espera = self._reservar_token(max(0.0, limite_tiempo - time.monotonic()))
+            if espera is None:
+                self._en_curso -= 1
+                self._cond.notify()
+                raise self._rechazar("tasa")
+        if espera:
+            await asyncio.sleep(espera)
+
+    def liberar(self) -> None:
+        self._soltar_cupo()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "tasa": self.tasa,
+                "rafaga": self.rafaga,
+                "concurrencia": self.concurrencia,
+                "en_curso": self._en_curso,
+                "esperando": self._esperando,
+            }
+
+
+class RegistroLimitadores:
+    """Limitador global más uno por ruta (solo las rutas configuradas)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._global: Optional[Limitador] = None
+        self._por_ruta: Dict[str, Limitador] = {}
+        self._cargado = False
+
+    def _cargar(self) -> None:
+        with self._lock:
+            if self._cargado:
+                return
+            if Configuracion.ZOOM_LIMITE_TASA or Configuracion.ZOOM_LIMITE_CONCURRENCIA:
+                self._global = Limitador(
+                    "global",
+                    tasa=Configuracion.ZOOM_LIMITE_TASA,
+                    rafaga=Configuracion.ZOOM_LIMITE_RAFAGA,
+                    concurrencia=Configuracion.ZOOM_LIMITE_CONCURRENCIA,
+                )
+            for ruta, ajustes in Configuracion.ZOOM_LIMITE_POR_RUTA.items():
+                ruta = ruta.strip("/")
+                self._por_ruta[ruta] = Limitador(
+                    ruta,
+                    tasa=ajustes.get("tasa", 0),
+                    rafaga=ajustes.get("rafaga", Configuracion.ZOOM_LIMITE_RAFAGA),
+                    concurrencia=ajustes.get("concurrencia", 0),
+                )
+            self._cargado = True
+
+    def para(self, ruta: str) -> List[Limitador]:
+        """Limitadores que aplican a la ruta, en orden de adquisición (ruta, luego global)."""
+        if not self._cargado:
+            self._cargar()
+        limitadores = []
+        propio = self._por_ruta.get(ruta.strip("/"))
+        if propio is not None:
+            limitadores.append(propio)
+        if self._global is not None:
+            limitadores.append(self._global)
+        return limitadores
+
+    def estadisticas(self) -> Dict[str, Any]:
+        if not self._cargado:
+            self._cargar()
+        datos = {ruta: l.estadisticas() for ruta, l in self._por_ruta.items()}
+        if self._global is not None:
+            datos["global"] = self._global.estadisticas()
+        return datos
+
+
+limitadores_zoom = RegistroLimitadores()
+
+
+@contextmanager
+def limitar(ruta: str):
+    """Reserva cupo para una solicitud a ZOOM (hilos)."""
+    limitadores = limitadores_zoom.para(ruta)
+    if not limitadores:
+        yield
+        return
+    inicio = time.monotonic()
+    limite_tiempo = inicio + Configuracion.ZOOM_LIMITE_ESPERA_MAX
+    adquiridos = []
+    try:
+        for limitador in limitadores:
+            limitador.adquirir(limite_tiempo)
+            adquiridos.append(limitador)
+        metricas.observar("limitador.espera_segundos", time.monotonic() - inicio, ruta=ruta.strip("/"))
+        yield
+    finally:
+        for limitador in adquiridos:
+            limitador.liberar()
+
+
+@asynccontextmanager
+async def limitar_async(ruta: str):
+    """Reserva cupo para una solicitud a ZOOM (asyncio)."""
+    limitadores = limitadores_zoom.para(ruta)
+    if not limitadores:
+        yield
+        return
+    inicio = time.monotonic()
+    limite_tiempo = inicio + Configuracion.ZOOM_LIMITE_ESPERA_MAX
+    adquiridos = []
+    try:
+        for limitador in limitadores:
+            await limitador.adquirir_async(limite_tiempo)
+            adquiridos.append(limitador)
+        metricas.observar("limitador.espera_segundos", time.monotonic() - inicio, ruta=ruta.strip("/"))
+        yield
+    finally:
+        for limitador in adquiridos:
+            limitador.liberar()
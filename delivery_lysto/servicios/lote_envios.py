@@ -0,0 +1,266 @@
+"""
+Lotes de envíos orquestados – Español
+-------------------------------------
+Un comercio sube al cierre del día cientos de órdenes; el lote las recibe en
+un solo POST (arreglo JSON o CSV) y las procesa con un pool acotado de hilos
+(`LOTE_MAX_PARALELO`). Cada resultado se transmite en NDJSON apenas termina:
+
+    {"indice": 0, "estado": "COMPLETADO", "ok": true, "codigo_http": 201, "guia_zoom": "123", ...}
+    {"indice": 1, "estado": "FALLIDO", "ok": false, "codigo_http": 400, ...}
+    {"etiquetas": 1, "guias": ["123", ...], "ok": true, ...}
+    {"fin": true, "ok": true, "total": 3, "meta": {"id_lote": "...", "estados": {...}}}
+
+CSV: una fila por envío; las columnas son rutas con puntos del payload
+orquestado (`remitente.datos_personales.nombre_completo`, `paquete.peso_total`,
+...). Las celdas vacías se omiten; números y `true`/`false` se convierten
+(los valores con cero inicial, como teléfonos, quedan como texto).
+
+Reanudación: el lote y sus ítems se guardan en `tb_delivery_lote` /
+`tb_delivery_lote_item`. Si la conexión o el worker se cae, reanudar el lote
+devuelve primero los ítems ya terminados (`"previo": true`) y procesa el resto.
+Un ítem que quedó en ENVIANDO (createShipment iniciado sin respuesta) no se
+repite: queda FALLIDO para revisarlo en ZOOM. `sp_lote_item_tomar` evita que
+dos workers procesen el mismo ítem.
+"""
+from __future__ import annotations
+import csv
+import io
+import logging
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import request
+
+from .grafo_pasos import EN_CURSO as PASO_EN_CURSO
+from .trabajos import json_bd, cargar_json_bd
+from ..configuracion import Configuracion
+from ..core.errores import Conflicto, ParametrosInvalidos
+from ..core.metricas import metricas
+from ..db.conexion import ejecutar_sp_bool, ejecutar_sp_resultados
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = "PENDIENTE"
+EN_CURSO = "EN_CURSO"
+ENVIANDO = "ENVIANDO"
+COMPLETADO = "COMPLETADO"
+FALLIDO = "FALLIDO"
+FINALES = (COMPLETADO, FALLIDO)
+
+# Paso del orquestador a partir del cual repetir el ítem duplicaría el envío en ZOOM
+PASO_IRREVERSIBLE = "creacion_envio"
+
+_ejecutor = ThreadPoolExecutor(max_workers=Configuracion.LOTE_MAX_PARALELO, thread_name_prefix="lote")
+_propietario = f"{socket.gethostname()}:{os.getpid()}"
+
+# Lotes en ejecución en este worker (una reanudación concurrente del mismo lote responde 409)
+_activos: set = set()
+_lock_activos = threading.Lock()
+
+# Sin cero inicial: teléfonos, zonas postales y códigos como "0414..." quedan como texto
+_ENTERO = re.compile(r"-?(0|[1-9]\d*)")
+_DECIMAL = re.compile(r"-?(0|[1-9]\d*)\.\d+")
+
+
+# --- Entrada: JSON o CSV ---
+
+def _valor_csv(texto: str) -> Any:
+    if texto.lower() in ("true", "false"):
+        return texto.lower() == "true"
+    if _ENTERO.fullmatch(texto):
+        return int(texto)
+    if _DECIMAL.fullmatch(texto):
+        return float(texto)
+    return texto
+
+
+def payload_desde_fila_csv(fila: Dict[str, str]) -> Dict[str, Any]:
+    """`{"a.b.c": "1"}` -> `{"a": {"b": {"c": 1}}}` (celdas vacías se omiten)."""
+    payload: Dict[str, Any] = {}
+    for columna, texto in fila.items():
+        if not columna or texto is None or not texto.strip():
+            continue
+        *ruta, hoja = columna.strip().split(".")
+        nodo = payload
+        for parte in ruta:
+            nodo = nodo.setdefault(parte, {})
+        nodo[hoja] = _valor_csv(texto.strip())
+    return payload
+
+
+def payloads_desde_solicitud() -> List[Dict[str, Any]]:
+    """Payloads del lote: arreglo JSON, `{"envios": [...]}` o CSV (`text/csv` o `?formato=csv`)."""
+    if request.mimetype == "text/csv" or request.args.get("formato") == "csv":
+        texto = request.get_data(as_text=True)
+        payloads = [payload_desde_fila_csv(f) for f in csv.DictReader(io.StringIO(texto))]
+    else:
+        cuerpo = request.get_json(silent=True)
+        payloads = cuerpo.get("envios") if isinstance(cuerpo, dict) else cuerpo
+        if not isinstance(payloads, list) or not all(isinstance(p, dict) for p in payloads):
+            raise ParametrosInvalidos("El lote debe ser un arreglo JSON de envíos, {\"envios\": [...]} o CSV")
+    if not payloads:
+        raise ParametrosInvalidos("El lote no tiene envíos")
+    if len(payloads) > Configuracion.LOTE_MAX_ENVIOS:
+        raise ParametrosInvalidos(f"Máximo {Configuracion.LOTE_MAX_ENVIOS} envíos por lote")
+    return payloads
+
+
+# --- Lote e ítems ---
+
+@dataclass
+class ItemLote:
+    indice: int
+    payload: Dict[str, Any]
+    estado: str = PENDIENTE
+    resultado: Optional[Dict[str, Any]] = None
+    codigo_http: Optional[int] = None
+
+    def guia(self) -> Optional[str]:
+        guia = ((self.resultado or {}).get("respuesta_final") or {}).get("guia_zoom")
+        return guia if self.estado == COMPLETADO and guia and guia != "Guía no generada" else None
+
+    def linea(self, previo: bool = False) -> Dict[str, Any]:
+        linea = {
+            "indice": self.indice,
+            "estado": self.estado,
+            "ok": bool(self.estado == COMPLETADO and (self.resultado or {}).get("ok")),
+            "codigo_http": self.codigo_http,
+            "guia_zoom": self.guia(),
+            "resultado": self.resultado,
+        }
+        if previo:
+            linea["previo"] = True
+        return linea
+
+
+class Lote:
+    def __init__(self, id_lote: str, items: List[ItemLote], persistente: bool = True) -> None:
+        self.id_lote = id_lote
+        self.items = items
+        self.persistente = persistente
+
+    @classmethod
+    def crear(cls, payloads: List[Dict[str, Any]]) -> "Lote":
+        lote = cls(uuid.uuid4().hex, [ItemLote(i, p) for i, p in enumerate(payloads)])
+        lote.persistente = ejecutar_sp_bool("sp_lote_crear", lote.id_lote, json_bd(payloads))
+        if not lote.persistente:
+            logger.warning(f"Lote {lote.id_lote} sin persistir en BD; no se podrá reanudar")
+        metricas.incrementar("lotes.envios", len(payloads))
+        return lote
+
+    @classmethod
+    def cargar(cls, id_lote: str, con_payload: bool = True) -> Optional["Lote"]:
+        filas = ejecutar_sp_resultados("sp_lote_obtener", id_lote, con_payload)
+        if not filas:
+            return None
+        items = [ItemLote(f["indice"], cargar_json_bd(f.get("payload")) or {}, f["estado"],
+                          cargar_json_bd(f.get("resultado")), f.get("codigo_http"))
+                 for f in sorted(filas, key=lambda f: f["indice"])]
+        return cls(id_lote, items)
+
+    def marcar(self, item: ItemLote, estado: str, resultado: Optional[Dict[str, Any]] = None,
+               codigo_http: Optional[int] = None) -> None:
+        item.estado = estado
+        if resultado is not None:
+            item.resultado, item.codigo_http = resultado, codigo_http
+        if self.persistente:
+            ejecutar_sp_bool("sp_lote_item_actualizar", self.id_lote, item.indice, estado,
+                             json_bd(resultado), codigo_http)
+
+    def _tomar(self, item: ItemLote) -> bool:
+        if not self.persistente:
+            return True
+        filas = ejecutar_sp_resultados("sp_lote_item_tomar", self.id_lote, item.indice, _propietario,
+                                       Configuracion.LOTE_TOMA_SEGUNDOS)
+        return not filas or bool(filas[0].get("tomado"))
+
+    def estados(self) -> Dict[str, int]:
+        conteo: Dict[str, int] = {}
+        for item in self.items:
+            conteo[item.estado] = conteo.get(item.estado, 0) + 1
+        return conteo
+
+    def resumen(self) -> Dict[str, Any]:
+        return {"id_lote": self.id_lote, "total": len(self.items), "estados": self.estados(),
+                "persistente": self.persistente}
+
+    def _procesar_item(self, item: ItemLote, procesar, app) -> Optional[ItemLote]:
+        if not self._tomar(item):
+            return None  # lo procesa otro worker
+        item.estado = EN_CURSO  # en BD ya lo marcó sp_lote_item_tomar
+
+        def observador(paso: str, estado: str) -> None:
+            if paso == PASO_IRREVERSIBLE and estado == PASO_EN_CURSO:
+                self.marcar(item, ENVIANDO)
+
+        inicio = time.perf_counter()
+        try:
+            with app.app_context():
+                resultado, status = procesar(item, observador)
+        except Exception as e:
+            logger.exception(f"Lote {self.id_lote}: ítem {item.indice} falló")
+            resultado, status = {"ok": False, "error": str(e)}, 500
+        self.marcar(item, COMPLETADO if status < 400 else FALLIDO, resultado, status)
+        metricas.observar("lotes.item_segundos", time.perf_counter() - inicio, estado=item.estado)
+        return item
+
+    def ejecutar(self, procesar: Callable[[ItemLote, Callable[[str, str], None]], Tuple[Dict[str, Any], int]],
+                 app, al_terminar: Optional[Callable[["Lote"], Iterable[Dict[str, Any]]]] = None) -> Iterator[Dict[str, Any]]:
+        """Procesa los ítems pendientes; devuelve un iterador con una línea por ítem a medida que terminan.
+
+        Los ítems ya terminados (reanudación) salen primero con `"previo": true`.
+        `al_terminar(lote)` puede agregar líneas al final (p. ej. etiquetas por lote).
+        Lanza `Conflicto` (antes de empezar a transmitir) si el lote ya corre en este worker.
+        """
+        with _lock_activos:
+            if self.id_lote in _activos:
+                raise Conflicto(f"El lote {self.id_lote} ya se está procesando")
+            _activos.add(self.id_lote)
+        return self._lineas(procesar, app, al_terminar)
+
+    def _lineas(self, procesar, app, al_terminar) -> Iterator[Dict[str, Any]]:
+        try:
+            pendientes = []
+            for item in self.items:
+                if item.estado in FINALES:
+                    yield item.linea(previo=True)
+                elif item.estado == ENVIANDO:
+                    self.marcar(item, FALLIDO, {"ok": False, "error": "Interrumpido durante createShipment; "
+                                                "revisar en ZOOM antes de reintentar"}, 500)
+                    yield item.linea()
+                else:
+                    pendientes.append(item)
+
+            # Si el cliente se desconecta los ítems enviados al pool terminan igual (y quedan en BD)
+            futuros = [_ejecutor.submit(self._procesar_item, item, procesar, app) for item in pendientes]
+            for futuro in as_completed(futuros):
+                hecho = futuro.result()
+                if hecho is not None:
+                    yield hecho.linea()
+            for item in pendientes:
+                if item.estado not in FINALES:
+                    yield {"indice": item.indice, "estado": item.estado, "ok": None, "en_otro_worker": True}
+
+            if al_terminar is not None:
+                yield from al_terminar(self)
+        finally:
+            self.liberar()
+
+    def liberar(self) -> None:
+        """Quita la reserva del lote (también al cerrar la respuesta, por si nunca se transmitió)."""
+        with _lock_activos:
+            _activos.discard(self.id_lote)
+
+
+def estadisticas_lotes() -> Dict[str, Any]:
+    with _lock_activos:
+        activos = len(_activos)
+    return {"activos": activos, "max_paralelo": Configuracion.LOTE_MAX_PARALELO,
+            "max_envios": Configuracion.LOTE_MAX_ENVIOS, "etiquetas_por_llamada": Configuracion.LOTE_ETIQUETAS_POR_LLAMADA}
@@ -0,0 +1,296 @@
+"""
+Matriz de tarifas precalculadas – Español
+-----------------------------------------
+Precalcula `CalcularTarifa` nacional para los pares origen/destino más usados
+(`ZOOM_MATRIZ_PARES`) en cada combinación de tipo de tarifa, modalidad y banda
+de peso, y la guarda en una tabla SQLite local indexada por esos campos.
+`/api/CalcularTarifa` responde desde la matriz cuando la consulta cae en un
+punto precalculado: una pieza, sin oficina de retiro, sin valores declarados ni
+dimensiones, y un peso exactamente igual a una banda (`ZOOM_MATRIZ_PESOS`); sin
+redondeo, cualquier otro peso se consulta a ZOOM.
+
+Un hilo por worker revisa la matriz cada `ZOOM_MATRIZ_INTERVALO` segundos; solo
+el worker que obtiene el candado de archivo la recalcula, los demás recargan
+el archivo nuevo. Igual que la caché de cotizaciones, la matriz no cruza el
+cambio de día tarifario (`ZOOM_COTIZACION_HORA_CORTE`): un punto calculado antes
+del último corte no se sirve, y la matriz se recalcula en la vuelta siguiente.
+"""
+from __future__ import annotations
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cliente_zoom_async import ClienteZoomAsync
+from .cache_cotizaciones import es_exitosa, ultimo_corte
+from ..configuracion import Configuracion
+from ..core.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+ClavePunto = Tuple[str, str, str, str, str]
+
+# Parámetros que deben venir vacíos (o en su valor por defecto) para usar la matriz
+_NEUTROS = {
+    "cantidad_piezas": ("", "1"),
+    "oficina_retirar": ("", "0"),
+    "valor_mercancia": ("", "0"),
+    "valor_declarado": ("", "0"),
+    "codpais": ("",),
+    "tipo_envio": ("",),
+    "zona_postal": ("",),
+    "alto": ("",),
+    "ancho": ("",),
+    "largo": ("",),
+}
+
+
+def _texto(valor: Any) -> str:
+    return "" if valor is None else str(valor).strip()
+
+
+def clave_punto(tipo_tarifa, modalidad_tarifa, ciudad_remitente, ciudad_destinatario, peso) -> ClavePunto:
+    return (_texto(tipo_tarifa), _texto(modalidad_tarifa), _texto(ciudad_remitente),
+            _texto(ciudad_destinatario), _texto(peso))
+
+
+def banda_peso(valor: Any) -> Optional[str]:
+    """Banda de `ZOOM_MATRIZ_PESOS` numéricamente igual a `valor` ("5.0" -> "5"), o None."""
+    try:
+        numero = float(_texto(valor))
+    except ValueError:
+        return None
+    for banda in Configuracion.ZOOM_MATRIZ_PESOS:
+        try:
+            if float(banda) == numero:
+                return banda
+        except ValueError:
+            continue
+    return None
+
+
+def puntos_configurados() -> List[ClavePunto]:
+    puntos = []
+    for origen, destino in Configuracion.ZOOM_MATRIZ_PARES:
+        for tipo in Configuracion.ZOOM_MATRIZ_TIPOS_TARIFA:
+            for modalidad in Configuracion.ZOOM_MATRIZ_MODALIDADES:
+                for peso in Configuracion.ZOOM_MATRIZ_PESOS:
+                    puntos.append(clave_punto(tipo, modalidad, origen, destino, peso))
+    return puntos
+
+
+async def calcular_matriz(cliente: Optional[ClienteZoomAsync] = None, max_paralelo: Optional[int] = None) -> Tuple[Dict[ClavePunto, Any], int]:
+    """Consulta ZOOM para todos los puntos; devuelve `({punto: respuesta}, errores)`."""
+    cliente = cliente or ClienteZoomAsync(
+        base_url=Configuracion.ZOOM_BASE_URL,
+        timeout=Configuracion.ZOOM_TIMEOUT,
+        reintentos=Configuracion.ZOOM_REINTENTOS,
+    )
+    semaforo = asyncio.Semaphore(max(1, max_paralelo or Configuracion.ZOOM_RASTREO_MAX_PARALELO))
+    resultados: Dict[ClavePunto, Any] = {}
+    errores = 0
+
+    async def uno(punto: ClavePunto) -> None:
+        nonlocal errores
+        tipo, modalidad, origen, destino, peso = punto
+        async with semaforo:
+            try:
+                data = await cliente.obtener_tarifa(
+                    tipo_tarifa=tipo, modalidad_tarifa=modalidad, ciudad_remitente=origen,
+                    ciudad_destinatario=destino, cantidad_piezas=1, peso=peso,
+                )
+            except Exception as e:
+                errores += 1
+                logger.warning(f"Matriz de tarifas: fallo en {punto}: {e}")
+                return
+        if es_exitosa(data):
+            resultados[punto] = data
+        else:
+            errores += 1
+
+    await asyncio.gather(*[uno(p) for p in puntos_configurados()])
+    return resultados, errores
+
+
+def escribir_matriz(resultados: Dict[ClavePunto, Any], archivo: Optional[str] = None,
+                    calculado: Optional[float] = None) -> None:
+    """Escribe la matriz completa de forma atómica (archivo temporal + `os.replace`).
+
+    `calculado` es cuándo empezó el cálculo (los precios son de ese día tarifario).
+    """
+    archivo = archivo or Configuracion.ZOOM_MATRIZ_ARCHIVO
+    os.makedirs(os.path.dirname(os.path.abspath(archivo)), exist_ok=True)
+    temporal = f"{archivo}.tmp-{os.getpid()}"
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    ahora = calculado or time.time()
+    conn = sqlite3.connect(temporal)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE TABLE tarifas (tipo_tarifa TEXT NOT NULL, modalidad_tarifa TEXT NOT NULL, "
+                "ciudad_remitente TEXT NOT NULL, ciudad_destinatario TEXT NOT NULL, peso TEXT NOT NULL, "
+                "datos TEXT NOT NULL, actualizado REAL NOT NULL, "
+                "PRIMARY KEY (tipo_tarifa, modalidad_tarifa, ciudad_remitente, ciudad_destinatario, peso))"
+            )
+            conn.executemany(
+                "INSERT INTO tarifas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [punto + (json.dumps(datos, ensure_ascii=False), ahora) for punto, datos in resultados.items()],
+            )
+    finally:
+        conn.close()
+    os.replace(temporal, archivo)
+
+
+def leer_matriz(archivo: Optional[str] = None) -> Dict[ClavePunto, Tuple[Any, float]]:
+    archivo = archivo or Configuracion.ZOOM_MATRIZ_ARCHIVO
+    if not os.path.exists(archivo):
+        return {}
+    conn = sqlite3.connect(f"file:{archivo}?mode=ro", uri=True)
+    try:
+        filas = conn.execute(
+            "SELECT tipo_tarifa, modalidad_tarifa, ciudad_remitente, ciudad_destinatario, peso, datos, actualizado FROM tarifas"
+        ).fetchall()
+    finally:
+        conn.close()
+    return {tuple(f[:5]): (json.loads(f[5]), f[6]) for f in filas}
+
+
+class MatrizTarifas:
+    """Copia en memoria de la tabla SQLite, con estadísticas de uso."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._puntos: Dict[ClavePunto, Tuple[Any, float]] = {}
+        self._mtime: Optional[float] = None
+        # Inicio del cálculo más antiguo entre los puntos cargados
+        self._calculada: Optional[float] = None
+        self.consultas = 0
+        self.aciertos = 0
+        self.ultimo_calculo: Dict[str, Any] = {}
+        self._hilo: Optional[threading.Thread] = None
+
+    def recargar(self, archivo: Optional[str] = None) -> bool:
+        """Carga el archivo si cambió desde la última lectura."""
+        archivo = archivo or Configuracion.ZOOM_MATRIZ_ARCHIVO
+        try:
+            mtime = os.path.getmtime(archivo)
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            puntos = leer_matriz(archivo)
+        except Exception as e:
+            logger.warning(f"No se pudo leer la matriz de tarifas '{archivo}': {e}")
+            return False
+        with self._lock:
+            self._puntos = puntos
+            self._mtime = mtime
+            self._calculada = min((actualizado for _, actualizado in puntos.values()), default=None)
+        logger.info(f"Matriz de tarifas cargada: {len(puntos)} puntos desde {archivo}")
+        return True
+
+    def buscar(self, parametros: Dict[str, Any]) -> Optional[Tuple[Any, float]]:
+        """`(datos, edad)` si la consulta cae en un punto precalculado."""
+        if not Configuracion.ZOOM_MATRIZ_HABILITADA:
+            return None
+        with self._lock:
+            self.consultas += 1
+        for campo, neutros in _NEUTROS.items():
+            if _texto(parametros.get(campo)) not in neutros:
+                return None
+        # Solo un peso igual a una banda: ZOOM puede cobrar distinto dentro de la banda
+        peso = banda_peso(parametros.get("peso"))
+        if peso is None:
+            return None
+        punto = clave_punto(parametros.get("tipo_tarifa"), parametros.get("modalidad_tarifa"),
+                            parametros.get("ciudad_remitente"), parametros.get("ciudad_destinatario"), peso)
+        with self._lock:
+            encontrado = self._puntos.get(punto)
+            # Calculado antes del cambio de día tarifario: precio del día anterior
+            if encontrado is None or encontrado[1] < ultimo_corte():
+                return None
+            self.aciertos += 1
+        metricas.incrementar("matriz_tarifas.aciertos")
+        datos, actualizado = encontrado
+        return datos, time.time() - actualizado
+
+    def recalcular(self, archivo: Optional[str] = None) -> Dict[str, Any]:
+        """Recalcula y escribe la matriz (bloqueante; se usa desde el hilo de fondo o el script)."""
+        from .bucle_async import ejecutar_y_esperar
+        inicio = time.time()
+        resultados, errores = ejecutar_y_esperar(calcular_matriz())
+        esperados = len(puntos_configurados())
+        if resultados:
+            escribir_matriz(resultados, archivo, calculado=inicio)
+        self.ultimo_calculo = {
+            "fecha": inicio,
+            "duracion": round(time.time() - inicio, 2),
+            "calculados": len(resultados),
+            "esperados": esperados,
+            "errores": errores,
+        }
+        logger.info(f"Matriz de tarifas recalculada: {len(resultados)}/{esperados} puntos, {errores} errores")
+        self.recargar(archivo)
+        return self.ultimo_calculo
+
+    def vencida(self) -> bool:
+        """Sin matriz, más vieja que `ZOOM_MATRIZ_INTERVALO` o calculada antes del último corte tarifario."""
+        if self._mtime is None or time.time() - self._mtime >= Configuracion.ZOOM_MATRIZ_INTERVALO:
+            return True
+        return self._calculada is not None and self._calculada < ultimo_corte()
+
+    def _ciclo(self) -> None:
+        archivo = Configuracion.ZOOM_MATRIZ_ARCHIVO
+        os.makedirs(os.path.dirname(os.path.abspath(archivo)), exist_ok=True)
+        while True:
+            try:
+                self.recargar(archivo)
+                if self.vencida():
+                    # Solo un worker recalcula; el resto recarga el archivo en la próxima vuelta
+                    with open(f"{archivo}.lock", "w") as candado:
+                        try:
+                            fcntl.flock(candado, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            pass
+                        else:
+                            self.recargar(archivo)
+                            if self.vencida():
+                                self.recalcular(archivo)
+            except Exception as e:
+                logger.exception(f"Error en el ciclo de la matriz de tarifas: {e}")
+            time.sleep(min(60.0, Configuracion.ZOOM_MATRIZ_INTERVALO))
+
+    def iniciar(self) -> None:
+        """Carga la matriz y arranca el hilo de refresco (una vez por proceso)."""
+        self.recargar()
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._ciclo, name="matriz-tarifas", daemon=True)
+            self._hilo.start()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            puntos = len(self._puntos)
+            consultas, aciertos = self.consultas, self.aciertos
+        esperados = len(puntos_configurados())
+        return {
+            "habilitada": Configuracion.ZOOM_MATRIZ_HABILITADA,
+            "puntos": puntos,
+            "esperados": esperados,
+            "cobertura": round(puntos / esperados, 4) if esperados else 0.0,
+            "consultas": consultas,
+            "aciertos": aciertos,
+            "tasa_aciertos": round(aciertos / consultas, 4) if consultas else 0.0,
+            "actualizada": self._mtime,
+            "vencida": self.vencida(),
+            "ultimo_calculo": self.ultimo_calculo,
+        }
+
+
+matriz_tarifas = MatrizTarifas()
@@ -0,0 +1,186 @@
+"""
+Políticas y passthrough del proxy genérico ZOOM – Español
+---------------------------------------------------------
+Cada ruta del proxy tiene una política (`PROXY_RUTAS`):
+
+    {"getNuevoCatalogo": {"metodos": ["GET"], "ttl": 3600, "timeout": 5, "coalescer": true},
+     "nuevoReporteWs":   {"metodos": ["POST"], "timeout": 60, "modo": "passthrough"}}
+
+- `metodos`: métodos permitidos (405 si no).
+- `ttl`: segundos que se guarda la respuesta 200 de un GET (0 = sin caché).
+- `timeout`: timeout hacia ZOOM (por defecto `ZOOM_TIMEOUT`).
+- `coalescer`: GET idénticos concurrentes comparten una sola llamada.
+- `modo`: `envoltura` (`{"ok", "ruta", "metodo", "data"}`, por defecto según
+  `PROXY_MODO`) o `passthrough` (bytes de ZOOM tal cual, con sus cabeceras).
+
+Con `PROXY_SOLO_PERMITIDAS` las rutas fuera de la lista responden 403.
+
+En `passthrough` sin caché ni coalescencia el cuerpo de ZOOM se reenvía en
+streaming sin decodificar (`iter_raw`): la compresión de ZOOM llega intacta al
+cliente y la memoria no depende del tamaño de la respuesta. Con caché o
+coalescencia hace falta el cuerpo completo: se descarga una vez (bytes, sin
+parsear JSON) y se comparte.
+"""
+from __future__ import annotations
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from flask import Response, request
+
+from .cliente_zoom import ClienteZoom
+from .cache_catalogos import CacheTTL, clave_catalogo, obtener_o_cargar
+from .coalescencia import vuelos_zoom
+from ..configuracion import Configuracion
+from ..core.errores import RutaNoPermitida
+from ..core.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+PASSTHROUGH = "passthrough"
+ENVOLTURA = "envoltura"
+METODOS = ("GET", "POST", "PUT", "DELETE", "PATCH")
+
+# Cabeceras que dependen de cómo viajó el cuerpo de ZOOM (no aplican a un cuerpo ya decodificado)
+CABECERAS_TRANSPORTE = ("content-encoding", "content-length")
+
+
+@dataclass(frozen=True)
+class PoliticaProxy:
+    metodos: Tuple[str, ...] = ("GET",)
+    ttl: float = 0.0
+    timeout: Optional[float] = None
+    coalescer: bool = False
+    modo: str = PASSTHROUGH
+
+    @classmethod
+    def desde_config(cls, valores: Dict[str, Any]) -> "PoliticaProxy":
+        return cls(
+            metodos=tuple(m.upper() for m in valores.get("metodos", ("GET",))),
+            ttl=float(valores.get("ttl", 0) or 0),
+            timeout=float(valores["timeout"]) if valores.get("timeout") else None,
+            coalescer=bool(valores.get("coalescer", False)),
+            modo=valores.get("modo", Configuracion.PROXY_MODO),
+        )
+
+
+@dataclass
+class RespuestaCruda:
+    status: int
+    cabeceras: Dict[str, str]
+    contenido: bytes
+
+
+# (ruta, parámetros, privado) -> RespuestaCruda
+_respuestas = CacheTTL(Configuracion.PROXY_CACHE_MAX_ENTRADAS)
+
+
+def politica_de(ruta: str, metodo: str) -> PoliticaProxy:
+    """Política de la ruta; lanza `RutaNoPermitida` si no está en la lista o el método no aplica."""
+    valores = Configuracion.PROXY_RUTAS.get(ruta.strip("/"))
+    if valores is None:
+        if Configuracion.PROXY_SOLO_PERMITIDAS:
+            raise RutaNoPermitida(f"Ruta '{ruta}' no permitida en el proxy")
+        politica = PoliticaProxy(metodos=METODOS, modo=Configuracion.PROXY_MODO)
+    else:
+        politica = PoliticaProxy.desde_config(valores)
+    if metodo.upper() not in politica.metodos:
+        raise RutaNoPermitida(f"Método {metodo} no permitido para '{ruta}'", status=405)
+    return politica
+
+
+def _cabeceras_solicitud(conservar_condicionales: bool) -> Dict[str, str]:
+    cabeceras = {}
+    for nombre in Configuracion.PROXY_CABECERAS_SOLICITUD:
+        if not conservar_condicionales and nombre.lower().startswith("if-"):
+            continue
+        valor = request.headers.get(nombre)
+        if valor:
+            cabeceras[nombre] = valor
+    return cabeceras
+
+
+def _cabeceras_respuesta(origen, decodificado: bool) -> Dict[str, str]:
+    permitidas = {c.lower() for c in Configuracion.PROXY_CABECERAS_RESPUESTA}
+    return {
+        k: v for k, v in origen.headers.items()
+        if k.lower() in permitidas and not (decodificado and k.lower() in CABECERAS_TRANSPORTE)
+    }
+
+
+def _descargar(cliente: ClienteZoom, ruta: str, metodo: str, parametros, contenido, privado) -> RespuestaCruda:
+    respuesta = cliente.abrir_flujo(ruta, metodo, parametros=parametros, privado=privado, contenido=contenido,
+                                    cabeceras=_cabeceras_solicitud(False), procesar_errores=False)
+    try:
+        respuesta.read()
+    finally:
+        respuesta.close()
+    return RespuestaCruda(respuesta.status_code, _cabeceras_respuesta(respuesta, decodificado=True), respuesta.content)
+
+
+def _transmitir(cliente: ClienteZoom, ruta: str, metodo: str, parametros, contenido, privado) -> Response:
+    cabeceras = _cabeceras_solicitud(True)
+    # Sin esto httpx pediría gzip por su cuenta y reenviaríamos bytes que el cliente no pidió
+    cabeceras["Accept-Encoding"] = request.headers.get("Accept-Encoding") or "identity"
+    respuesta = cliente.abrir_flujo(ruta, metodo, parametros=parametros, privado=privado, contenido=contenido,
+                                    cabeceras=cabeceras, procesar_errores=False)
+
+    def generar():
+        try:
+            yield from respuesta.iter_raw()
+        finally:
+            respuesta.close()
+
+    salida = Response(generar(), status=respuesta.status_code,
+                      headers=_cabeceras_respuesta(respuesta, decodificado=False), direct_passthrough=True)
+    salida.call_on_close(respuesta.close)
+    return salida
+
+
+def proxy_passthrough(cliente: ClienteZoom, ruta: str, politica: PoliticaProxy,
+                      parametros: Optional[Dict[str, Any]], privado: bool) -> Response:
+    metodo = request.method
+    contenido = request.get_data() or None
+    if metodo != "GET" or (not politica.ttl and not politica.coalescer):
+        metricas.incrementar("proxy.solicitudes", modo=PASSTHROUGH, via="stream")
+        return _transmitir(cliente, ruta, metodo, parametros, contenido, privado)
+
+    clave = (ruta, clave_catalogo(ruta, parametros)[1], privado)
+    entrada, _ = _respuestas.obtener(clave) if politica.ttl else (None, None)
+    via = "cache"
+    if entrada is not None:
+        cruda = entrada.valor
+    else:
+        via = "zoom"
+        descargar = lambda: _descargar(cliente, ruta, metodo, parametros, None, privado)
+        cruda = vuelos_zoom.hacer(("proxy",) + clave, descargar) if politica.coalescer else descargar()
+        if politica.ttl and cruda.status == 200:
+            _respuestas.guardar(clave, cruda, politica.ttl)
+    metricas.incrementar("proxy.solicitudes", modo=PASSTHROUGH, via=via)
+    salida = Response(cruda.contenido, status=cruda.status, headers=cruda.cabeceras)
+    if cruda.status == 200:
+        salida.make_conditional(request)
+    return salida
+
+
+def proxy_envoltura(cliente: ClienteZoom, ruta: str, politica: PoliticaProxy,
+                    parametros: Optional[Dict[str, Any]], cuerpo: Optional[Dict[str, Any]], privado: bool) -> Any:
+    """Respuesta ZOOM parseada (con el mapeo de códigos y reintentos de `_solicitar`)."""
+    metodo = request.method
+    cargar = lambda: cliente._solicitar(ruta, metodo=metodo, parametros=parametros, cuerpo=cuerpo, privado=privado)
+    if metodo == "GET" and not privado and politica.coalescer:
+        clave_vuelo = ("proxy", ruta, clave_catalogo(ruta, parametros)[1])
+        sin_coalescer = cargar
+        cargar = lambda: vuelos_zoom.hacer(clave_vuelo, sin_coalescer)
+    metricas.incrementar("proxy.solicitudes", modo=ENVOLTURA)
+    if metodo == "GET" and not privado and politica.ttl:
+        return obtener_o_cargar(clave_catalogo(ruta, parametros), cargar, politica.ttl)
+    return cargar()
+
+
+def estadisticas_proxy() -> Dict[str, Any]:
+    return {
+        "solo_permitidas": Configuracion.PROXY_SOLO_PERMITIDAS,
+        "rutas": sorted(Configuracion.PROXY_RUTAS),
+        "cache": _respuestas.estadisticas(),
+    }
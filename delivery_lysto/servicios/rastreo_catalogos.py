@@ -0,0 +1,174 @@
+"""
+Rastreo de catálogos ZOOM – Español
+-----------------------------------
+Recorre en paralelo (asyncio) los catálogos de ZOOM: estados -> ciudades ->
+municipios -> parroquias, oficinas, sucursales y zonas no servidas por ciudad, más los catálogos
+planos (tipo tarifa, modalidades). Devuelve las respuestas indexadas por la
+misma clave que usa la caché de catálogos, de modo que puedan precargarse.
+
+Solo se devuelven respuestas exitosas: una llamada que falla (excepción o
+sobre `CODE_xxx`) no aparece en el resultado, y tampoco sus hijos, que no
+llegan a pedirse. `padres_catalogo` dice qué respuesta padre debe listar a
+cada catálogo hijo, para distinguir "ya no existe" de "no se pudo consultar".
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from .cliente_zoom_async import ClienteZoomAsync
+from .cache_catalogos import clave_catalogo, ClaveCatalogo, es_exitosa
+from ..configuracion import Configuracion
+
+logger = logging.getLogger(__name__)
+
+
+def registros(data: Any) -> List[dict]:
+    """Extrae la lista de registros de una respuesta de catálogo ZOOM."""
+    if isinstance(data, list):
+        return [r for r in data if isinstance(r, dict)]
+    if isinstance(data, dict):
+        entidad = data.get("entidadRespuesta", data.get("data"))
+        if isinstance(entidad, list):
+            return [r for r in entidad if isinstance(r, dict)]
+        if isinstance(entidad, dict):
+            return [entidad]
+    return []
+
+
+def codigo_de(registro: dict, *campos: str) -> Optional[str]:
+    """Primer campo presente (no vacío) del registro, como texto."""
+    for campo in campos:
+        valor = registro.get(campo)
+        if valor not in (None, ""):
+            return str(valor).strip()
+    return None
+
+
+CAMPOS_CODIGO = {
+    "codestado": ("codestado", "codigo_estado", "id", "codigo"),
+    "codciudad": ("codciudad", "codigo_ciudad", "id", "codigo"),
+    "codmunicipio": ("codmunicipio", "codigo_municipio", "id", "codigo"),
+}
+
+# Catálogos por ciudad: los lista la respuesta getCiudades del estado de la ciudad
+_RUTAS_POR_CIUDAD = (
+    Configuracion.RUTA_ZOOM_MUNICIPIOS,
+    Configuracion.RUTA_ZOOM_SUCURSALES,
+    Configuracion.RUTA_ZOOM_ZONASNOSERVIDASWS,
+    Configuracion.RUTA_ZOOM_OFICINAS,
+)
+
+
+def codigos(data: Any, campo: str) -> set:
+    """Códigos (`codestado`, `codciudad` o `codmunicipio`) listados en una respuesta."""
+    return {c for c in (codigo_de(r, *CAMPOS_CODIGO[campo]) for r in registros(data)) if c}
+
+
+def padres_catalogo(clave: ClaveCatalogo, ciudades_de: Dict[str, List[ClaveCatalogo]]) -> List[tuple]:
+    """Respuestas padre que listan el código que identifica a `clave`: `[(clave_padre, campo, codigo)]`.
+
+    `ciudades_de` indexa `codciudad -> [claves getCiudades que la listan]`. Vacío
+    si el catálogo no tiene padre (catálogos planos, estados) o no se conoce.
+    """
+    ruta, parametros = clave
+    valores = dict(parametros)
+    if ruta == Configuracion.RUTA_ZOOM_CIUDADES and "codestado" in valores:
+        return [(clave_catalogo(Configuracion.RUTA_ZOOM_ESTADOS), "codestado", valores["codestado"])]
+    if ruta == Configuracion.RUTA_ZOOM_PARROQUIAS and "codmunicipio" in valores and "codciudad" in valores:
+        padre = clave_catalogo(Configuracion.RUTA_ZOOM_MUNICIPIOS, {"codciudad": valores["codciudad"]})
+        return [(padre, "codmunicipio", valores["codmunicipio"])]
+    if ruta in _RUTAS_POR_CIUDAD and "codciudad" in valores:
+        return [(padre, "codciudad", valores["codciudad"]) for padre in ciudades_de.get(valores["codciudad"], [])]
+    return []
+
+
+class _ClienteCaptura(ClienteZoomAsync):
+    """Cliente que salta la caché y registra cada respuesta exitosa por su clave de catálogo."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.capturas: Dict[ClaveCatalogo, Any] = {}
+
+    async def _solicitar(self, ruta: str, metodo: str = "GET", parametros: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        data = await self._enviar(ruta, metodo, parametros, **kwargs)
+        if es_exitosa(data):
+            self.capturas[clave_catalogo(ruta, parametros)] = data
+        else:
+            logger.warning(f"Rastreo de catálogo {ruta} {parametros}: respuesta de error de ZOOM, se descarta")
+        return data
+
+
+async def _en_paralelo(llamadas: Iterable, max_paralelo: int) -> List[Any]:
+    """Ejecuta corrutinas con paralelismo acotado; los errores se devuelven como excepción."""
+    semaforo = asyncio.Semaphore(max(1, max_paralelo))
+
+    async def _uno(corrutina):
+        async with semaforo:
+            try:
+                return await corrutina
+            except Exception as e:
+                logger.warning(f"Rastreo de catálogo fallido: {e}")
+                return e
+
+    return await asyncio.gather(*[_uno(c) for c in llamadas])
+
+
+async def rastrear_catalogos(
+    cliente: Optional[_ClienteCaptura] = None,
+    max_paralelo: Optional[int] = None,
+    codservicios: Optional[List[str]] = None,
+) -> Dict[ClaveCatalogo, Any]:
+    """Rastrea el árbol completo de catálogos y devuelve `{clave: respuesta}`."""
+    max_paralelo = max_paralelo or Configuracion.ZOOM_RASTREO_MAX_PARALELO
+    codservicios = codservicios or Configuracion.ZOOM_SNAPSHOT_CODSERVICIOS
+    if cliente is None:
+        cliente = _ClienteCaptura(
+            base_url=Configuracion.ZOOM_BASE_URL,
+            timeout=Configuracion.ZOOM_TIMEOUT,
+            reintentos=Configuracion.ZOOM_REINTENTOS,
+        )
+
+    # Nivel 0: catálogos planos y estados
+    planos = await _en_paralelo([
+        cliente.obtener_estados(filtro=None),
+        cliente.obtener_infoTarifa(),
+        cliente.obtener_modalidad_tarifa(),
+        cliente.obtener_modalidad_cod(),
+    ], max_paralelo)
+    estados = [codigo_de(r, "codestado", "codigo_estado", "id", "codigo") for r in registros(planos[0])]
+    estados = [e for e in estados if e]
+
+    # Nivel 1: ciudades por estado
+    ciudades_resp = await _en_paralelo(
+        [cliente.obtener_ciudades(codestado=e, filtro=None, idioma=None) for e in estados], max_paralelo
+    )
+    ciudades = []
+    for resp in ciudades_resp:
+        for r in registros(resp):
+            cod = codigo_de(r, "codciudad", "codigo_ciudad", "id", "codigo")
+            if cod:
+                ciudades.append(cod)
+
+    # Nivel 2: municipios, oficinas, sucursales y zonas no servidas por ciudad
+    llamadas = []
+    for cod in ciudades:
+        llamadas.append(cliente.obtener_municipios(codciudad=cod, remitente=None))
+        llamadas.append(cliente.obtener_sucursales(codciudad=cod, idioma=None))
+        llamadas.append(cliente.obtener_zonas_noservidasws(codciudad=cod))
+        for codservicio in codservicios:
+            llamadas.append(cliente.obtener_oficinas(codciudad=cod, codservicio=codservicio, siglas=None, codpais=None))
+    await _en_paralelo(llamadas, max_paralelo)
+
+    # Nivel 3: parroquias por municipio
+    llamadas = []
+    for cod in ciudades:
+        municipios = cliente.capturas.get(clave_catalogo(Configuracion.RUTA_ZOOM_MUNICIPIOS, {"codciudad": cod}))
+        for r in registros(municipios):
+            codmunicipio = codigo_de(r, "codmunicipio", "codigo_municipio", "id", "codigo")
+            if codmunicipio:
+                llamadas.append(cliente.obtener_parroquias(codmunicipio=codmunicipio, codciudad=cod, remitente=None))
+    await _en_paralelo(llamadas, max_paralelo)
+
+    logger.info(f"Rastreo de catálogos: {len(estados)} estados, {len(ciudades)} ciudades, {len(cliente.capturas)} respuestas")
+    return dict(cliente.capturas)
@@ -0,0 +1,195 @@
+"""
+Política de reintentos compartida – Español
+-------------------------------------------
+Decide si (y cuánto esperar antes de) reintentar una llamada a ZOOM o ARMI:
+
+- Backoff exponencial con *full jitter*: espera aleatoria en `[0, min(tope, base * 2^n)]`.
+- Respeta `Retry-After` (segundos o fecha HTTP) hasta `REINTENTO_RETRY_AFTER_MAX`.
+- Errores de conexión: se reintentan siempre (la solicitud no llegó al servidor).
+  Timeouts de lectura y respuestas 502/503/504/429: solo en métodos idempotentes (GET).
+- Presupuesto de reintentos por servicio: en una ventana de tiempo, los
+  reintentos no pueden superar `ratio` de las solicitudes (con un mínimo), para
+  que los reintentos no amplifiquen una caída.
+
+La política solo decide; cada cliente duerme con `time.sleep` o `asyncio.sleep`.
+"""
+from __future__ import annotations
+import logging
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+from ..configuracion import Configuracion
+from ..core.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+METODOS_IDEMPOTENTES = frozenset({"GET", "HEAD", "OPTIONS"})
+ESTADOS_REINTENTABLES = frozenset({429, 502, 503, 504})
+# Errores donde la solicitud no llegó a enviarse: seguros para cualquier método
+ERRORES_CONEXION = (httpx.ConnectError, httpx.ConnectTimeout)
+# Errores donde el servidor pudo haber procesado la solicitud
+ERRORES_LECTURA = (httpx.ReadTimeout, httpx.ReadError, httpx.RemoteProtocolError)
+
+
+def segundos_retry_after(resp: Optional[httpx.Response]) -> Optional[float]:
+    """Interpreta la cabecera `Retry-After`; None si no viene o no es válida."""
+    if resp is None:
+        return None
+    valor = resp.headers.get("Retry-After")
+    if not valor:
+        return None
+    valor = valor.strip()
+    if valor.isdigit():
+        return float(valor)
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class PresupuestoReintentos:
+    """Limita los reintentos a una fracción de las solicitudes en una ventana deslizante."""
+
+    def __init__(self, ratio: float = 0.2, ventana: float = 10.0, minimo: int = 10) -> None:
+        self.ratio = max(0.0, ratio)
+        self.ventana = max(1.0, ventana)
+        self.minimo = max(0, minimo)
+        self._solicitudes: deque = deque()
+        self._reintentos: deque = deque()
+        self._lock = threading.Lock()
+
+    def _purgar(self, ahora: float) -> None:
+        limite = ahora - self.ventana
+        while self._solicitudes and self._solicitudes[0] < limite:
+            self._solicitudes.popleft()
+        while self._reintentos and self._reintentos[0] < limite:
+            self._reintentos.popleft()
+
+    def registrar_solicitud(self) -> None:
+        ahora = time.monotonic()
+        with self._lock:
+            self._purgar(ahora)
+            self._solicitudes.append(ahora)
+
+    def consumir(self) -> bool:
+        """Reserva un reintento; False si el presupuesto de la ventana está agotado."""
+        ahora = time.monotonic()
+        with self._lock:
+            self._purgar(ahora)
+            permitidos = max(self.minimo, int(len(self._solicitudes) * self.ratio))
+            if len(self._reintentos) >= permitidos:
+                return False
+            self._reintentos.append(ahora)
+            return True
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            self._purgar(time.monotonic())
+            return {
+                "solicitudes": len(self._solicitudes),
+                "reintentos": len(self._reintentos),
+                "permitidos": max(self.minimo, int(len(self._solicitudes) * self.ratio)),
+                "ventana": self.ventana,
+            }
+
+
+class PoliticaReintentos:
+    """Motor de decisión de reintentos para un servicio externo."""
+
+    def __init__(
+        self,
+        servicio: str,
+        base: float = 0.5,
+        tope: float = 8.0,
+        retry_after_max: float = 30.0,
+        presupuesto: Optional[PresupuestoReintentos] = None,
+    ) -> None:
+        self.servicio = servicio
+        self.base = base
+        self.tope = tope
+        self.retry_after_max = retry_after_max
+        self.presupuesto = presupuesto or PresupuestoReintentos()
+
+    def iniciar(self) -> None:
+        """Registra una solicitud nueva (alimenta el presupuesto)."""
+        self.presupuesto.registrar_solicitud()
+        metricas.incrementar("reintentos.solicitudes", servicio=self.servicio)
+
+    def _motivo(self, metodo: str, respuesta: Optional[httpx.Response], error: Optional[BaseException]) -> Optional[str]:
+        idempotente = metodo.upper() in METODOS_IDEMPOTENTES
+        if error is not None:
+            if isinstance(error, ERRORES_CONEXION):
+                return "conexion"
+            if isinstance(error, ERRORES_LECTURA) and idempotente:
+                return "lectura"
+            return None
+        if respuesta is not None and respuesta.status_code in ESTADOS_REINTENTABLES and idempotente:
+            return f"http_{respuesta.status_code}"
+        return None
+
+    def espera(
+        self,
+        intento: int,
+        metodo: str,
+        max_reintentos: int,
+        respuesta: Optional[httpx.Response] = None,
+        error: Optional[BaseException] = None,
+    ) -> Optional[float]:
+        """Segundos a esperar antes del siguiente intento, o None si no se reintenta.
+
+        `intento` es el número del intento que acaba de fallar (1 = el original).
+        """
+        motivo = self._motivo(metodo, respuesta, error)
+        if motivo is None:
+            return None
+        if intento > max_reintentos:
+            metricas.incrementar("reintentos.agotados", servicio=self.servicio, motivo=motivo)
+            return None
+
+        retry_after = segundos_retry_after(respuesta)
+        if retry_after is not None and retry_after > self.retry_after_max:
+            # No bloquear el hilo más de lo razonable: se devuelve el error
+            metricas.incrementar("reintentos.retry_after_excedido", servicio=self.servicio)
+            return None
+        if not self.presupuesto.consumir():
+            logger.warning(f"Presupuesto de reintentos agotado para {self.servicio} ({motivo})")
+            metricas.incrementar("reintentos.sin_presupuesto", servicio=self.servicio, motivo=motivo)
+            return None
+
+        espera = random.uniform(0, min(self.tope, self.base * (2 ** (intento - 1))))
+        if retry_after is not None:
+            espera = max(espera, retry_after)
+        metricas.incrementar("reintentos.intentos", servicio=self.servicio, motivo=motivo)
+        metricas.observar("reintentos.espera_segundos", espera, servicio=self.servicio)
+        return espera
+
+
+def _crear_politica(servicio: str) -> PoliticaReintentos:
+    return PoliticaReintentos(
+        servicio,
+        base=Configuracion.REINTENTO_BASE,
+        tope=Configuracion.REINTENTO_TOPE,
+        retry_after_max=Configuracion.REINTENTO_RETRY_AFTER_MAX,
+        presupuesto=PresupuestoReintentos(
+            ratio=Configuracion.REINTENTO_PRESUPUESTO_RATIO,
+            ventana=Configuracion.REINTENTO_PRESUPUESTO_VENTANA,
+            minimo=Configuracion.REINTENTO_PRESUPUESTO_MINIMO,
+        ),
+    )
+
+
+politica_zoom = _crear_politica("zoom")
+politica_armi = _crear_politica("armi")
+
+
+def estadisticas_reintentos() -> dict:
+    return {
+        "zoom": politica_zoom.presupuesto.estadisticas(),
+        "armi": politica_armi.presupuesto.estadisticas(),
+    }
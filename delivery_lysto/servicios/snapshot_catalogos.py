@@ -0,0 +1,205 @@
+"""
+Snapshot persistente de catálogos ZOOM – Español
+------------------------------------------------
+Guarda las respuestas de catálogo en un archivo SQLite local, versionado y
+escrito de forma atómica (archivo temporal + `os.replace`). Al arrancar, la
+aplicación lo carga en la caché de catálogos para que un worker nuevo o una
+instancia reiniciada sirva catálogos sin consultar a ZOOM.
+
+Un rastreo parcial (ZOOM caído a mitad, circuito abierto) no borra filas: una
+fila que falta en el rastreo solo se elimina si su respuesta padre se consultó
+con éxito y ya no la lista; si no, se conserva tal cual.
+
+Esquema:
+- `meta(clave, valor)`: version, esquema, creado, verificado.
+- `catalogos(ruta, parametros, hash, datos, version, actualizado, verificado)`.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .cache_catalogos import cache_catalogos, ClaveCatalogo
+from .rastreo_catalogos import codigos, padres_catalogo
+from ..configuracion import Configuracion
+
+logger = logging.getLogger(__name__)
+
+ESQUEMA = 1
+
+
+def _hash(datos_json: str) -> str:
+    return hashlib.blake2b(datos_json.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _serializar(datos: Any) -> str:
+    return json.dumps(datos, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def _parametros_a_texto(parametros: Tuple[Tuple[str, str], ...]) -> str:
+    return json.dumps(list(parametros), ensure_ascii=False, separators=(",", ":"))
+
+
+def _texto_a_parametros(texto: str) -> Tuple[Tuple[str, str], ...]:
+    return tuple((k, v) for k, v in json.loads(texto))
+
+
+def leer_snapshot(archivo: Optional[str] = None) -> Tuple[Dict[str, str], Dict[ClaveCatalogo, dict]]:
+    """Lee el snapshot: devuelve `(meta, {clave: fila})`. Vacío si no existe."""
+    archivo = archivo or Configuracion.ZOOM_SNAPSHOT_ARCHIVO
+    if not os.path.exists(archivo):
+        return {}, {}
+    conn = sqlite3.connect(f"file:{archivo}?mode=ro", uri=True)
+    try:
+        meta = dict(conn.execute("SELECT clave, valor FROM meta").fetchall())
+        filas = {}
+        for ruta, parametros, hash_, datos, version, actualizado, verificado in conn.execute(
+            "SELECT ruta, parametros, hash, datos, version, actualizado, verificado FROM catalogos"
+        ):
+            filas[(ruta, _texto_a_parametros(parametros))] = {
+                "hash": hash_,
+                "datos": datos,
+                "version": version,
+                "actualizado": actualizado,
+                "verificado": verificado,
+            }
+        return meta, filas
+    finally:
+        conn.close()
+
+
+def _eliminables(respuestas: Dict[ClaveCatalogo, Any], filas_prev: Dict[ClaveCatalogo, dict]) -> set:
+    """Filas anteriores ausentes del rastreo cuyo padre se consultó con éxito y ya no las lista."""
+    ciudades_de: Dict[str, list] = {}
+    for clave, fila in filas_prev.items():
+        if clave[0] == Configuracion.RUTA_ZOOM_CIUDADES:
+            for codciudad in codigos(json.loads(fila["datos"]), "codciudad"):
+                ciudades_de.setdefault(codciudad, []).append(clave)
+
+    eliminables = set()
+    for clave in set(filas_prev) - set(respuestas):
+        padres = padres_catalogo(clave, ciudades_de)
+        if padres and all(padre in respuestas and codigo not in codigos(respuestas[padre], campo)
+                          for padre, campo, codigo in padres):
+            eliminables.add(clave)
+    return eliminables
+
+
+def escribir_snapshot(respuestas: Dict[ClaveCatalogo, Any], archivo: Optional[str] = None) -> Dict[str, Any]:
+    """Escribe una nueva versión del snapshot diferenciando contra la anterior.
+
+    Las entradas sin cambios conservan su versión y fecha de actualización;
+    las nuevas o modificadas toman la versión nueva. Las que no vinieron en el
+    rastreo se conservan salvo que su padre confirme que ya no existen. Si
+    nada cambió, solo se actualiza la marca `verificado` (sin crear versión).
+    """
+    archivo = archivo or Configuracion.ZOOM_SNAPSHOT_ARCHIVO
+    meta_prev, filas_prev = leer_snapshot(archivo)
+    version_prev = int(meta_prev.get("version", 0) or 0)
+    version = version_prev + 1
+    ahora = time.time()
+
+    filas: Dict[ClaveCatalogo, dict] = {}
+    resumen = {"nuevas": 0, "modificadas": 0, "sin_cambios": 0, "eliminadas": 0, "conservadas": 0}
+    for clave, datos in respuestas.items():
+        datos_json = _serializar(datos)
+        h = _hash(datos_json)
+        previa = filas_prev.get(clave)
+        if previa and previa["hash"] == h:
+            filas[clave] = dict(previa, verificado=ahora)
+            resumen["sin_cambios"] += 1
+        else:
+            filas[clave] = {"hash": h, "datos": datos_json, "version": version, "actualizado": ahora, "verificado": ahora}
+            resumen["modificadas" if previa else "nuevas"] += 1
+    eliminables = _eliminables(respuestas, filas_prev)
+    for clave, previa in filas_prev.items():
+        if clave not in filas and clave not in eliminables:
+            filas[clave] = previa  # no se pudo consultar: se conserva sin tocar `verificado`
+            resumen["conservadas"] += 1
+    resumen["eliminadas"] = len(eliminables)
+
+    hay_cambios = resumen["nuevas"] or resumen["modificadas"] or resumen["eliminadas"] or not meta_prev
+    if not hay_cambios:
+        conn = sqlite3.connect(archivo)
+        try:
+            with conn:
+                conn.executemany(
+                    "UPDATE catalogos SET verificado = ? WHERE ruta = ? AND parametros = ?",
+                    [(ahora, ruta, _parametros_a_texto(params)) for ruta, params in respuestas],
+                )
+                conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('verificado', ?)", (str(ahora),))
+        finally:
+            conn.close()
+        resumen["version"] = version_prev
+        return resumen
+
+    directorio = os.path.dirname(os.path.abspath(archivo))
+    os.makedirs(directorio, exist_ok=True)
+    temporal = f"{archivo}.tmp-{os.getpid()}"
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    conn = sqlite3.connect(temporal)
+    try:
+        with conn:
+            conn.execute("CREATE TABLE meta (clave TEXT PRIMARY KEY, valor TEXT)")
+            conn.execute(
+                "CREATE TABLE catalogos (ruta TEXT NOT NULL, parametros TEXT NOT NULL, hash TEXT NOT NULL, "
+                "datos TEXT NOT NULL, version INTEGER NOT NULL, actualizado REAL NOT NULL, verificado REAL NOT NULL, "
+                "PRIMARY KEY (ruta, parametros))"
+            )
+            conn.executemany(
+                "INSERT INTO catalogos VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (ruta, _parametros_a_texto(params), f["hash"], f["datos"], f["version"], f["actualizado"], f["verificado"])
+                    for (ruta, params), f in filas.items()
+                ],
+            )
+            conn.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                [("version", str(version)), ("esquema", str(ESQUEMA)), ("creado", str(ahora)), ("verificado", str(ahora))],
+            )
+    finally:
+        conn.close()
+    # Reemplazo atómico: los lectores ven la versión anterior o la nueva, nunca una a medias
+    os.replace(temporal, archivo)
+    resumen["version"] = version
+    return resumen
+
+
+def cargar_snapshot(archivo: Optional[str] = None) -> int:
+    """Precarga el snapshot en la caché de catálogos. Devuelve la cantidad cargada.
+
+    Las entradas verificadas hace más que su TTL entran como obsoletas: se
+    sirven de inmediato y se refrescan en segundo plano en el primer acceso.
+    """
+    archivo = archivo or Configuracion.ZOOM_SNAPSHOT_ARCHIVO
+    try:
+        meta, filas = leer_snapshot(archivo)
+    except Exception as e:
+        logger.warning(f"No se pudo leer snapshot de catálogos '{archivo}': {e}")
+        return 0
+    if int(meta.get("esquema", 0) or 0) != ESQUEMA:
+        if filas:
+            logger.warning(f"Snapshot de catálogos con esquema incompatible: {meta.get('esquema')}")
+        return 0
+
+    ahora = time.time()
+    cargadas = 0
+    for (ruta, params), fila in filas.items():
+        ttl = Configuracion.ZOOM_CACHE_TTLS.get(ruta)
+        if not ttl:
+            continue
+        verificado = float(fila["verificado"])
+        # Mantener la edad real; si ya venció, que expire "ahora" para servirse como obsoleta
+        ttl_efectivo = max(float(ttl), ahora - verificado)
+        cache_catalogos.guardar(
+            (ruta, params), json.loads(fila["datos"]), ttl_efectivo,
+            Configuracion.ZOOM_CACHE_TTL_OBSOLETO, creado=verificado,
+        )
+        cargadas += 1
+    logger.info(f"Snapshot de catálogos v{meta.get('version')} cargado: {cargadas} entradas desde {archivo}")
+    return cargadas
@@ -0,0 +1,267 @@
+"""
+Trabajos asíncronos con estado en MySQL – Español
+-------------------------------------------------
+Para procesos largos (el envío orquestado hace hasta diez llamadas a ZOOM más
+las escrituras en BD) el endpoint valida, encola el trabajo y responde `202`
+con su id; un pool local de hilos lo procesa y el cliente consulta el avance.
+
+    trabajo = trabajos_envio.encolar(payload)          # {"id_trabajo", "estado": "PENDIENTE", ...}
+    trabajos_envio.consultar(trabajo["id_trabajo"])    # estado, pasos, resultado
+
+El estado vive en `tb_delivery_trabajo` (ver `scipt_bd.sql`) y en memoria del
+worker que lo procesa. Estados: PENDIENTE -> EN_CURSO -> COMPLETADO | FALLIDO.
+
+Al arrancar, cada worker recupera los trabajos que quedaron pendientes tras un
+reinicio (`sp_trabajo_recuperar`). Un trabajo EN_CURSO sin avance reciente
+vuelve a PENDIENTE, salvo que ya hubiera empezado su paso irreversible
+(`createShipment`): ese se marca FALLIDO para revisarlo en ZOOM antes de
+repetirlo. `sp_trabajo_tomar` asegura que un solo worker procese cada trabajo.
+
+Si MySQL no responde el trabajo se procesa igual, solo en memoria (no
+sobrevive a un reinicio y solo lo ve el worker que lo aceptó).
+"""
+from __future__ import annotations
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import request
+
+from ..configuracion import Configuracion
+from ..core.errores import ServicioSaturado
+from ..core.metricas import metricas
+from ..db.conexion import ejecutar_sp_bool, ejecutar_sp_resultados
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = "PENDIENTE"
+EN_CURSO = "EN_CURSO"
+COMPLETADO = "COMPLETADO"
+FALLIDO = "FALLIDO"
+FINALES = (COMPLETADO, FALLIDO)
+
+# procesar(payload, observador) -> (resultado, status)
+Procesador = Callable[[Dict[str, Any], Callable[[str, str], None]], Tuple[Dict[str, Any], int]]
+
+
+def quiere_asincrono() -> bool:
+    """True si la solicitud pide modo asíncrono (`?modo=asincrono` o `Prefer: respond-async`)."""
+    if not Configuracion.TRABAJOS_HABILITADO:
+        return False
+    modo = request.args.get("modo", Configuracion.TRABAJOS_MODO_DEFECTO).lower()
+    return modo in ("asincrono", "async") or "respond-async" in request.headers.get("Prefer", "").lower()
+
+
+def json_bd(valor: Any) -> Optional[str]:
+    return None if valor is None else json.dumps(valor, ensure_ascii=False, default=str)
+
+
+def cargar_json_bd(valor: Any) -> Any:
+    return json.loads(valor) if isinstance(valor, (str, bytes)) else valor
+
+
+@dataclass
+class Trabajo:
+    id_trabajo: str
+    tipo: str
+    estado: str = PENDIENTE
+    pasos: Dict[str, str] = field(default_factory=dict)
+    resultado: Optional[Dict[str, Any]] = None
+    codigo_http: Optional[int] = None
+    intentos: int = 0
+    persistente: bool = True
+    fecha_creacion: str = field(default_factory=lambda: datetime.now().isoformat())
+    fecha_inicio: Optional[str] = None
+    fecha_fin: Optional[str] = None
+
+    def vista(self) -> Dict[str, Any]:
+        return {
+            "id_trabajo": self.id_trabajo,
+            "tipo": self.tipo,
+            "estado": self.estado,
+            "pasos": dict(self.pasos),
+            "resultado": self.resultado,
+            "codigo_http": self.codigo_http,
+            "intentos": self.intentos,
+            "fecha_creacion": self.fecha_creacion,
+            "fecha_inicio": self.fecha_inicio,
+            "fecha_fin": self.fecha_fin,
+        }
+
+
+class ColaTrabajos:
+    """Cola de trabajos de un tipo, con pool de hilos propio y estado en MySQL."""
+
+    def __init__(self, tipo: str, paso_irreversible: str = "") -> None:
+        self.tipo = tipo
+        self.paso_irreversible = paso_irreversible
+        self.propietario = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._trabajos: "OrderedDict[str, Trabajo]" = OrderedDict()
+        self._procesar: Optional[Procesador] = None
+        self._app = None
+        self._ejecutor: Optional[ThreadPoolExecutor] = None
+        self._en_cola = 0
+
+    def registrar_procesador(self, procesar: Procesador) -> None:
+        self._procesar = procesar
+
+    def iniciar(self, app) -> None:
+        """Guarda la app (los hilos corren con su contexto) y recupera trabajos pendientes."""
+        self._app = app
+        if self._ejecutor is None:
+            self._ejecutor = ThreadPoolExecutor(max_workers=Configuracion.TRABAJOS_MAX_HILOS,
+                                                thread_name_prefix=f"trabajos-{self.tipo}")
+        if Configuracion.TRABAJOS_RECUPERAR_AL_INICIAR:
+            self.recuperar()
+
+    # --- memoria local ---
+
+    def _recordar(self, trabajo: Trabajo) -> None:
+        with self._lock:
+            self._trabajos[trabajo.id_trabajo] = trabajo
+            self._trabajos.move_to_end(trabajo.id_trabajo)
+            # Se olvidan primero los terminados más viejos; siguen en MySQL
+            while len(self._trabajos) > Configuracion.TRABAJOS_MEMORIA_MAX:
+                viejo = next((k for k, t in self._trabajos.items() if t.estado in FINALES), None)
+                if viejo is None:
+                    break
+                del self._trabajos[viejo]
+
+    # --- persistencia ---
+
+    def _guardar_estado(self, trabajo: Trabajo) -> None:
+        if not trabajo.persistente:
+            return
+        ejecutar_sp_bool("sp_trabajo_actualizar", trabajo.id_trabajo, trabajo.estado,
+                         json_bd({"pasos": trabajo.pasos}), json_bd(trabajo.resultado), trabajo.codigo_http)
+
+    def _tomar(self, trabajo: Trabajo) -> bool:
+        """Marca el trabajo EN_CURSO para este worker; False si otro ya lo tomó."""
+        if not trabajo.persistente:
+            return True
+        filas = ejecutar_sp_resultados("sp_trabajo_tomar", trabajo.id_trabajo, self.propietario)
+        if not filas:
+            # Sin BD: el trabajo lo aceptó este worker, se procesa solo en memoria
+            trabajo.persistente = False
+            return True
+        return bool(filas[0].get("tomado"))
+
+    # --- ciclo de vida ---
+
+    def encolar(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Registra el trabajo y lo envía al pool; devuelve su vista al momento de encolarlo."""
+        if self._procesar is None or self._ejecutor is None:
+            raise RuntimeError(f"Cola de trabajos '{self.tipo}' sin iniciar")
+        with self._lock:
+            if self._en_cola >= Configuracion.TRABAJOS_MAX_COLA:
+                metricas.incrementar("trabajos.rechazados", tipo=self.tipo)
+                raise ServicioSaturado("Cola de trabajos llena, intente más tarde")
+            self._en_cola += 1
+        trabajo = Trabajo(uuid.uuid4().hex, self.tipo)
+        trabajo.persistente = ejecutar_sp_bool("sp_trabajo_crear", trabajo.id_trabajo, self.tipo, json_bd(payload))
+        if not trabajo.persistente:
+            logger.warning(f"Trabajo {trabajo.id_trabajo} sin persistir en BD; se procesa solo en memoria")
+        self._recordar(trabajo)
+        metricas.incrementar("trabajos.encolados", tipo=self.tipo)
+        vista = trabajo.vista()
+        self._ejecutor.submit(self._ejecutar, trabajo, json.loads(json_bd(payload)), time.perf_counter())
+        return vista
+
+    def _ejecutar(self, trabajo: Trabajo, payload: Dict[str, Any], encolado: float) -> None:
+        with self._lock:
+            self._en_cola -= 1
+        metricas.observar("trabajos.espera_segundos", time.perf_counter() - encolado, tipo=self.tipo)
+        if not self._tomar(trabajo):
+            logger.info(f"Trabajo {trabajo.id_trabajo} ya lo procesa otro worker")
+            with self._lock:
+                self._trabajos.pop(trabajo.id_trabajo, None)
+            return
+
+        trabajo.estado = EN_CURSO
+        trabajo.intentos += 1
+        trabajo.fecha_inicio = datetime.now().isoformat()
+
+        def observador(paso: str, estado: str) -> None:
+            trabajo.pasos[paso] = estado
+            self._guardar_estado(trabajo)
+
+        inicio = time.perf_counter()
+        try:
+            with self._app.app_context():
+                resultado, status = self._procesar(payload, observador)
+            trabajo.resultado, trabajo.codigo_http = resultado, status
+            trabajo.estado = COMPLETADO if status < 400 else FALLIDO
+        except Exception as e:
+            logger.exception(f"Trabajo {trabajo.id_trabajo} falló")
+            trabajo.resultado, trabajo.codigo_http = {"ok": False, "error": str(e)}, 500
+            trabajo.estado = FALLIDO
+        trabajo.fecha_fin = datetime.now().isoformat()
+        self._guardar_estado(trabajo)
+        metricas.observar("trabajos.segundos", time.perf_counter() - inicio, tipo=self.tipo, estado=trabajo.estado)
+
+    def recuperar(self) -> int:
+        """Reencola los trabajos que quedaron pendientes (o interrumpidos) en MySQL."""
+        filas = ejecutar_sp_resultados("sp_trabajo_recuperar", self.tipo, self.paso_irreversible,
+                                       Configuracion.TRABAJOS_RECUPERAR_SEGUNDOS,
+                                       Configuracion.TRABAJOS_MAX_INTENTOS, Configuracion.TRABAJOS_MAX_COLA)
+        for fila in filas:
+            trabajo = Trabajo(fila["id_trabajo"], self.tipo, intentos=fila.get("intentos") or 0,
+                              fecha_creacion=str(fila.get("fecha_creacion") or ""))
+            self._recordar(trabajo)
+            with self._lock:
+                self._en_cola += 1
+            self._ejecutor.submit(self._ejecutar, trabajo, cargar_json_bd(fila["payload"]), time.perf_counter())
+        if filas:
+            logger.info(f"Trabajos '{self.tipo}' recuperados: {len(filas)}")
+        return len(filas)
+
+    def consultar(self, id_trabajo: str) -> Optional[Dict[str, Any]]:
+        """Estado del trabajo: memoria de este worker o, si no, MySQL (lo aceptó otro worker)."""
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+        if trabajo is not None:
+            return trabajo.vista()
+        filas = ejecutar_sp_resultados("sp_trabajo_obtener", id_trabajo)
+        if not filas or filas[0].get("tipo_trabajo") != self.tipo:
+            return None
+        fila = filas[0]
+        fecha = lambda clave: fila[clave].isoformat() if fila.get(clave) else None
+        return {
+            "id_trabajo": fila["id_trabajo"],
+            "tipo": fila["tipo_trabajo"],
+            "estado": fila["estado"],
+            "pasos": (cargar_json_bd(fila.get("progreso")) or {}).get("pasos", {}),
+            "resultado": cargar_json_bd(fila.get("resultado")),
+            "codigo_http": fila.get("codigo_http"),
+            "intentos": fila.get("intentos"),
+            "fecha_creacion": fecha("fecha_creacion"),
+            "fecha_inicio": fecha("fecha_inicio"),
+            "fecha_fin": fecha("fecha_fin"),
+        }
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            por_estado: Dict[str, int] = {}
+            for t in self._trabajos.values():
+                por_estado[t.estado] = por_estado.get(t.estado, 0) + 1
+            return {
+                "tipo": self.tipo,
+                "habilitado": Configuracion.TRABAJOS_HABILITADO,
+                "hilos": Configuracion.TRABAJOS_MAX_HILOS,
+                "en_cola": self._en_cola,
+                "max_cola": Configuracion.TRABAJOS_MAX_COLA,
+                "en_memoria": por_estado,
+            }
+
+
+trabajos_envio = ColaTrabajos("ENVIO_ZOOM", paso_irreversible="creacion_envio")
@@ -0,0 +1,104 @@
+"""
+Tracking por lotes – Español
+----------------------------
+Consulta el estado de muchas guías a la vez con `ClienteZoomAsync`, con
+paralelismo acotado (`TRACKING_LOTE_PARALELO`). Los resultados se entregan en
+orden de llegada para poder transmitirlos (NDJSON) a medida que se completan.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import queue
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .bucle_async import ejecutar
+from .cliente_zoom_async import ClienteZoomAsync
+from ..configuracion import Configuracion
+from ..core.errores import ErrorZoom
+
+logger = logging.getLogger(__name__)
+
+MODO_ULTIMO = "ultimo"      # getLastTracking
+MODO_TRACKWS = "trackws"    # getZoomTrackWs
+MODOS = (MODO_ULTIMO, MODO_TRACKWS)
+
+_FIN = object()
+
+
+def _mensaje_error(e: Exception) -> str:
+    return e.mensaje if isinstance(e, ErrorZoom) else str(e)
+
+
+async def _consultar_guia(cliente: ClienteZoomAsync, guia: str, modo: str, opciones: Dict[str, Any]) -> Any:
+    if modo == MODO_TRACKWS:
+        return await cliente.obtener_trackws(
+            codigo=guia,
+            tipo_busqueda=opciones.get("tipo_busqueda") or 1,
+            web=opciones.get("web"),
+        )
+    return await cliente.obtener_ultimotrack(
+        codigo=guia,
+        codigo_cliente=opciones.get("codigo_cliente"),
+        tipo_busqueda=opciones.get("tipo_busqueda"),
+    )
+
+
+async def _rastrear(cliente: ClienteZoomAsync, guias: List[str], modo: str, opciones: Dict[str, Any],
+                    max_paralelo: int, cola: "queue.Queue") -> None:
+    semaforo = asyncio.Semaphore(max(1, max_paralelo))
+
+    async def una(guia: str) -> None:
+        async with semaforo:
+            try:
+                cola.put((guia, await _consultar_guia(cliente, guia, modo, opciones), None))
+            except Exception as e:
+                cola.put((guia, None, _mensaje_error(e)))
+
+    try:
+        await asyncio.gather(*[una(g) for g in guias])
+    finally:
+        cola.put(_FIN)
+
+
+def rastrear_lote(
+    guias: List[str],
+    modo: str = MODO_ULTIMO,
+    opciones: Optional[Dict[str, Any]] = None,
+    cliente: Optional[ClienteZoomAsync] = None,
+    max_paralelo: Optional[int] = None,
+) -> Iterator[Tuple[str, Any, Optional[str]]]:
+    """Itera `(guia, datos, error)` a medida que cada consulta termina.
+
+    Si el consumidor deja de iterar (p. ej. el cliente HTTP se desconecta), las
+    consultas pendientes se cancelan.
+    """
+    cliente = cliente or ClienteZoomAsync(
+        base_url=Configuracion.ZOOM_BASE_URL,
+        timeout=Configuracion.ZOOM_TIMEOUT,
+        reintentos=Configuracion.ZOOM_REINTENTOS,
+    )
+    cola: "queue.Queue" = queue.Queue()
+    futuro = ejecutar(_rastrear(cliente, guias, modo, opciones or {}, max_paralelo or Configuracion.TRACKING_LOTE_PARALELO, cola))
+    try:
+        while True:
+            item = cola.get()
+            if item is _FIN:
+                break
+            yield item
+        futuro.result()
+    finally:
+        if not futuro.done():
+            futuro.cancel()
+
+
+def normalizar_guias(guias: Any) -> List[str]:
+    """Limpia y deduplica la lista de guías conservando el orden."""
+    if not isinstance(guias, list):
+        raise ValueError("'guias' debe ser una lista de números de guía")
+    vistas, resultado = set(), []
+    for guia in guias:
+        guia = str(guia).strip() if guia is not None else ""
+        if guia and guia not in vistas:
+            vistas.add(guia)
+            resultado.append(guia)
+    return resultado
@@ -0,0 +1,167 @@
+"""
+Transporte HTTP compartido para ZOOM – Español
+----------------------------------------------
+Mantiene un único `httpx.Client` por proceso (worker de gunicorn) con pool de
+conexiones keep-alive, de modo que las llamadas a zoom.red reutilizan
+conexiones TCP/TLS en lugar de abrir una nueva por solicitud.
+"""
+from __future__ import annotations
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional
+import httpx
+from ..configuracion import Configuracion
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_cliente: Optional[httpx.Client] = None
+_pid: Optional[int] = None
+_opciones: Dict[str, Any] = {}
+# Un AsyncClient por event loop: httpx.AsyncClient no puede cruzar loops
+_clientes_async: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def configurar_transporte(
+    max_conexiones: Optional[int] = None,
+    max_keepalive: Optional[int] = None,
+    keepalive_expiracion: Optional[float] = None,
+    http2: Optional[bool] = None,
+) -> None:
+    """Define los límites del pool. Si ya existe un cliente, se recrea en el próximo uso."""
+    global _opciones
+    with _lock:
+        _opciones = {
+            "max_conexiones": max_conexiones,
+            "max_keepalive": max_keepalive,
+            "keepalive_expiracion": keepalive_expiracion,
+            "http2": http2,
+        }
+        _cerrar_sin_lock()
+
+
+def _opcion(nombre: str, defecto: Any) -> Any:
+    valor = _opciones.get(nombre)
+    return defecto if valor is None else valor
+
+
+def _http2_disponible() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def limites_pool() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=_opcion("max_conexiones", Configuracion.ZOOM_POOL_MAX_CONEXIONES),
+        max_keepalive_connections=_opcion("max_keepalive", Configuracion.ZOOM_POOL_MAX_KEEPALIVE),
+        keepalive_expiry=_opcion("keepalive_expiracion", Configuracion.ZOOM_POOL_KEEPALIVE_EXPIRACION),
+    )
+
+
+def usar_http2() -> bool:
+    """HTTP/2 solo se activa si está configurado y el paquete `h2` está instalado."""
+    solicitado = _opcion("http2", Configuracion.ZOOM_HTTP2)
+    if solicitado and not _http2_disponible():
+        logger.warning("ZOOM_HTTP2 activo pero falta el paquete 'h2' (pip install httpx[http2]); se usa HTTP/1.1")
+        return False
+    return bool(solicitado)
+
+
+def _parametros_cliente() -> Dict[str, Any]:
+    return {
+        "limits": limites_pool(),
+        "http2": usar_http2(),
+        "timeout": Configuracion.ZOOM_TIMEOUT,
+        "follow_redirects": True,
+    }
+
+
+def _crear_cliente() -> httpx.Client:
+    parametros = _parametros_cliente()
+    limites = parametros["limits"]
+    logger.info(
+        f"Creando transporte ZOOM (pid {os.getpid()}): max_conexiones={limites.max_connections}, "
+        f"max_keepalive={limites.max_keepalive_connections}, http2={parametros['http2']}"
+    )
+    return httpx.Client(**parametros)
+
+
+def _crear_cliente_async() -> httpx.AsyncClient:
+    return httpx.AsyncClient(**_parametros_cliente())
+
+
+def obtener_cliente_http() -> httpx.Client:
+    """Devuelve el cliente compartido del proceso actual.
+
+    Se crea de forma perezosa y se vuelve a crear tras un fork (gunicorn con
+    preload), ya que las conexiones del padre no deben compartirse con el hijo.
+    """
+    global _cliente, _pid
+    pid = os.getpid()
+    cliente = _cliente
+    if cliente is not None and _pid == pid and not cliente.is_closed:
+        return cliente
+    with _lock:
+        if _cliente is None or _pid != pid or _cliente.is_closed:
+            _cliente = _crear_cliente()
+            _pid = pid
+        return _cliente
+
+
+def obtener_cliente_http_async() -> httpx.AsyncClient:
+    """Devuelve el `httpx.AsyncClient` compartido del event loop en ejecución."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        cliente = _clientes_async.get(loop)
+        if cliente is None or cliente.is_closed:
+            cliente = _crear_cliente_async()
+            _clientes_async[loop] = cliente
+        return cliente
+
+
+async def cerrar_transporte_async() -> None:
+    """Cierra el AsyncClient del loop actual (llamar antes de cerrar el loop)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        cliente = _clientes_async.pop(loop, None)
+    if cliente is not None:
+        await cliente.aclose()
+
+
+def _cerrar_sin_lock() -> None:
+    global _cliente, _pid
+    if _cliente is not None and _pid == os.getpid():
+        try:
+            _cliente.close()
+        except Exception:
+            logger.exception("Error cerrando transporte ZOOM")
+    _cliente = None
+    _pid = None
+
+
+def cerrar_transporte() -> None:
+    """Cierra el cliente compartido (al apagar el worker)."""
+    with _lock:
+        _cerrar_sin_lock()
+
+
+def info_transporte() -> Dict[str, Any]:
+    limites = limites_pool()
+    return {
+        "max_conexiones": limites.max_connections,
+        "max_keepalive": limites.max_keepalive_connections,
+        "keepalive_expiracion": limites.keepalive_expiry,
+        "http2": usar_http2(),
+        "activo": _cliente is not None and _pid == os.getpid() and not _cliente.is_closed,
+        "clientes_async": len(_clientes_async),
+    }
+
+
+atexit.register(cerrar_transporte)
@@ -313,6 +313,61 @@ CREATE TABLE `tb_estatus_general` (
   KEY `idx_codigo` (`cod_estatus`)
 ) ENGINE=InnoDB AUTO_INCREMENT=27 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='Tabla que centraliza todos los estados del sistema, USO: Referencia para estatus de clientes, empresas, envíos, etc.\nEjemplo: cod_estatus=1 (ACTIVO), cod_estatus=2 (INACTIVO)\nmodulo_estatus: ''GENERAL'', ''ZOOM'', ''ARMI'', ''CLIENTE''\nnombre_estatus: ''ACTIVO'', ''RECIBIDA'', ''ENTREGADO'', etc.\nRelacionada con: Todas las tablas que tienen cod_estatus';
 
+CREATE TABLE `tb_delivery_trabajo` (
+  `id_trabajo` char(32) NOT NULL,
+  `tipo_trabajo` varchar(30) NOT NULL COMMENT 'ENVIO_ZOOM, ...',
+  `estado` varchar(20) NOT NULL DEFAULT 'PENDIENTE' COMMENT 'PENDIENTE, EN_CURSO, COMPLETADO, FALLIDO',
+  `propietario` varchar(100) DEFAULT NULL COMMENT 'host:pid del worker que lo procesa',
+  `intentos` int NOT NULL DEFAULT '0',
+  `payload` json NOT NULL,
+  `progreso` json DEFAULT NULL COMMENT '{"pasos": {"nombre_paso": "en_curso|ok|error|omitido"}}',
+  `resultado` json DEFAULT NULL,
+  `codigo_http` int DEFAULT NULL,
+  `fecha_creacion` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `fecha_inicio` datetime DEFAULT NULL,
+  `fecha_fin` datetime DEFAULT NULL,
+  `fecha_actualizacion` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id_trabajo`),
+  KEY `idx_tipo_estado` (`tipo_trabajo`,`estado`,`fecha_creacion`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='Trabajos asíncronos de la API (envío orquestado en modo 202).\nUso: estado y progreso por paso que consulta el cliente; sobrevive a reinicios.\nEl payload incluye credenciales ZOOM: limpiar los terminados periódicamente.';
+
+CREATE TABLE `tb_delivery_lote` (
+  `id_lote` char(32) NOT NULL,
+  `total_items` int NOT NULL,
+  `fecha_creacion` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id_lote`),
+  KEY `idx_fecha` (`fecha_creacion`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='Lotes de envíos orquestados (POST /privadas/delivery/zoom/envio/lote).\nUso: reanudar un lote interrumpido sin repetir los envíos ya creados.';
+
+CREATE TABLE `tb_delivery_lote_item` (
+  `id_lote` char(32) NOT NULL,
+  `indice` int NOT NULL,
+  `estado` varchar(20) NOT NULL DEFAULT 'PENDIENTE' COMMENT 'PENDIENTE, EN_CURSO, ENVIANDO, COMPLETADO, FALLIDO',
+  `propietario` varchar(100) DEFAULT NULL COMMENT 'host:pid del worker que lo procesa',
+  `payload` json NOT NULL,
+  `resultado` json DEFAULT NULL,
+  `codigo_http` int DEFAULT NULL,
+  `fecha_actualizacion` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id_lote`,`indice`),
+  KEY `idx_estado` (`id_lote`,`estado`),
+  CONSTRAINT `tb_delivery_lote_item_ibfk_1` FOREIGN KEY (`id_lote`) REFERENCES `tb_delivery_lote` (`id_lote`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='Ítems de cada lote: payload orquestado, estado y resultado por envío.\nEl payload incluye credenciales ZOOM: depurar los lotes terminados.';
+
+CREATE TABLE `tb_delivery_idempotencia` (
+  `id_idempotencia` bigint NOT NULL AUTO_INCREMENT,
+  `ambito` varchar(50) NOT NULL COMMENT 'envio_zoom, ...',
+  `clave` varchar(255) NOT NULL COMMENT 'login ZOOM | Idempotency-Key o metadata.solicitud_id',
+  `huella` char(64) NOT NULL COMMENT 'blake2b del payload: la misma clave con otro payload es un error (422)',
+  `estado` varchar(20) NOT NULL DEFAULT 'EN_CURSO' COMMENT 'EN_CURSO, COMPLETADA',
+  `respuesta` json DEFAULT NULL COMMENT '{"cuerpo": ..., "cabeceras": ...} devuelto a los reintentos',
+  `codigo_http` int DEFAULT NULL,
+  `fecha_creacion` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `fecha_expiracion` datetime NOT NULL,
+  PRIMARY KEY (`id_idempotencia`),
+  UNIQUE KEY `uk_ambito_clave` (`ambito`,`clave`),
+  KEY `idx_expiracion` (`fecha_expiracion`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci COMMENT='Claves de idempotencia del envío orquestado.\nUso: un reintento con la misma clave recibe la respuesta guardada sin crear otro envío en ZOOM.\nLimpieza: evento idempotencia_limpieza (fecha_expiracion).';
+
 CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_actualizar_tracking_zoom`(
     IN p_id_envio_cab INT,
     IN p_cod_estatus_track INT,
@@ -775,6 +830,237 @@ BEGIN
   SELECT v_id_cliente AS id_cliente;
 END;
 
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_trabajo_crear`(
+  IN p_id_trabajo CHAR(32),
+  IN p_tipo_trabajo VARCHAR(30),
+  IN p_payload JSON
+)
+BEGIN
+  INSERT INTO tb_delivery_trabajo (id_trabajo, tipo_trabajo, estado, payload)
+  VALUES (p_id_trabajo, p_tipo_trabajo, 'PENDIENTE', p_payload);
+END;
+
+-- Toma atómica: solo un worker pasa el trabajo de PENDIENTE a EN_CURSO
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_trabajo_tomar`(
+  IN p_id_trabajo CHAR(32),
+  IN p_propietario VARCHAR(100)
+)
+BEGIN
+  UPDATE tb_delivery_trabajo
+     SET estado = 'EN_CURSO',
+         propietario = p_propietario,
+         intentos = intentos + 1,
+         fecha_inicio = NOW()
+   WHERE id_trabajo = p_id_trabajo
+     AND estado = 'PENDIENTE';
+  SELECT ROW_COUNT() AS tomado;
+END;
+
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_trabajo_actualizar`(
+  IN p_id_trabajo CHAR(32),
+  IN p_estado VARCHAR(20),
+  IN p_progreso JSON,
+  IN p_resultado JSON,
+  IN p_codigo_http INT
+)
+BEGIN
+  UPDATE tb_delivery_trabajo
+     SET estado = p_estado,
+         progreso = COALESCE(p_progreso, progreso),
+         resultado = COALESCE(p_resultado, resultado),
+         codigo_http = COALESCE(p_codigo_http, codigo_http),
+         fecha_fin = IF(p_estado IN ('COMPLETADO', 'FALLIDO'), NOW(), fecha_fin)
+   WHERE id_trabajo = p_id_trabajo;
+END;
+
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_trabajo_obtener`(
+  IN p_id_trabajo CHAR(32)
+)
+BEGIN
+  SELECT id_trabajo, tipo_trabajo, estado, intentos, progreso, resultado, codigo_http,
+         fecha_creacion, fecha_inicio, fecha_fin
+    FROM tb_delivery_trabajo
+   WHERE id_trabajo = p_id_trabajo;
+END;
+
+-- Al iniciar un worker: los EN_CURSO sin avance en p_segundos quedaron huérfanos (reinicio).
+-- Si ya empezaron el paso irreversible (p.ej. createShipment) o agotaron intentos -> FALLIDO;
+-- el resto vuelve a PENDIENTE. Devuelve los PENDIENTE para reencolarlos.
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_trabajo_recuperar`(
+  IN p_tipo_trabajo VARCHAR(30),
+  IN p_paso_irreversible VARCHAR(50),
+  IN p_segundos INT,
+  IN p_max_intentos INT,
+  IN p_limite INT
+)
+BEGIN
+  UPDATE tb_delivery_trabajo
+     SET estado = 'FALLIDO',
+         codigo_http = 500,
+         resultado = JSON_OBJECT('ok', FALSE, 'error',
+             'Trabajo interrumpido por reinicio; revisar en ZOOM antes de reintentar'),
+         fecha_fin = NOW()
+   WHERE tipo_trabajo = p_tipo_trabajo
+     AND estado = 'EN_CURSO'
+     AND fecha_actualizacion < NOW() - INTERVAL p_segundos SECOND
+     AND (intentos >= p_max_intentos
+          OR (p_paso_irreversible <> ''
+              AND JSON_CONTAINS_PATH(progreso, 'one', CONCAT('$.pasos.', p_paso_irreversible))));
+
+  UPDATE tb_delivery_trabajo
+     SET estado = 'PENDIENTE',
+         propietario = NULL
+   WHERE tipo_trabajo = p_tipo_trabajo
+     AND estado = 'EN_CURSO'
+     AND fecha_actualizacion < NOW() - INTERVAL p_segundos SECOND;
+
+  SELECT id_trabajo, payload, intentos, fecha_creacion
+    FROM tb_delivery_trabajo
+   WHERE tipo_trabajo = p_tipo_trabajo
+     AND estado = 'PENDIENTE'
+   ORDER BY fecha_creacion
+   LIMIT p_limite;
+END;
+
+-- Crea el lote y todos sus ítems en una sola llamada (p_envios: arreglo JSON de payloads)
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_lote_crear`(
+  IN p_id_lote CHAR(32),
+  IN p_envios JSON
+)
+BEGIN
+  DECLARE EXIT HANDLER FOR SQLEXCEPTION
+  BEGIN
+    ROLLBACK;
+    RESIGNAL;
+  END;
+
+  START TRANSACTION;
+  INSERT INTO tb_delivery_lote (id_lote, total_items) VALUES (p_id_lote, JSON_LENGTH(p_envios));
+  INSERT INTO tb_delivery_lote_item (id_lote, indice, payload)
+  SELECT p_id_lote, jt.orden - 1, jt.payload
+    FROM JSON_TABLE(p_envios, '$[*]' COLUMNS (orden FOR ORDINALITY, payload JSON PATH '$')) AS jt;
+  COMMIT;
+END;
+
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_lote_obtener`(
+  IN p_id_lote CHAR(32),
+  IN p_con_payload BOOLEAN
+)
+BEGIN
+  SELECT indice, estado, IF(p_con_payload, payload, NULL) AS payload, resultado, codigo_http
+    FROM tb_delivery_lote_item
+   WHERE id_lote = p_id_lote
+   ORDER BY indice;
+END;
+
+-- Toma atómica de un ítem: PENDIENTE, o EN_CURSO huérfano (sin avance en p_segundos)
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_lote_item_tomar`(
+  IN p_id_lote CHAR(32),
+  IN p_indice INT,
+  IN p_propietario VARCHAR(100),
+  IN p_segundos INT
+)
+BEGIN
+  UPDATE tb_delivery_lote_item
+     SET estado = 'EN_CURSO',
+         propietario = p_propietario
+   WHERE id_lote = p_id_lote
+     AND indice = p_indice
+     AND (estado = 'PENDIENTE'
+          OR (estado = 'EN_CURSO' AND fecha_actualizacion < NOW() - INTERVAL p_segundos SECOND));
+  SELECT ROW_COUNT() AS tomado;
+END;
+
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_lote_item_actualizar`(
+  IN p_id_lote CHAR(32),
+  IN p_indice INT,
+  IN p_estado VARCHAR(20),
+  IN p_resultado JSON,
+  IN p_codigo_http INT
+)
+BEGIN
+  UPDATE tb_delivery_lote_item
+     SET estado = p_estado,
+         resultado = COALESCE(p_resultado, resultado),
+         codigo_http = COALESCE(p_codigo_http, codigo_http)
+   WHERE id_lote = p_id_lote
+     AND indice = p_indice;
+END;
+
+-- Reserva la clave (RESERVADA) o informa su estado: COMPLETADA (con la respuesta guardada),
+-- EN_CURSO (otra solicitud la procesa) o CONFLICTO (misma clave, otro payload).
+-- Las claves vencidas o EN_CURSO abandonadas (más de p_en_curso_segundos) se liberan antes.
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_idempotencia_reservar`(
+  IN p_ambito VARCHAR(50),
+  IN p_clave VARCHAR(255),
+  IN p_huella CHAR(64),
+  IN p_ttl_segundos INT,
+  IN p_en_curso_segundos INT
+)
+BEGIN
+  DELETE FROM tb_delivery_idempotencia
+   WHERE ambito = p_ambito
+     AND clave = p_clave
+     AND (fecha_expiracion < NOW()
+          OR (estado = 'EN_CURSO' AND fecha_creacion < NOW() - INTERVAL p_en_curso_segundos SECOND));
+
+  -- El índice único uk_ambito_clave decide quién reserva si llegan a la vez
+  INSERT IGNORE INTO tb_delivery_idempotencia (ambito, clave, huella, estado, fecha_expiracion)
+  VALUES (p_ambito, p_clave, p_huella, 'EN_CURSO', NOW() + INTERVAL p_ttl_segundos SECOND);
+
+  IF ROW_COUNT() = 1 THEN
+    SELECT 'RESERVADA' AS resultado, NULL AS respuesta, NULL AS codigo_http;
+  ELSE
+    -- Siempre una fila: si la clave se liberó entretanto, EN_CURSO hace que el llamador reintente
+    SELECT CASE
+             WHEN i.id_idempotencia IS NULL THEN 'EN_CURSO'
+             WHEN i.huella <> p_huella THEN 'CONFLICTO'
+             WHEN i.estado = 'COMPLETADA' THEN 'COMPLETADA'
+             ELSE 'EN_CURSO'
+           END AS resultado,
+           IF(i.huella = p_huella, i.respuesta, NULL) AS respuesta,
+           i.codigo_http
+      FROM (SELECT 1) AS d
+      LEFT JOIN tb_delivery_idempotencia i
+        ON i.ambito = p_ambito AND i.clave = p_clave;
+  END IF;
+END;
+
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_idempotencia_completar`(
+  IN p_ambito VARCHAR(50),
+  IN p_clave VARCHAR(255),
+  IN p_respuesta JSON,
+  IN p_codigo_http INT
+)
+BEGIN
+  UPDATE tb_delivery_idempotencia
+     SET estado = 'COMPLETADA',
+         respuesta = p_respuesta,
+         codigo_http = p_codigo_http
+   WHERE ambito = p_ambito
+     AND clave = p_clave;
+END;
+
+-- Tras un 5xx (el envío no se creó) la clave se libera para que el reintento vuelva a intentarlo
+CREATE DEFINER=`root`@`localhost` PROCEDURE `LystoLocal`.`sp_idempotencia_liberar`(
+  IN p_ambito VARCHAR(50),
+  IN p_clave VARCHAR(255)
+)
+BEGIN
+  DELETE FROM tb_delivery_idempotencia
+   WHERE ambito = p_ambito
+     AND clave = p_clave
+     AND estado = 'EN_CURSO';
+END;
+
+CREATE EVENT idempotencia_limpieza
+ON SCHEDULE EVERY 1 HOUR
+ON COMPLETION NOT PRESERVE
+ENABLE
+DO
+  DELETE FROM tb_delivery_idempotencia
+   WHERE fecha_expiracion < NOW();
+
 CREATE EVENT zoom_historico
 ON SCHEDULE EVERY 1 DAY
 STARTS '2025-12-15 15:25:04.000'